@@ -2,13 +2,24 @@ import numpy as np
 import random
 import pickle
 import os
+import heapq
+from collections import defaultdict, deque
+from entorno import EVENTO_TESORO
+from tablas import crear_tabla, describir_tabla
+from politica import crear_politica
 
 class AgenteQLearning:
     """
     Agente que aprende usando Q-Learning
     """
 
-    def __init__(self, num_estados, num_acciones, alpha=0.1, gamma=0.9, epsilon=0.1):
+    modo = 'q'
+    # Las subclases que redefinen elegir_accion/actualizar_q deben desactivar
+    # el episodio fusionado para que entrenar_episodio use sus métodos
+    episodio_fusionado = True
+
+    def __init__(self, num_estados, num_acciones, alpha=0.1, gamma=0.9, epsilon=0.1,
+                 almacenamiento='densa', dtype='float64'):
         """
         Inicializa el agente
 
@@ -18,6 +29,8 @@ class AgenteQLearning:
             alpha: Tasa de aprendizaje
             gamma: Factor de descuento
             epsilon: Tasa de exploración
+            almacenamiento: 'densa', 'bloques' o 'dispersa' (ver tablas.crear_tabla)
+            dtype: Tipo de los valores Q: 'float64', 'float32' o 'float16'
         """
         self.num_estados = num_estados
         self.num_acciones = num_acciones
@@ -25,14 +38,55 @@ class AgenteQLearning:
         self.gamma = gamma
         self.epsilon = epsilon
 
-        self.tabla_q = np.zeros((num_estados, num_acciones))
+        self.tabla_q = crear_tabla(num_estados, num_acciones, almacenamiento, dtype)
+
+        # Programas por visitas (ver usar_visitas); None = ε y α globales
+        self.visitas = None
+        self.epsilon_visitas = None
+        self.alpha_visitas = None
+
+    @property
+    def tabla_q(self):
+        """Tabla Q del agente"""
+        return self._tabla_q
+
+    @tabla_q.setter
+    def tabla_q(self, tabla_q):
+        # Una tabla nueva invalida la política cacheada
+        self._tabla_q = tabla_q
+        self.politica = crear_politica(tabla_q)
+
+    @property
+    def almacenamiento(self):
+        """Almacenamiento y tipo de la tabla Q actual"""
+        return describir_tabla(self.tabla_q)
+
+    def usar_visitas(self, epsilon=None, alpha=None):
+        """
+        Activa ε y α por estado, que decaen con las visitas a cada estado
+
+        Args:
+            epsilon: ProgramaVisitas para ε, o None para usar self.epsilon
+            alpha: ProgramaVisitas para α, o None para usar self.alpha
+        """
+        if epsilon is None and alpha is None:
+            self.visitas = self.epsilon_visitas = self.alpha_visitas = None
+            return
+        if type(self).entrenar_episodio is not AgenteQLearning.entrenar_episodio or not self.episodio_fusionado:
+            raise ValueError(f"Los programas por visitas no están disponibles en modo {self.modo}")
+        if self.visitas is None:
+            self.visitas = [0] * self.num_estados
+        self.epsilon_visitas = epsilon
+        self.alpha_visitas = alpha
 
     def elegir_accion(self, estado_indice, entrenar=True):
         """Elige una acción usando política ε-greedy"""
         if entrenar and random.random() < self.epsilon:
             return random.randint(0, self.num_acciones - 1)
-        else:
+        elif entrenar:
             return np.argmax(self.tabla_q[estado_indice])
+        else:
+            return self.politica.accion(estado_indice)
 
     def actualizar_q(self, estado, accion, recompensa, siguiente_estado, terminado):
         """Actualiza la tabla Q"""
@@ -45,6 +99,204 @@ class AgenteQLearning:
 
         nuevo_q = q_actual + self.alpha * (recompensa + self.gamma * q_siguiente_max - q_actual)
         self.tabla_q[estado, accion] = nuevo_q
+        self.politica.sucias[estado] = 1
+
+    def elegir_acciones(self, estados, entrenar=True):
+        """
+        Elige una acción ε-greedy para cada estado de un lote
+
+        Args:
+            estados: Array de índices de estado
+            entrenar: Si aplicar exploración ε-greedy
+
+        Returns:
+            Array de acciones
+        """
+        estados = np.asarray(estados)
+        acciones = np.argmax(self.tabla_q[estados], axis=1)
+
+        if entrenar and self.epsilon > 0:
+            explorar = np.random.random(len(estados)) < self.epsilon
+            acciones[explorar] = np.random.randint(0, self.num_acciones, np.count_nonzero(explorar))
+
+        return acciones
+
+    def actualizar_q_lote(self, estados, acciones, recompensas, siguientes_estados, terminados):
+        """
+        Actualiza la tabla Q con un lote de transiciones en una sola pasada
+
+        Los objetivos se calculan con la tabla previa al lote. Los pares (s, a)
+        repetidos se agrupan: con k apariciones el resultado es el de k
+        actualizaciones secuenciales en el orden del lote, cada una hacia su
+        propio objetivo, Q ← (1 - alpha)^k Q + Σ alpha (1 - alpha)^(k - i) objetivo_i,
+        aunque las recompensas o los estados siguientes difieran.
+
+        Args:
+            estados: Array de índices de estado
+            acciones: Array de acciones
+            recompensas: Array de recompensas
+            siguientes_estados: Array de índices del estado siguiente
+            terminados: Array booleano de transiciones terminales
+        """
+        estados = np.asarray(estados)
+        acciones = np.asarray(acciones)
+        terminados = np.asarray(terminados, dtype=bool)
+
+        q_siguiente_max = np.max(self.tabla_q[siguientes_estados], axis=1)
+        q_siguiente_max[terminados] = 0
+        objetivos = recompensas + self.gamma * q_siguiente_max
+
+        # Orden estable: dentro de cada par se conserva el orden del lote
+        pares = estados * self.num_acciones + acciones
+        orden = np.argsort(pares, kind='stable')
+        unicos, inicios, conteos = np.unique(pares[orden], return_index=True, return_counts=True)
+        grupos = np.repeat(np.arange(len(unicos)), conteos)
+        restantes = inicios[grupos] + conteos[grupos] - 1 - np.arange(len(orden))
+        aportes = np.bincount(grupos, weights=self.alpha * (1 - self.alpha) ** restantes * objetivos[orden],
+                              minlength=len(unicos))
+
+        estados_u, acciones_u = np.divmod(unicos, self.num_acciones)
+        q_actual = self.tabla_q[estados_u, acciones_u]
+        self.tabla_q[estados_u, acciones_u] = (1 - self.alpha) ** conteos * q_actual + aportes
+        self.politica.marcar(estados_u)
+
+    def entrenar_episodio(self, entorno, al_paso=None, episodio=0):
+        """
+        Ejecuta un episodio completo de entrenamiento sobre entorno.step_idx
+
+        Fusiona elección ε-greedy, paso del entorno y actualización Q en un
+        único bucle sin diccionarios, tuplas ni escalares NumPy: cada fila de
+        la tabla se lee una sola vez como lista y se reutiliza para el máximo
+        del objetivo y para la siguiente elección. El resultado es idéntico al
+        de llamar a elegir_accion/actualizar_q paso a paso.
+
+        Args:
+            entorno: Objeto GridWorld
+            al_paso: Función opcional llamada tras cada paso con (episodio, pasos)
+            episodio: Número de episodio que se pasa a al_paso
+
+        Returns:
+            recompensa_total, pasos, exito
+        """
+        if not self.episodio_fusionado:
+            return self._entrenar_episodio_generico(entorno, al_paso, episodio)
+        if self.visitas is not None:
+            return self._entrenar_episodio_visitas(entorno, al_paso, episodio)
+
+        tabla_q = self.tabla_q
+        sucias = self.politica.sucias
+        alpha = self.alpha
+        gamma = self.gamma
+        epsilon = self.epsilon
+        num_acciones = self.num_acciones
+        aleatorio = random.random
+        accion_aleatoria = random.randrange
+        step_idx = entorno.step_idx
+
+        entorno.reset()
+        estado = entorno.indice_agente
+        fila = tabla_q[estado].tolist()
+        recompensa_total = 0
+
+        while True:
+            if aleatorio() < epsilon:
+                accion = accion_aleatoria(num_acciones)
+            else:
+                accion = fila.index(max(fila))
+
+            siguiente_estado, recompensa, terminado, evento = step_idx(estado, accion)
+            recompensa_total += recompensa
+
+            siguiente_fila = tabla_q[siguiente_estado].tolist()
+            objetivo = recompensa if terminado else recompensa + gamma * max(siguiente_fila)
+            q_actual = fila[accion]
+            nuevo_q = q_actual + alpha * (objetivo - q_actual)
+            tabla_q[estado, accion] = nuevo_q
+            sucias[estado] = 1
+            if siguiente_estado == estado:
+                # Releído de la tabla por si su tipo redondea el valor
+                siguiente_fila[accion] = float(tabla_q[estado, accion])
+
+            if al_paso is not None:
+                al_paso(episodio, entorno.pasos_actuales)
+
+            if terminado:
+                return recompensa_total, entorno.pasos_actuales, evento == EVENTO_TESORO
+
+            estado = siguiente_estado
+            fila = siguiente_fila
+
+    def _entrenar_episodio_visitas(self, entorno, al_paso=None, episodio=0):
+        """Episodio fusionado con ε y α de cada estado según sus visitas"""
+        tabla_q = self.tabla_q
+        sucias = self.politica.sucias
+        visitas = self.visitas
+        epsilon_de = self.epsilon_visitas.valor_estado if self.epsilon_visitas is not None else None
+        alpha_de = self.alpha_visitas.valor_estado if self.alpha_visitas is not None else None
+        alpha = self.alpha
+        gamma = self.gamma
+        epsilon = self.epsilon
+        num_acciones = self.num_acciones
+        aleatorio = random.random
+        accion_aleatoria = random.randrange
+        step_idx = entorno.step_idx
+
+        entorno.reset()
+        estado = entorno.indice_agente
+        fila = tabla_q[estado].tolist()
+        recompensa_total = 0
+
+        while True:
+            n = visitas[estado] = visitas[estado] + 1
+            if epsilon_de is not None:
+                epsilon = epsilon_de(n)
+            if alpha_de is not None:
+                alpha = alpha_de(n)
+
+            if aleatorio() < epsilon:
+                accion = accion_aleatoria(num_acciones)
+            else:
+                accion = fila.index(max(fila))
+
+            siguiente_estado, recompensa, terminado, evento = step_idx(estado, accion)
+            recompensa_total += recompensa
+
+            siguiente_fila = tabla_q[siguiente_estado].tolist()
+            objetivo = recompensa if terminado else recompensa + gamma * max(siguiente_fila)
+            q_actual = fila[accion]
+            tabla_q[estado, accion] = q_actual + alpha * (objetivo - q_actual)
+            sucias[estado] = 1
+            if siguiente_estado == estado:
+                siguiente_fila[accion] = float(tabla_q[estado, accion])
+
+            if al_paso is not None:
+                al_paso(episodio, entorno.pasos_actuales)
+
+            if terminado:
+                return recompensa_total, entorno.pasos_actuales, evento == EVENTO_TESORO
+
+            estado = siguiente_estado
+            fila = siguiente_fila
+
+    def _entrenar_episodio_generico(self, entorno, al_paso=None, episodio=0):
+        """Episodio paso a paso con elegir_accion/actualizar_q, para las subclases"""
+        entorno.reset()
+        estado = entorno.indice_agente
+        recompensa_total = 0
+
+        while True:
+            accion = self.elegir_accion(estado, entrenar=True)
+            siguiente_estado, recompensa, terminado, evento = entorno.step_idx(estado, accion)
+            self.actualizar_q(estado, accion, recompensa, siguiente_estado, terminado)
+            recompensa_total += recompensa
+
+            if al_paso is not None:
+                al_paso(episodio, entorno.pasos_actuales)
+
+            if terminado:
+                return recompensa_total, entorno.pasos_actuales, evento == EVENTO_TESORO
+
+            estado = siguiente_estado
 
     def guardar_modelo(self, ruta='modelo_agente.pkl'):
         """
@@ -100,3 +352,476 @@ class AgenteQLearning:
         
         print(f"Modelo cargado desde: {ruta}")
         return True
+
+
+class AgenteDynaQ(AgenteQLearning):
+    """
+    Agente Q-Learning con planificación basada en modelo (Dyna-Q)
+
+    Registra cada transición observada en un modelo determinista guardado en
+    arrays (o, con una tabla Q dispersa, en un diccionario con solo las
+    parejas observadas) y, tras cada paso real, aplica `pasos_planificacion`
+    actualizaciones simuladas. Con `priorizado=True` usa barrido priorizado: las parejas
+    (s, a) se planifican en orden de error TD mediante una cola de prioridad
+    y se propagan hacia sus predecesores.
+    """
+
+    episodio_fusionado = False
+
+    def __init__(self, num_estados, num_acciones, alpha=0.1, gamma=0.9, epsilon=0.1,
+                 pasos_planificacion=10, priorizado=False, umbral_prioridad=1e-4,
+                 almacenamiento='densa', dtype='float64'):
+        """
+        Inicializa el agente
+
+        Args:
+            num_estados: Número total de estados
+            num_acciones: Número de acciones
+            alpha: Tasa de aprendizaje
+            gamma: Factor de descuento
+            epsilon: Tasa de exploración
+            pasos_planificacion: Actualizaciones simuladas por paso real
+            priorizado: Si usar barrido priorizado en lugar de Dyna-Q
+            umbral_prioridad: Error TD mínimo para encolar una pareja
+            almacenamiento: Almacenamiento de la tabla Q
+            dtype: Tipo de los valores Q
+        """
+        super().__init__(num_estados, num_acciones, alpha, gamma, epsilon, almacenamiento, dtype)
+        self.pasos_planificacion = pasos_planificacion
+        self.priorizado = priorizado
+        self.umbral_prioridad = umbral_prioridad
+        self.modo = 'priorizado' if priorizado else 'dyna'
+
+        # Con una tabla dispersa el modelo tampoco reserva memoria por pareja
+        self.modelo_denso = almacenamiento == 'densa'
+        if self.modelo_denso:
+            # Modelo: -1 indica pareja (s, a) aún no observada
+            self.modelo_siguiente = np.full((num_estados, num_acciones), -1, dtype=np.int64)
+            self.modelo_recompensa = np.zeros((num_estados, num_acciones))
+            self.modelo_terminal = np.zeros((num_estados, num_acciones), dtype=bool)
+            self.observados = np.empty(num_estados * num_acciones, dtype=np.int64)
+        else:
+            # (s, a) -> (siguiente, recompensa, terminal) de las parejas observadas
+            self.modelo = {}
+            self.observados = []
+        self.num_observados = 0
+
+        self.predecesores = {}
+        self.cola = []
+        # Prioridad vigente de cada pareja en la cola (0 = no encolada); las
+        # entradas del heap que no coinciden están obsoletas y se descartan
+        if self.modelo_denso:
+            self.prioridades = np.zeros((num_estados, num_acciones))
+        else:
+            self.prioridades = defaultdict(float)
+
+    @property
+    def nbytes_modelo(self):
+        """Memoria del modelo y de las prioridades (aproximada en el modelo disperso)"""
+        if self.modelo_denso:
+            return (self.modelo_siguiente.nbytes + self.modelo_recompensa.nbytes + self.modelo_terminal.nbytes +
+                    self.observados.nbytes + self.prioridades.nbytes)
+        return 200 * len(self.modelo) + 100 * len(self.prioridades)
+
+    def registrar_transicion(self, estado, accion, recompensa, siguiente_estado, terminado):
+        """
+        Guarda una transición en el modelo
+
+        El entorno es determinista, así que cada pareja guarda su última
+        observación (un corte por max_pasos puede marcarla terminal hasta que
+        se vuelva a observar).
+        """
+        if not self.modelo_denso:
+            if (estado, accion) not in self.modelo:
+                self.observados.append((estado, accion))
+                self.num_observados += 1
+            self.modelo[estado, accion] = (siguiente_estado, recompensa, terminado)
+        else:
+            if self.modelo_siguiente[estado, accion] < 0:
+                self.observados[self.num_observados] = estado * self.num_acciones + accion
+                self.num_observados += 1
+
+            self.modelo_siguiente[estado, accion] = siguiente_estado
+            self.modelo_recompensa[estado, accion] = recompensa
+            self.modelo_terminal[estado, accion] = terminado
+
+        if self.priorizado:
+            self.predecesores.setdefault(siguiente_estado, set()).add((estado, accion))
+
+    def actualizar_q(self, estado, accion, recompensa, siguiente_estado, terminado):
+        """Actualiza la tabla Q con la transición real y planifica con el modelo"""
+        self.registrar_transicion(estado, accion, recompensa, siguiente_estado, terminado)
+
+        if self.priorizado:
+            self._encolar(estado, accion)
+            self.barrido_priorizado()
+        else:
+            super().actualizar_q(estado, accion, recompensa, siguiente_estado, terminado)
+            self.planificar()
+
+    def planificar(self, pasos=None):
+        """Aplica un lote de actualizaciones simuladas con parejas observadas al azar"""
+        pasos = self.pasos_planificacion if pasos is None else pasos
+        if pasos <= 0 or self.num_observados == 0:
+            return
+
+        indices = np.random.randint(0, self.num_observados, pasos)
+        if not self.modelo_denso:
+            pares = [self.observados[i] for i in indices.tolist()]
+            siguientes, recompensas, terminales = zip(*[self.modelo[par] for par in pares])
+            estados, acciones = np.array(pares, dtype=np.int64).T
+            self.actualizar_q_lote(estados, acciones, np.array(recompensas, dtype=float),
+                                   np.array(siguientes, dtype=np.int64), np.array(terminales, dtype=bool))
+            return
+
+        estados, acciones = np.divmod(self.observados[indices], self.num_acciones)
+        self.actualizar_q_lote(estados, acciones,
+                               self.modelo_recompensa[estados, acciones],
+                               self.modelo_siguiente[estados, acciones],
+                               self.modelo_terminal[estados, acciones])
+
+    def _transicion(self, estado, accion):
+        """Retorna (siguiente, recompensa, terminal) de una pareja observada"""
+        if not self.modelo_denso:
+            return self.modelo[estado, accion]
+        return (self.modelo_siguiente[estado, accion], self.modelo_recompensa[estado, accion],
+                self.modelo_terminal[estado, accion])
+
+    def _error_td(self, estado, accion):
+        siguiente_estado, recompensa, terminal = self._transicion(estado, accion)
+        if terminal:
+            q_siguiente_max = 0
+        else:
+            q_siguiente_max = self.tabla_q[siguiente_estado].max()
+        objetivo = recompensa + self.gamma * q_siguiente_max
+        return objetivo - self.tabla_q[estado, accion]
+
+    def _encolar(self, estado, accion):
+        prioridad = abs(self._error_td(estado, accion))
+        if prioridad > self.umbral_prioridad and prioridad > self.prioridades[estado, accion]:
+            self.prioridades[estado, accion] = prioridad
+            heapq.heappush(self.cola, (-prioridad, estado, accion))
+
+    def barrido_priorizado(self, pasos=None):
+        """Actualiza las parejas de mayor error TD y propaga hacia sus predecesores"""
+        pasos = self.pasos_planificacion if pasos is None else pasos
+        # La pareja real cuenta como primera actualización
+        actualizaciones = 0
+        while self.cola and actualizaciones <= pasos:
+            prioridad, estado, accion = heapq.heappop(self.cola)
+            if -prioridad != self.prioridades[estado, accion]:
+                continue
+            self.prioridades[estado, accion] = 0
+            actualizaciones += 1
+
+            self.tabla_q[estado, accion] += self.alpha * self._error_td(estado, accion)
+            self.politica.sucias[estado] = 1
+
+            for predecesor, accion_predecesor in self.predecesores.get(estado, ()):
+                self._encolar(predecesor, accion_predecesor)
+
+
+class AgenteQLambda(AgenteQLearning):
+    """
+    Agente Q(λ) de Watkins con trazas de elegibilidad
+
+    Cada paso reparte el error TD entre las parejas (s, a) recientes según su
+    traza, que decae en γλ por paso. Las trazas se guardan de forma dispersa
+    en un diccionario y se descartan al bajar de `umbral_traza`, así que una
+    actualización toca como mucho log(umbral) / log(γλ) parejas. Se cortan
+    al tomar una acción exploratoria y al terminar el episodio.
+    """
+
+    modo = 'qlambda'
+
+    def __init__(self, num_estados, num_acciones, alpha=0.1, gamma=0.9, epsilon=0.1,
+                 lambda_=0.9, umbral_traza=0.01, almacenamiento='densa', dtype='float64'):
+        """
+        Inicializa el agente
+
+        Args:
+            num_estados: Número total de estados
+            num_acciones: Número de acciones
+            alpha: Tasa de aprendizaje
+            gamma: Factor de descuento
+            epsilon: Tasa de exploración
+            lambda_: Decaimiento de las trazas (0 = Q-Learning de un paso)
+            umbral_traza: Traza mínima que se conserva
+            almacenamiento: Almacenamiento de la tabla Q
+            dtype: Tipo de los valores Q
+        """
+        super().__init__(num_estados, num_acciones, alpha, gamma, epsilon, almacenamiento, dtype)
+        self.lambda_ = lambda_
+        self.umbral_traza = umbral_traza
+        self.trazas = {}
+
+    def _celdas(self):
+        """
+        Vista de la tabla Q para leer y escribir celdas (s, a) sueltas
+
+        Sobre una tabla densa contigua es un memoryview, cuyos accesos
+        escalares evitan crear escalares NumPy; si no, la propia tabla.
+        memoryview no admite float16, así que esas tablas se usan tal cual.
+        """
+        tabla_q = self.tabla_q
+        if (isinstance(tabla_q, np.ndarray) and tabla_q.dtype.char in 'fd'
+                and tabla_q.flags.c_contiguous and tabla_q.flags.writeable):
+            return memoryview(tabla_q).cast('B').cast(tabla_q.dtype.char, tabla_q.shape)
+        return tabla_q
+
+    def _propagar(self, celdas, estado, accion, error_td, terminado):
+        """Aplica el error TD a las parejas con traza y deja las trazas del paso siguiente"""
+        trazas = self.trazas
+        # Trazas de reemplazo: la pareja visitada vuelve a 1
+        trazas[estado, accion] = 1.0
+        sucias = self.politica.sucias
+        paso = self.alpha * error_td
+        decaimiento = self.gamma * self.lambda_
+        umbral = self.umbral_traza
+
+        vigentes = {}
+        for par, traza in trazas.items():
+            celdas[par] += paso * traza
+            sucias[par[0]] = 1
+            traza *= decaimiento
+            if traza >= umbral:
+                vigentes[par] = traza
+        self.trazas = {} if terminado else vigentes
+
+    def actualizar_q(self, estado, accion, recompensa, siguiente_estado, terminado):
+        """Actualiza la tabla Q de todas las parejas con traza activa"""
+        fila = self.tabla_q[estado].tolist()
+        if fila[accion] < max(fila):
+            # Acción exploratoria: el retorno ya no sigue la política greedy
+            self.trazas.clear()
+
+        if terminado:
+            q_siguiente_max = 0
+        else:
+            q_siguiente_max = max(self.tabla_q[siguiente_estado].tolist())
+        self._propagar(self._celdas(), estado, accion,
+                       recompensa + self.gamma * q_siguiente_max - fila[accion], terminado)
+
+    def entrenar_episodio(self, entorno, al_paso=None, episodio=0):
+        """
+        Episodio fusionado equivalente a elegir_accion/actualizar_q paso a paso
+
+        Ver AgenteQLearning.entrenar_episodio.
+        """
+        tabla_q = self.tabla_q
+        sucias = self.politica.sucias
+        alpha = self.alpha
+        gamma = self.gamma
+        epsilon = self.epsilon
+        decaimiento = gamma * self.lambda_
+        umbral = self.umbral_traza
+        num_acciones = self.num_acciones
+        aleatorio = random.random
+        accion_aleatoria = random.randrange
+        celdas = self._celdas()
+        step_idx = entorno.step_idx
+
+        entorno.reset()
+        trazas = {}
+        estado = entorno.indice_agente
+        fila = tabla_q[estado].tolist()
+        recompensa_total = 0
+
+        while True:
+            q_max = max(fila)
+            if aleatorio() < epsilon:
+                accion = accion_aleatoria(num_acciones)
+                if fila[accion] < q_max:
+                    trazas = {}
+            else:
+                accion = fila.index(q_max)
+
+            siguiente_estado, recompensa, terminado, evento = step_idx(estado, accion)
+            recompensa_total += recompensa
+
+            siguiente_fila = tabla_q[siguiente_estado].tolist()
+            objetivo = recompensa if terminado else recompensa + gamma * max(siguiente_fila)
+            paso = alpha * (objetivo - fila[accion])
+
+            # Mismo reparto que _propagar, con las trazas en una variable local
+            trazas[estado, accion] = 1.0
+            vigentes = {}
+            releer = False
+            for par, traza in trazas.items():
+                celdas[par] += paso * traza
+                estado_traza = par[0]
+                sucias[estado_traza] = 1
+                if estado_traza == siguiente_estado:
+                    releer = True
+                traza *= decaimiento
+                if traza >= umbral:
+                    vigentes[par] = traza
+            trazas = vigentes
+
+            if al_paso is not None:
+                al_paso(episodio, entorno.pasos_actuales)
+
+            if terminado:
+                self.trazas = {}
+                return recompensa_total, entorno.pasos_actuales, evento == EVENTO_TESORO
+
+            estado = siguiente_estado
+            # Releída si el reparto ha tocado esta fila
+            fila = tabla_q[estado].tolist() if releer else siguiente_fila
+
+
+class AgenteNPasos(AgenteQLearning):
+    """
+    Agente Q-Learning de n pasos
+
+    Retrasa cada actualización n pasos para usar como objetivo las n
+    recompensas observadas más el máximo Q del estado alcanzado. Como en
+    Q(λ) de Watkins, una acción exploratoria corta los retornos pendientes:
+    se actualizan con el máximo Q del estado donde se tomó. Al terminar el
+    episodio se vacían con el retorno truncado.
+    """
+
+    modo = 'npasos'
+
+    def __init__(self, num_estados, num_acciones, alpha=0.1, gamma=0.9, epsilon=0.1,
+                 n_pasos=3, almacenamiento='densa', dtype='float64'):
+        """
+        Inicializa el agente
+
+        Args:
+            num_estados: Número total de estados
+            num_acciones: Número de acciones
+            alpha: Tasa de aprendizaje
+            gamma: Factor de descuento
+            epsilon: Tasa de exploración
+            n_pasos: Recompensas reales en cada objetivo (1 = Q-Learning)
+            almacenamiento: Almacenamiento de la tabla Q
+            dtype: Tipo de los valores Q
+        """
+        super().__init__(num_estados, num_acciones, alpha, gamma, epsilon, almacenamiento, dtype)
+        self.n_pasos = max(int(n_pasos), 1)
+        self.pendientes = deque()
+
+    def _actualizar_primera(self, q_final):
+        """Actualiza la pareja más antigua con sus recompensas pendientes y q_final; retorna su estado"""
+        retorno = q_final
+        gamma = self.gamma
+        for _, _, recompensa in reversed(self.pendientes):
+            retorno = recompensa + gamma * retorno
+
+        estado, accion, _ = self.pendientes.popleft()
+        q_actual = self.tabla_q[estado, accion]
+        self.tabla_q[estado, accion] = q_actual + self.alpha * (retorno - q_actual)
+        self.politica.sucias[estado] = 1
+        return estado
+
+    def actualizar_q(self, estado, accion, recompensa, siguiente_estado, terminado):
+        """Guarda la transición y actualiza la pareja de hace n pasos"""
+        fila = self.tabla_q[estado].tolist()
+        if fila[accion] < max(fila):
+            # Acción exploratoria: los retornos pendientes se cortan aquí
+            while self.pendientes:
+                self._actualizar_primera(max(fila))
+        self.pendientes.append((estado, accion, recompensa))
+
+        if terminado:
+            while self.pendientes:
+                self._actualizar_primera(0.0)
+        elif len(self.pendientes) >= self.n_pasos:
+            self._actualizar_primera(max(self.tabla_q[siguiente_estado].tolist()))
+
+    def entrenar_episodio(self, entorno, al_paso=None, episodio=0):
+        """
+        Episodio fusionado equivalente a elegir_accion/actualizar_q paso a paso
+
+        Ver AgenteQLearning.entrenar_episodio.
+        """
+        tabla_q = self.tabla_q
+        epsilon = self.epsilon
+        num_acciones = self.num_acciones
+        aleatorio = random.random
+        accion_aleatoria = random.randrange
+        pendientes = self.pendientes
+        n_pasos = self.n_pasos
+        actualizar_primera = self._actualizar_primera
+        step_idx = entorno.step_idx
+
+        entorno.reset()
+        pendientes.clear()
+        estado = entorno.indice_agente
+        fila = tabla_q[estado].tolist()
+        recompensa_total = 0
+
+        while True:
+            q_max = max(fila)
+            if aleatorio() < epsilon:
+                accion = accion_aleatoria(num_acciones)
+                if fila[accion] < q_max:
+                    while pendientes:
+                        actualizar_primera(q_max)
+            else:
+                accion = fila.index(q_max)
+
+            siguiente_estado, recompensa, terminado, evento = step_idx(estado, accion)
+            recompensa_total += recompensa
+            pendientes.append((estado, accion, recompensa))
+
+            if terminado:
+                while pendientes:
+                    actualizar_primera(0.0)
+            else:
+                fila = tabla_q[siguiente_estado].tolist()
+                if len(pendientes) >= n_pasos and actualizar_primera(max(fila)) == siguiente_estado:
+                    # Releída por si la pareja actualizada era de esta fila
+                    fila = tabla_q[siguiente_estado].tolist()
+
+            if al_paso is not None:
+                al_paso(episodio, entorno.pasos_actuales)
+
+            if terminado:
+                return recompensa_total, entorno.pasos_actuales, evento == EVENTO_TESORO
+
+            estado = siguiente_estado
+
+
+# Hiperparámetros propios de cada modo, como atributos del agente
+PARAMETROS_MODO = ('pasos_planificacion', 'lambda_', 'n_pasos')
+
+MODOS = {
+    'q': AgenteQLearning,
+    'dyna': AgenteDynaQ,
+    'priorizado': AgenteDynaQ,
+    'qlambda': AgenteQLambda,
+    'npasos': AgenteNPasos,
+}
+
+
+def crear_agente(modo, num_estados, num_acciones, **parametros):
+    """
+    Crea un agente según el modo de aprendizaje
+
+    Args:
+        modo: 'q' (Q-Learning), 'dyna' (Dyna-Q), 'priorizado' (barrido priorizado),
+              'qlambda' (Q(λ) de Watkins) o 'npasos' (Q-Learning de n pasos)
+        num_estados: Número total de estados
+        num_acciones: Número de acciones
+        parametros: Hiperparámetros del agente; los que no aplican al modo se ignoran
+
+    Returns:
+        Instancia del agente
+    """
+    if modo not in MODOS:
+        raise ValueError(f"Modo desconocido: {modo}")
+
+    base = {clave: parametros[clave] for clave in ('alpha', 'gamma', 'epsilon', 'almacenamiento', 'dtype')
+            if clave in parametros}
+    if modo == 'q':
+        return AgenteQLearning(num_estados, num_acciones, **base)
+    if modo == 'qlambda':
+        return AgenteQLambda(num_estados, num_acciones, lambda_=parametros.get('lambda_', 0.9), **base)
+    if modo == 'npasos':
+        return AgenteNPasos(num_estados, num_acciones, n_pasos=parametros.get('n_pasos', 3), **base)
+
+    return AgenteDynaQ(num_estados, num_acciones,
+                       pasos_planificacion=parametros.get('pasos_planificacion', 10),
+                       priorizado=(modo == 'priorizado'), **base)
@@ -0,0 +1,253 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+from entorno import GridWorld
+from agente import crear_agente, PARAMETROS_MODO
+from tablas import convertir_tabla
+
+class AlmacenModelos:
+    """
+    Almacén indexado de modelos entrenados
+
+    Cada tabla Q se guarda como un archivo .npy independiente y un manifiesto
+    JSON Lines de solo anexado registra el identificador, los hiperparámetros,
+    la cuadrícula y las métricas de cada modelo. El siguiente identificador se
+    mantiene en memoria, así que guardar no depende del número de modelos
+    existentes, y las tablas se abren con np.load(mmap_mode=...) sin leerlas
+    enteras a memoria.
+    """
+
+    def __init__(self, carpeta='modelos'):
+        """
+        Inicializa el almacén
+
+        Args:
+            carpeta: Carpeta donde guardar las tablas y el manifiesto
+        """
+        self.carpeta = carpeta
+        self.ruta_manifiesto = os.path.join(carpeta, 'manifiesto.jsonl')
+        self.modelos = {}
+        self.siguiente_id = 1
+        self._lock = threading.Lock()
+
+        os.makedirs(carpeta, exist_ok=True)
+        self._leer_manifiesto()
+
+    def _leer_manifiesto(self):
+        """Reconstruye el índice en memoria a partir del manifiesto"""
+        if not os.path.exists(self.ruta_manifiesto):
+            return
+
+        completa = True
+        with open(self.ruta_manifiesto, 'r', encoding='utf-8') as f:
+            for linea in f:
+                completa = linea.endswith('\n')
+                linea = linea.strip()
+                if not linea:
+                    continue
+                try:
+                    entrada = json.loads(linea)
+                except json.JSONDecodeError:
+                    # Línea truncada por una escritura interrumpida
+                    continue
+
+                id_modelo = entrada['id']
+                self.siguiente_id = max(self.siguiente_id, id_modelo + 1)
+                if entrada.get('borrado'):
+                    self.modelos.pop(id_modelo, None)
+                else:
+                    self.modelos[id_modelo] = entrada
+
+        if not completa:
+            # Se cierra la línea truncada para que la siguiente anotación no se pegue a ella
+            with open(self.ruta_manifiesto, 'a', encoding='utf-8') as f:
+                f.write('\n')
+
+    def _anotar(self, entrada):
+        with open(self.ruta_manifiesto, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entrada) + '\n')
+
+    def _ruta_tabla(self, entrada):
+        return os.path.join(self.carpeta, entrada['archivo'])
+
+    def guardar(self, agente, entorno=None, metricas=None, **extra):
+        """
+        Guarda la tabla Q del agente y registra el modelo en el manifiesto
+
+        Args:
+            agente: Objeto AgenteQLearning
+            entorno: GridWorld opcional cuya cuadrícula se registra
+            metricas: Diccionario opcional de métricas (tasa de éxito, ...)
+            extra: Campos adicionales a registrar en el manifiesto
+
+        Returns:
+            Identificador del modelo guardado
+        """
+        return self.guardar_tabla(agente.tabla_q, self.hiperparametros(agente),
+                                  entorno=entorno, metricas=metricas, **extra)
+
+    def guardar_tabla(self, tabla_q, hiperparametros, entorno=None, metricas=None, **extra):
+        """
+        Guarda una tabla Q ya copiada junto a sus hiperparámetros
+
+        Permite guardar instantáneas tomadas en otro hilo sin acceder al agente.
+
+        Returns:
+            Identificador del modelo guardado
+        """
+        with self._lock:
+            id_modelo = self.siguiente_id
+            self.siguiente_id += 1
+
+        archivo = f"q_{id_modelo:08d}.npy"
+        ruta = os.path.join(self.carpeta, archivo)
+        ruta_temporal = ruta + '.tmp'
+        with open(ruta_temporal, 'wb') as f:
+            np.save(f, np.asarray(tabla_q))
+        os.replace(ruta_temporal, ruta)
+
+        entrada = {
+            'id': id_modelo,
+            'archivo': archivo,
+            'creado': time.time(),
+            'hiperparametros': hiperparametros,
+            'entorno': self.describir_entorno(entorno) if entorno is not None else None,
+            'metricas': metricas or {}
+        }
+        entrada.update(extra)
+
+        with self._lock:
+            self._anotar(entrada)
+            self.modelos[id_modelo] = entrada
+
+        return id_modelo
+
+    @staticmethod
+    def hiperparametros(agente):
+        """Retorna los hiperparámetros del agente como diccionario"""
+        almacenamiento, dtype = agente.almacenamiento
+        parametros = {
+            'modo': agente.modo,
+            'almacenamiento': almacenamiento,
+            'dtype': dtype,
+            'num_estados': agente.num_estados,
+            'num_acciones': agente.num_acciones,
+            'alpha': agente.alpha,
+            'gamma': agente.gamma,
+            'epsilon': agente.epsilon
+        }
+        # Solo los del modo del agente, p. ej. lambda_ en qlambda
+        for nombre in PARAMETROS_MODO:
+            if hasattr(agente, nombre):
+                parametros[nombre] = getattr(agente, nombre)
+        return parametros
+
+    @staticmethod
+    def describir_entorno(entorno):
+        """Retorna la configuración de la cuadrícula como diccionario serializable"""
+        return {
+            'size': entorno.size,
+            'max_pasos': entorno.max_pasos,
+            'inicio': list(entorno.inicio),
+            'tesoro': list(entorno.tesoro),
+            'trampas': [list(t) for t in sorted(entorno.trampas)]
+        }
+
+    def obtener(self, id_modelo):
+        """Retorna la entrada del manifiesto de un modelo, o None"""
+        with self._lock:
+            return self.modelos.get(id_modelo)
+
+    def listar(self, **filtros):
+        """
+        Lista los modelos registrados
+
+        Args:
+            filtros: Campos de primer nivel que deben coincidir (por ejemplo ejecucion='abc')
+
+        Returns:
+            Lista de entradas ordenada por identificador
+        """
+        with self._lock:
+            entradas = list(self.modelos.values())
+        return [
+            e for e in sorted(entradas, key=lambda e: e['id'])
+            if all(e.get(clave) == valor for clave, valor in filtros.items())
+        ]
+
+    def cargar_tabla(self, id_modelo, solo_lectura=True):
+        """
+        Abre la tabla Q de un modelo mapeada en memoria
+
+        Args:
+            id_modelo: Identificador del modelo
+            solo_lectura: Si True la tabla es de solo lectura; si False se
+                          abre en copia-en-escritura para seguir entrenando
+                          sin modificar el archivo
+        """
+        entrada = self.obtener(id_modelo)
+        if entrada is None:
+            raise KeyError(f"Modelo no encontrado: {id_modelo}")
+        return np.load(self._ruta_tabla(entrada), mmap_mode='r' if solo_lectura else 'c')
+
+    def cargar(self, id_modelo, agente=None, solo_lectura=True):
+        """
+        Carga un modelo en un agente
+
+        Args:
+            id_modelo: Identificador del modelo
+            agente: Agente donde cargar la tabla; si es None se crea uno nuevo
+            solo_lectura: Ver cargar_tabla. Para seguir entrenando, una tabla
+                          guardada desde un almacenamiento disperso se
+                          vuelve a convertir a ese almacenamiento
+
+        Returns:
+            El agente con la tabla Q y los hiperparámetros del modelo
+        """
+        entrada = self.obtener(id_modelo)
+        tabla_q = self.cargar_tabla(id_modelo, solo_lectura)
+        parametros = entrada['hiperparametros']
+
+        if agente is None:
+            agente = crear_agente(parametros.get('modo', 'q'), parametros['num_estados'],
+                                  parametros['num_acciones'],
+                                  **{nombre: parametros[nombre] for nombre in PARAMETROS_MODO if nombre in parametros})
+
+        almacenamiento = parametros.get('almacenamiento', 'densa')
+        if not solo_lectura and almacenamiento != 'densa':
+            tabla_q = convertir_tabla(tabla_q, almacenamiento)
+
+        agente.tabla_q = tabla_q
+        agente.num_estados = parametros['num_estados']
+        agente.num_acciones = parametros['num_acciones']
+        agente.alpha = parametros['alpha']
+        agente.gamma = parametros['gamma']
+        agente.epsilon = parametros['epsilon']
+        return agente
+
+    def cargar_entorno(self, id_modelo):
+        """Reconstruye el GridWorld con el que se entrenó un modelo, o None"""
+        entrada = self.obtener(id_modelo)
+        if entrada is None:
+            raise KeyError(f"Modelo no encontrado: {id_modelo}")
+
+        config = entrada.get('entorno')
+        if config is None:
+            return None
+        return GridWorld(size=config['size'], max_pasos=config['max_pasos'], trampas=config['trampas'])
+
+    def borrar(self, id_modelo):
+        """Elimina un modelo y su tabla"""
+        with self._lock:
+            entrada = self.modelos.pop(id_modelo, None)
+            if entrada is None:
+                return False
+            self._anotar({'id': id_modelo, 'borrado': True})
+
+        try:
+            os.remove(self._ruta_tabla(entrada))
+        except FileNotFoundError:
+            pass
+        return True
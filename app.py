@@ -1,17 +1,72 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, send_file, url_for, g
 from flask_sock import Sock
 import json
+import os
+import math
+import numpy as np
+import queue
 import time
 from entorno import GridWorld
-from agente import AgenteQLearning
+from agente import crear_agente
+from almacen import AlmacenModelos
+from planificacion import brecha_optimalidad, iteracion_valor, precalentar, recorrido_greedy
+from puntos_control import PuntosControl, reanudar
+from trabajos import GestorTrabajos
+from barrido import Barrido, generar_combinaciones, muestrear_combinaciones
+from metricas import metricas, perfilar_muestreo
+from graficas import FORMATOS, GRAFICAS, CacheGraficas, Renderizador
+from grabacion import LectorEpisodios
+from transmision import Transmisor
+from sesiones import RegistroSesiones, estimar_bytes, estimar_modelo
 
 app = Flask(__name__)
 sock = Sock(app)
 
 # Variables globales
-entorno_global = GridWorld()
-agente_global = AgenteQLearning(entorno_global.get_num_estados(), entorno_global.get_num_acciones())
-entrenamiento_activo = False
+registro_sesiones = RegistroSesiones('resultados/sesiones')
+almacen_modelos = AlmacenModelos('modelos')
+gestor_trabajos = GestorTrabajos(almacen=almacen_modelos)
+# Barridos lanzados desde la API; los terminados más antiguos se olvidan
+# (sus resultados siguen en resultados/barridos/)
+barridos = {}
+MAX_BARRIDOS = 100
+renderizador = Renderizador(CacheGraficas('resultados/cache_graficas'))
+
+metricas.registrar_medidor('cola_envio_max', lambda: max(gestor_trabajos.colas_envio(), default=0))
+metricas.registrar_medidor('cola_envio_total', lambda: sum(gestor_trabajos.colas_envio()))
+metricas.registrar_medidor('trabajos_activos',
+                           lambda: sum(1 for t in gestor_trabajos.listar() if t.estado == 'ejecutando'))
+metricas.registrar_medidor('sesiones_residentes', lambda: registro_sesiones.resumen()['residentes'])
+metricas.registrar_medidor('bytes_sesiones', lambda: registro_sesiones.bytes_residentes)
+
+def _sesion():
+    """
+    Sesión del cliente, identificada por la cookie `sesion` (o la cabecera
+    X-Sesion); si no existe se crea una y se envía su cookie en la respuesta
+    """
+    id_sesion = request.cookies.get('sesion') or request.headers.get('X-Sesion')
+    sesion = registro_sesiones.obtener(id_sesion)
+    if sesion.id != id_sesion:
+        g.sesion_nueva = sesion.id
+    return sesion
+
+@app.after_request
+def _enviar_cookie_sesion(respuesta):
+    id_sesion = g.pop('sesion_nueva', None)
+    if id_sesion is not None:
+        respuesta.set_cookie('sesion', id_sesion, httponly=True, samesite='Lax')
+    return respuesta
+
+def _sesion_ocupada():
+    """Error 409 de una sesión con un entrenamiento en curso"""
+    return jsonify({'status': 'error',
+                    'mensaje': 'Hay un entrenamiento en curso en esta sesión; detenlo antes de cambiar el agente'}), 409
+
+def _sesion_libre(sesion):
+    """Error 409 si la sesión tiene un entrenamiento en curso, o None"""
+    if sesion.en_uso():
+        return _sesion_ocupada()
+    return None
 
 @app.route('/')
 def index():
@@ -21,12 +76,17 @@ def index():
 @app.route('/agente')
 def agente():
     """Página del agente"""
+    # Crea la sesión antes de que la página abra el WebSocket, que no puede fijar cookies
+    _sesion()
     return render_template('agente.html')
 
 @app.route('/api/configurar', methods=['POST'])
 def configurar():
-    """Configura el entorno y el agente"""
-    global entorno_global, agente_global
+    """Configura el entorno y el agente de la sesión"""
+    sesion = _sesion()
+    ocupada = _sesion_libre(sesion)
+    if ocupada is not None:
+        return ocupada
 
     try:
         data = request.get_json()
@@ -36,112 +96,635 @@ def configurar():
         alpha = float(data.get('alpha', 0.1))
         gamma = float(data.get('gamma', 0.9))
         epsilon = float(data.get('epsilon', 0.1))
+        modo = data.get('modo', 'q')
+        pasos_planificacion = int(data.get('pasos_planificacion', 10))
+        lambda_ = float(data.get('lambda', 0.9))
+        n_pasos = int(data.get('n_pasos', 3))
+        almacenamiento = data.get('almacenamiento', 'densa')
+        dtype = data.get('dtype', 'float64')
+        semilla = data.get('semilla')
+        resoluble = bool(data.get('resoluble', False))
+
+        # Comprueba el presupuesto de memoria antes de reservar las tablas
+        num_estados, num_acciones = size * size, 4
+        necesarios = estimar_bytes(num_estados, num_acciones, modo, almacenamiento, dtype)
+        reserva = registro_sesiones.reservar(registro_sesiones.estimar_reemplazo(sesion, necesarios),
+                                             excepto=sesion)
 
-        entorno_global = GridWorld(size=size, num_trampas=num_trampas, max_pasos=max_pasos)
+        try:
+            entorno = GridWorld(size=size, num_trampas=num_trampas, max_pasos=max_pasos,
+                                semilla=int(semilla) if semilla is not None else None, resoluble=resoluble)
 
-        agente_global = AgenteQLearning(
-            num_estados=entorno_global.get_num_estados(),
-            num_acciones=entorno_global.get_num_acciones(),
-            alpha=alpha,
-            gamma=gamma,
-            epsilon=epsilon
-        )
+            agente = crear_agente(
+                modo,
+                num_estados=entorno.get_num_estados(),
+                num_acciones=entorno.get_num_acciones(),
+                alpha=alpha,
+                gamma=gamma,
+                epsilon=epsilon,
+                pasos_planificacion=pasos_planificacion,
+                lambda_=lambda_,
+                n_pasos=n_pasos,
+                almacenamiento=almacenamiento,
+                dtype=dtype
+            )
+
+            if data.get('precalentar'):
+                precalentar(agente, entorno)
+        except Exception:
+            registro_sesiones.liberar_reserva(reserva)
+            raise
+        registro_sesiones.reemplazar(sesion, entorno, agente, reserva)
 
         return jsonify({
             'status': 'success',
-            'entorno': entorno_global.get_estado_grid()
+            'entorno': entorno.get_estado_grid()
         })
+    except MemoryError as e:
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 503
     except Exception as e:
         return jsonify({'status': 'error', 'mensaje': str(e)}), 400
 
+def _config_programa(programa, num_episodios):
+    """Normaliza un programa de ε o α: {'tipo', 'final', 'duracion'}, o None"""
+    if not programa or programa.get('tipo', 'constante') == 'constante':
+        return None
+    final = programa.get('final')
+    return {
+        'tipo': programa['tipo'],
+        'final': float(final) if final is not None else None,
+        'duracion': int(programa.get('duracion', num_episodios))
+    }
+
+def _config_parada(parada):
+    """Normaliza los criterios de parada: delta_q, politica_estable, meseta y ventana"""
+    if not parada:
+        return None
+    delta_q = parada.get('delta_q')
+    meseta = parada.get('meseta')
+    return {
+        'delta_q': float(delta_q) if delta_q is not None else None,
+        'politica_estable': bool(parada.get('politica_estable', False)),
+        'meseta': float(meseta) if meseta is not None else None,
+        'ventana': int(parada.get('ventana', 100))
+    }
+
+def _config_trabajo(config):
+    """Extrae los parámetros de un trabajo de entrenamiento"""
+    punto_control_cada = config.get('punto_control_cada')
+    punto_control_segundos = config.get('punto_control_segundos')
+    num_episodios = int(config.get('num_episodios', 100))
+    return {
+        'num_episodios': num_episodios,
+        'velocidad': float(config.get('velocidad', 0.01)),  # Segundos de delay
+        'fps': min(max(float(config.get('fps', 30)), 1), 60),
+        'punto_control_cada': int(punto_control_cada) if punto_control_cada else None,
+        'punto_control_segundos': float(punto_control_segundos) if punto_control_segundos else None,
+        'grabar': bool(config.get('grabar', False)),
+        'programa_epsilon': _config_programa(config.get('programa_epsilon'), num_episodios),
+        'programa_alpha': _config_programa(config.get('programa_alpha'), num_episodios),
+        'parada': _config_parada(config.get('parada'))
+    }
+
+def _retransmitir(ws, trabajo):
+    """Reenvía el progreso de un trabajo a un WebSocket hasta que termine o se desconecte"""
+    suscripcion = trabajo.suscribir()
+    try:
+        while True:
+            try:
+                mensaje = suscripcion.recibir(timeout=1.0)
+            except queue.Empty:
+                if not ws.connected:
+                    break
+                continue
+            if mensaje is None:
+                break
+            if metricas.activo:
+                inicio = time.perf_counter()
+                ws.send(mensaje)
+                metricas.medir('envio', time.perf_counter() - inicio)
+                metricas.sumar('mensajes_enviados')
+                metricas.sumar('bytes_enviados', len(mensaje))
+            else:
+                ws.send(mensaje)
+    finally:
+        trabajo.desuscribir(suscripcion)
+
+def _entrenar_en_sesion(sesion, config):
+    """Lanza un trabajo con el agente de una sesión según la configuración enviada por el WebSocket"""
+    config = _config_trabajo(config)
+    trabajo = registro_sesiones.iniciar_trabajo(
+        sesion, lambda entorno, agente: gestor_trabajos.crear(entorno, agente, **config))
+    if trabajo is None:
+        raise RuntimeError("Ya hay un entrenamiento en curso en esta sesión")
+    return trabajo
+
 @sock.route('/ws/entrenar')
 def entrenar_ws(ws):
     """WebSocket para entrenamiento en tiempo real"""
-    global entorno_global, agente_global, entrenamiento_activo
-
-    entrenamiento_activo = True
-
     try:
         config_msg = ws.receive()
         config = json.loads(config_msg)
 
-        num_episodios = int(config.get('num_episodios', 100))
-        velocidad = float(config.get('velocidad', 0.01))  # Segundos de delay
+        trabajo = _entrenar_en_sesion(_sesion(), config)
+        ws.send(json.dumps({'tipo': 'trabajo', 'id': trabajo.id}))
 
-        victorias = 0
+        _retransmitir(ws, trabajo)
 
-        for episodio in range(num_episodios):
-            if not entrenamiento_activo:
-                break
+        time.sleep(0.1)
 
-            estado = entorno_global.reset()
-            estado_indice = entorno_global.estado_a_indice(estado)
+    except Exception as e:
+        ws.send(json.dumps({
+            'tipo': 'error',
+            'mensaje': str(e)
+        }))
 
-            pasos_episodio = 0
-            exito = False
+@sock.route('/ws/trabajos/<id_trabajo>')
+def trabajo_ws(ws, id_trabajo):
+    """WebSocket para observar un trabajo de entrenamiento existente"""
+    trabajo = gestor_trabajos.obtener(id_trabajo)
+    if trabajo is None:
+        ws.send(json.dumps({'tipo': 'error', 'mensaje': f"Trabajo no encontrado: {id_trabajo}"}))
+        return
+    _retransmitir(ws, trabajo)
 
-            # Ejecutar episodio
-            while True:
-                accion = agente_global.elegir_accion(estado_indice, entrenar=True)
+def _abrir_grabacion(id_trabajo):
+    """Lector del registro de episodios de un trabajo, o None si no existe"""
+    if not id_trabajo.isalnum():
+        return None
+    try:
+        return LectorEpisodios(gestor_trabajos.ruta_grabacion(id_trabajo))
+    except FileNotFoundError:
+        return None
 
-                siguiente_estado, recompensa, terminado, info = entorno_global.step(accion)
-                siguiente_estado_indice = entorno_global.estado_a_indice(siguiente_estado)
+@sock.route('/ws/repeticion/<id_trabajo>')
+def repeticion_ws(ws, id_trabajo):
+    """
+    WebSocket que reproduce episodios grabados de un trabajo
 
-                agente_global.actualizar_q(estado_indice, accion, recompensa,
-                                          siguiente_estado_indice, terminado)
+    Usa el mismo protocolo que /ws/entrenar (inicio y frames), decodificando
+    el registro en lugar de volver a ejecutar el entorno. Parámetros:
+    desde y hasta (episodios, ambos incluidos), velocidad (pasos por
+    segundo, 0 = sin límite) y fps.
+    """
+    _reproducir(ws, id_trabajo, request.args)
 
-                pasos_episodio = info['pasos']
-                estado_indice = siguiente_estado_indice
+def _reproducir(ws, id_trabajo, args):
+    """Reproduce una grabación por un WebSocket con send() y connected, según los parámetros de args"""
+    lector = _abrir_grabacion(id_trabajo)
+    if lector is None:
+        ws.send(json.dumps({'tipo': 'error', 'mensaje': f"Grabación no encontrada: {id_trabajo}"}))
+        return
 
-                ws.send(json.dumps({
-                    'tipo': 'paso',
-                    'grid': entorno_global.get_estado_grid(),
-                    'episodio': episodio + 1,
-                    'pasos': pasos_episodio
-                }))
+    try:
+        desde = args.get('desde', type=int)
+        hasta = args.get('hasta', type=int)
+        velocidad = max(float(args.get('velocidad', 100)), 0.0)
+        fps = min(max(float(args.get('fps', 30)), 1), 60)
 
-                time.sleep(velocidad)
+        transmisor = Transmisor(ws.send, fps=fps)
+        transmisor.inicio(lector.entorno)
+        reloj = time.perf_counter
+        comienzo = reloj()
+        pasos_emitidos = 0
+        episodios = victorias = 0
 
-                if terminado:
-                    exito = info.get('exito', False)
-                    if exito:
-                        victorias += 1
-                    break
+        for datos in lector.episodios(desde, hasta):
+            episodio = datos['episodio']
+            for pasos, estado in enumerate(datos['estados'][1:], 1):
+                transmisor.paso(episodio, pasos, estado)
+                pasos_emitidos += 1
+                if velocidad > 0:
+                    espera = comienzo + pasos_emitidos / velocidad - reloj()
+                    if espera > 0:
+                        time.sleep(espera)
 
-            ws.send(json.dumps({
-                'tipo': 'episodio_completo',
-                'episodio': episodio + 1,
-                'pasos': pasos_episodio,
-                'exito': exito,
+            episodios += 1
+            victorias += datos['exito']
+            transmisor.episodio({
+                'episodio': episodio,
+                'pasos': len(datos['acciones']),
+                'exito': datos['exito'],
                 'victorias': victorias,
-                'tasa_exito': (victorias / (episodio + 1)) * 100
-            }))
+                'tasa_exito': victorias / episodios * 100
+            })
+            if not ws.connected:
+                return
 
-        agente_global.guardar_modelo('modelo_agente.pkl')
+        transmisor.vaciar()
+        ws.send(json.dumps({'tipo': 'repeticion_completa', 'episodios': episodios, 'victorias': victorias}))
+    except Exception as e:
+        if ws.connected:
+            ws.send(json.dumps({'tipo': 'error', 'mensaje': str(e)}))
 
-        ws.send(json.dumps({
-            'tipo': 'entrenamiento_completo',
-            'episodios_totales': num_episodios,
-            'victorias': victorias,
-            'tasa_exito_final': (victorias / num_episodios) * 100
-        }))
-        
-        time.sleep(0.1)
+@app.route('/api/grabaciones/<id_trabajo>', methods=['GET'])
+def consultar_grabacion(id_trabajo):
+    """Resumen del registro de episodios de un trabajo, o un episodio decodificado con ?episodio=N"""
+    lector = _abrir_grabacion(id_trabajo)
+    if lector is None:
+        return jsonify({'status': 'error', 'mensaje': 'Grabación no encontrada'}), 404
+
+    episodio = request.args.get('episodio', type=int)
+    if episodio is None:
+        return jsonify({'status': 'success', 'grabacion': lector.resumen()})
+    try:
+        datos = lector.decodificar(episodio)
+    except IndexError as e:
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 404
+    size = lector.entorno.size
+    return jsonify({'status': 'success', 'episodio': {
+        'episodio': episodio,
+        'posiciones': [divmod(estado, size) for estado in datos['estados']],
+        'acciones': datos['acciones'].tolist(),
+        'recompensas': datos['recompensas'].tolist(),
+        'eventos': datos['eventos'].tolist(),
+        'exito': datos['exito']
+    }})
+
+@app.route('/api/trabajos', methods=['GET'])
+def listar_trabajos():
+    """Lista los trabajos de entrenamiento de la sesión"""
+    return jsonify({'status': 'success', 'trabajos': [t.resumen() for t in _sesion().trabajos]})
+
+@app.route('/api/trabajos', methods=['POST'])
+def crear_trabajo():
+    """Lanza un trabajo de entrenamiento en segundo plano con el agente de la sesión"""
+    sesion = _sesion()
+    ocupada = _sesion_libre(sesion)
+    if ocupada is not None:
+        return ocupada
 
+    try:
+        data = request.get_json(silent=True) or {}
+        config = _config_trabajo(data)
+        config['velocidad'] = float(data.get('velocidad', 0))
+
+        if data.get('reanudar'):
+            # Continúa una ejecución desde su último punto de control, que pasa a ser el agente de la sesión
+            ultimo = PuntosControl.ultimo(almacen_modelos, data['reanudar'])
+            reserva = 0
+            if ultimo is not None:
+                necesarios = estimar_modelo(ultimo['hiperparametros'])
+                reserva = registro_sesiones.reservar(registro_sesiones.estimar_reemplazo(sesion, necesarios),
+                                                     excepto=sesion)
+            try:
+                entorno, agente, entrada = reanudar(almacen_modelos, data['reanudar'])
+            except Exception:
+                registro_sesiones.liberar_reserva(reserva)
+                raise
+            registro_sesiones.reemplazar(sesion, entorno, agente, reserva)
+            config['ejecucion'] = data['reanudar']
+            config['episodios_previos'] = entrada['episodio']
+            config['victorias_previas'] = entrada['metricas'].get('victorias', 0)
+
+        trabajo = registro_sesiones.iniciar_trabajo(
+            sesion, lambda entorno, agente: gestor_trabajos.crear(entorno, agente, **config))
+        if trabajo is None:
+            return _sesion_ocupada()
+        return jsonify({'status': 'success', 'trabajo': trabajo.resumen()})
+    except MemoryError as e:
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 503
     except Exception as e:
-        ws.send(json.dumps({
-            'tipo': 'error',
-            'mensaje': str(e)
-        }))
-    finally:
-        entrenamiento_activo = False
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 400
+
+@app.route('/api/trabajos/<id_trabajo>', methods=['GET'])
+def consultar_trabajo(id_trabajo):
+    """Consulta el estado de un trabajo"""
+    trabajo = gestor_trabajos.obtener(id_trabajo)
+    if trabajo is None:
+        return jsonify({'status': 'error', 'mensaje': 'Trabajo no encontrado'}), 404
+    return jsonify({'status': 'success', 'trabajo': trabajo.resumen()})
 
 @app.route('/api/detener', methods=['POST'])
 def detener():
-    """Detiene el entrenamiento"""
-    global entrenamiento_activo
-    entrenamiento_activo = False
-    return jsonify({'status': 'success'})
+    """Detiene un trabajo de la sesión, o todos sus trabajos activos si no se indica"""
+    data = request.get_json(silent=True) or {}
+    id_trabajo = data.get('trabajo')
+    sesion = _sesion()
+    detenidos = gestor_trabajos.detener(id_trabajo, trabajos=sesion.trabajos)
+    if id_trabajo is not None and not detenidos:
+        if gestor_trabajos.obtener(id_trabajo) is not None:
+            return jsonify({'status': 'error', 'mensaje': 'El trabajo pertenece a otra sesión'}), 403
+        return jsonify({'status': 'error', 'mensaje': 'Trabajo no encontrado'}), 404
+    return jsonify({'status': 'success', 'detenidos': [t.id for t in detenidos]})
+
+@app.route('/api/optimalidad', methods=['GET'])
+def optimalidad():
+    """Compara la política actual del agente con la óptima calculada por iteración de valor"""
+    sesion = _sesion()
+    entorno, agente = sesion.entorno, sesion.agente
+    q_optima, iteraciones = iteracion_valor(entorno, agente.gamma)
+    brecha = brecha_optimalidad(entorno, agente.tabla_q, q_optima, agente.gamma)
+    brecha['iteraciones'] = iteraciones
+    brecha['valor_optimo_inicio'] = float(q_optima[entorno.indice_inicio].max())
+    return jsonify({'status': 'success', 'optimalidad': brecha})
+
+@app.route('/api/modelos', methods=['GET'])
+def listar_modelos():
+    """Lista los modelos del almacén"""
+    modelos = [
+        {clave: valor for clave, valor in entrada.items() if clave != 'entorno'}
+        for entrada in almacen_modelos.listar()
+    ]
+    return jsonify({'status': 'success', 'modelos': modelos})
+
+@app.route('/api/modelos/<int:id_modelo>/cargar', methods=['POST'])
+def cargar_modelo(id_modelo):
+    """Carga un modelo del almacén como entorno y agente de la sesión"""
+    entrada = almacen_modelos.obtener(id_modelo)
+    if entrada is None:
+        return jsonify({'status': 'error', 'mensaje': 'Modelo no encontrado'}), 404
+    if entrada.get('entorno') is None:
+        return jsonify({'status': 'error', 'mensaje': 'El modelo no registra su cuadrícula'}), 400
+
+    sesion = _sesion()
+    ocupada = _sesion_libre(sesion)
+    if ocupada is not None:
+        return ocupada
+    try:
+        necesarios = estimar_modelo(entrada['hiperparametros'])
+        reserva = registro_sesiones.reservar(registro_sesiones.estimar_reemplazo(sesion, necesarios),
+                                             excepto=sesion)
+    except MemoryError as e:
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 503
+
+    try:
+        entorno = almacen_modelos.cargar_entorno(id_modelo)
+        agente = almacen_modelos.cargar(id_modelo, solo_lectura=False)
+    except Exception:
+        registro_sesiones.liberar_reserva(reserva)
+        raise
+    registro_sesiones.reemplazar(sesion, entorno, agente, reserva)
+
+    return jsonify({
+        'status': 'success',
+        'entorno': entorno.get_estado_grid()
+    })
+
+@app.route('/api/barrido', methods=['POST'])
+def lanzar_barrido():
+    """Lanza un barrido de hiperparámetros sobre la cuadrícula actual"""
+    try:
+        data = request.get_json(silent=True) or {}
+        num_episodios = int(data.get('num_episodios', 500))
+        semillas = [int(s) for s in data.get('semillas', [0, 1, 2])]
+        procesos = data.get('procesos')
+
+        if 'muestras' in data:
+            combinaciones = muestrear_combinaciones(int(data['muestras']), semillas)
+        else:
+            combinaciones = generar_combinaciones(
+                [float(a) for a in data.get('alphas', [0.05, 0.1, 0.3])],
+                [float(g) for g in data.get('gammas', [0.9, 0.99])],
+                [float(e) for e in data.get('epsilons', [0.05, 0.1, 0.2])],
+                semillas
+            )
+
+        barrido = Barrido(_sesion().entorno, combinaciones, num_episodios,
+                          procesos=int(procesos) if procesos else None)
+        terminados = [b for b in list(barridos.values()) if b.terminado]
+        for antiguo in terminados[:max(len(barridos) + 1 - MAX_BARRIDOS, 0)]:
+            barridos.pop(antiguo.id, None)
+        barridos[barrido.id] = barrido
+        barrido.iniciar()
+        return jsonify({'status': 'success', 'barrido': barrido.resumen()})
+    except Exception as e:
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 400
+
+@app.route('/api/barrido/<id_barrido>', methods=['GET'])
+def consultar_barrido(id_barrido):
+    """Consulta el progreso y los resultados de un barrido"""
+    barrido = barridos.get(id_barrido)
+    if barrido is None:
+        return jsonify({'status': 'error', 'mensaje': 'Barrido no encontrado'}), 404
+    ultimos = int(request.args.get('ultimos', 100))
+    return jsonify({'status': 'success', 'barrido': barrido.resumen(ultimos)})
+
+def _politica_de(id_trabajo):
+    """Entorno y agente de un trabajo o, sin trabajo, los de la sesión"""
+    if id_trabajo is None:
+        sesion = _sesion()
+        return sesion.entorno, sesion.agente
+    trabajo = gestor_trabajos.obtener(id_trabajo)
+    if trabajo is None or trabajo.liberado:
+        return None
+    return trabajo.entrenador.entorno, trabajo.entrenador.agente
+
+@app.route('/api/politica/acciones', methods=['GET', 'POST'])
+def consultar_acciones():
+    """
+    Acciones greedy y valores V(s) de un lote de estados
+
+    Los estados se indican como índices (`estados`) o como posiciones
+    [x, y] (`posiciones`); sin ninguno de los dos se retorna la política
+    completa. La respuesta sale de la política cacheada del agente, que solo
+    recalcula las filas modificadas desde la última consulta.
+    """
+    data = request.get_json(silent=True) or {}
+    id_trabajo = data.get('trabajo', request.args.get('trabajo'))
+    datos = _politica_de(id_trabajo)
+    if datos is None:
+        return jsonify({'status': 'error', 'mensaje': 'Trabajo no encontrado o ya liberado'}), 404
+    entorno, agente = datos
+
+    try:
+        if 'posiciones' in data:
+            posiciones = np.asarray(data['posiciones'], dtype=np.int64).reshape(-1, 2)
+            if ((posiciones < 0) | (posiciones >= entorno.size)).any():
+                raise ValueError("Posición fuera del grid")
+            estados = posiciones[:, 0] * entorno.size + posiciones[:, 1]
+        elif 'estados' in data or 'estados' in request.args:
+            estados = data.get('estados')
+            if estados is None:
+                estados = request.args['estados'].split(',')
+            estados = np.asarray(estados, dtype=np.int64).ravel()
+            if ((estados < 0) | (estados >= entorno.get_num_estados())).any():
+                raise ValueError("Estado fuera de rango")
+        else:
+            estados = slice(None)
+    except (TypeError, ValueError) as e:
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 400
+
+    acciones, valores = agente.politica.consultar(estados)
+    return jsonify({
+        'status': 'success',
+        'acciones': acciones.tolist(),
+        'valores': valores.tolist()
+    })
+
+@app.route('/api/politica/recorrido', methods=['GET'])
+def consultar_recorrido():
+    """
+    Recorrido greedy desde una celda (por defecto, el inicio)
+
+    Termina al llegar al tesoro, al repetir una celda (bucle) o tras
+    `max_pasos` pasos.
+    """
+    datos = _politica_de(request.args.get('trabajo'))
+    if datos is None:
+        return jsonify({'status': 'error', 'mensaje': 'Trabajo no encontrado o ya liberado'}), 404
+    entorno, agente = datos
+
+    try:
+        x = int(request.args.get('x', entorno.inicio[0]))
+        y = int(request.args.get('y', entorno.inicio[1]))
+        max_pasos = int(request.args.get('max_pasos', entorno.max_pasos))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 400
+    if not (0 <= x < entorno.size and 0 <= y < entorno.size) or max_pasos < 0:
+        return jsonify({'status': 'error', 'mensaje': 'Posición o número de pasos fuera de rango'}), 400
+
+    politica, _ = agente.politica.politica()
+    estados, motivo = recorrido_greedy(entorno, politica, max_pasos, inicio=x * entorno.size + y)
+    acciones = politica[estados[:-1]]
+    recompensa = entorno.recompensa[estados[:-1], acciones].sum()
+    return jsonify({
+        'status': 'success',
+        'posiciones': [divmod(estado, entorno.size) for estado in estados],
+        'acciones': acciones.tolist(),
+        'recompensa': float(recompensa),
+        'pasos': len(estados) - 1,
+        'motivo': motivo
+    })
+
+def _datos_graficas(id_trabajo):
+    """Estadísticas, entorno y trayectoria greedy de un trabajo (por defecto, el último de la sesión)"""
+    if id_trabajo is not None:
+        trabajo = gestor_trabajos.obtener(id_trabajo)
+    else:
+        trabajos = _sesion().trabajos
+        trabajo = trabajos[-1] if trabajos else None
+    if trabajo is None:
+        return None
+    return trabajo.datos_graficas()
+
+def _opciones_graficas():
+    formato = request.args.get('formato', 'png')
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}")
+    return {
+        'formato': formato,
+        'dpi': min(max(int(request.args.get('dpi', 150)), 50), 300),
+        'ventana': max(int(request.args.get('ventana', 50)), 1)
+    }
+
+def _enviar_grafica(ruta, clave, formato, inmutable=False):
+    """Envía una gráfica con ETag y Last-Modified para que el cliente pueda revalidarla"""
+    respuesta = send_file(os.path.abspath(ruta), mimetype=FORMATOS[formato], etag=clave, conditional=True,
+                          last_modified=os.path.getmtime(ruta))
+    if inmutable:
+        respuesta.cache_control.no_cache = None
+        respuesta.cache_control.public = True
+        respuesta.cache_control.max_age = 31536000
+        respuesta.cache_control.immutable = True
+    else:
+        respuesta.cache_control.no_cache = True
+    return respuesta
+
+@app.route('/api/graficas', methods=['GET'])
+def generar_graficas():
+    """
+    Genera en paralelo las gráficas de un trabajo y retorna sus URLs
+
+    Las gráficas cuyas entradas no cambiaron salen de la caché sin dibujarse.
+    """
+    try:
+        opciones = _opciones_graficas()
+        graficas = request.args.get('graficas')
+        graficas = graficas.split(',') if graficas else GRAFICAS
+        datos = _datos_graficas(request.args.get('trabajo'))
+        if datos is None:
+            return jsonify({'status': 'error', 'mensaje': 'No hay trabajos de entrenamiento'}), 404
+
+        resultados = renderizador.renderizar(*datos, graficas=graficas, **opciones)
+        return jsonify({'status': 'success', 'graficas': {
+            tipo: {'clave': clave,
+                   'url': url_for('grafica_cacheada', clave=clave, formato=opciones['formato'])}
+            for tipo, (clave, _) in resultados.items()
+        }})
+    except ValueError as e:
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 400
+
+@app.route('/api/graficas/<tipo>', methods=['GET'])
+def obtener_grafica(tipo):
+    """Devuelve una gráfica del trabajo indicado (o del último de la sesión), revalidable con ETag"""
+    try:
+        opciones = _opciones_graficas()
+        datos = _datos_graficas(request.args.get('trabajo'))
+        if datos is None:
+            return jsonify({'status': 'error', 'mensaje': 'No hay trabajos de entrenamiento'}), 404
+        clave, ruta = renderizador.renderizar(*datos, graficas=(tipo,), **opciones)[tipo]
+    except ValueError as e:
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 400
+    return _enviar_grafica(ruta, clave, opciones['formato'])
+
+@app.route('/api/graficas/cache/<clave>.<formato>', methods=['GET'])
+def grafica_cacheada(clave, formato):
+    """Devuelve una gráfica de la caché por su clave; su contenido nunca cambia"""
+    if formato not in FORMATOS or not clave.isalnum():
+        return jsonify({'status': 'error', 'mensaje': 'Gráfica no encontrada'}), 404
+    ruta = renderizador.cache.obtener(clave, formato)
+    if ruta is None:
+        return jsonify({'status': 'error', 'mensaje': 'Gráfica no encontrada'}), 404
+    return _enviar_grafica(ruta, clave, formato, inmutable=True)
+
+@app.route('/api/metricas', methods=['GET'])
+def consultar_metricas():
+    """Métricas de rendimiento en formato Prometheus (por defecto) o JSON (?formato=json)"""
+    if request.args.get('formato') == 'json':
+        return jsonify({'status': 'success', 'metricas': metricas.instantanea()})
+    return Response(metricas.prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/metricas', methods=['POST'])
+def configurar_metricas():
+    """Activa, desactiva o reinicia la instrumentación"""
+    data = request.get_json(silent=True) or {}
+    if data.get('reiniciar'):
+        metricas.reiniciar()
+    if 'activo' in data or 'detallado' in data:
+        metricas.activar(bool(data.get('activo', metricas.activo)), bool(data.get('detallado', False)))
+    return jsonify({'status': 'success', 'activo': metricas.activo, 'detallado': metricas.detallado})
+
+@app.route('/api/sesiones', methods=['GET'])
+def consultar_sesiones():
+    """Uso de memoria del registro de sesiones y estado de la sesión del cliente"""
+    sesion = _sesion()
+    return jsonify({'status': 'success', 'sesiones': registro_sesiones.resumen(), 'sesion': sesion.resumen()})
+
+@app.route('/api/perfil', methods=['GET'])
+def perfilar():
+    """
+    Perfila un trabajo en curso durante unos segundos
+
+    Con modo=muestreo (por defecto) se muestrea la pila del hilo del trabajo
+    sin frenarlo; con modo=cprofile se activa cProfile en el propio hilo.
+    """
+    try:
+        segundos = float(request.args.get('segundos', 5))
+        if math.isnan(segundos):
+            raise ValueError(segundos)
+    except ValueError:
+        return jsonify({'status': 'error', 'mensaje': 'segundos debe ser un número'}), 400
+    segundos = min(max(segundos, 0.1), 60)
+    modo = request.args.get('modo', 'muestreo')
+    id_trabajo = request.args.get('trabajo')
+
+    if id_trabajo is not None:
+        trabajo = gestor_trabajos.obtener(id_trabajo)
+    else:
+        activos = [t for t in gestor_trabajos.listar() if t.estado == 'ejecutando']
+        trabajo = activos[-1] if activos else None
+    if trabajo is None or trabajo.estado != 'ejecutando':
+        return jsonify({'status': 'error', 'mensaje': 'No hay un trabajo en ejecución que perfilar'}), 404
+
+    if modo == 'cprofile':
+        informe = trabajo.entrenador.solicitar_perfil(segundos).esperar(timeout=segundos + 30)
+        if informe is None:
+            return jsonify({'status': 'error', 'mensaje': 'La captura no terminó a tiempo'}), 504
+        return Response(informe, mimetype='text/plain')
+
+    perfil = perfilar_muestreo(trabajo.id_hilo, segundos)
+    return jsonify({'status': 'success', 'trabajo': trabajo.id, 'perfil': perfil})
 
 if __name__ == '__main__':
     app.run(debug=True)
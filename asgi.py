@@ -0,0 +1,318 @@
+"""
+Servidor ASGI para muchos espectadores a la vez
+
+Los WebSockets se atienden en un event loop de asyncio: cada trabajo tiene
+una sola suscripción por proceso y sus mensajes, ya serializados, se
+reparten a todas las conexiones que lo observan, cada una con su propia cola
+acotada. El resto de rutas se delegan en la aplicación Flask, que se ejecuta
+en un pool de hilos.
+
+    uvicorn asgi:aplicacion --ws wsproto
+    gunicorn -c gunicorn.conf.py
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qsl
+from a2wsgi import WSGIMiddleware
+from werkzeug.datastructures import MultiDict
+from app import app, gestor_trabajos, registro_sesiones, _entrenar_en_sesion, _reproducir
+from metricas import metricas
+
+
+async def _enviar_texto(send, mensaje):
+    """Envía un mensaje de texto por una conexión ASGI, midiéndolo si la instrumentación está activa"""
+    if not metricas.activo:
+        await send({'type': 'websocket.send', 'text': mensaje})
+        return
+    inicio = time.perf_counter()
+    await send({'type': 'websocket.send', 'text': mensaje})
+    metricas.medir('envio', time.perf_counter() - inicio)
+    metricas.sumar('mensajes_enviados')
+    metricas.sumar('bytes_enviados', len(mensaje))
+
+
+class Conexion:
+    """
+    Cola acotada de una conexión WebSocket en el event loop
+
+    Equivale a Suscripcion: si el cliente es lento y la cola se llena, los
+    frames nuevos se descartan; los mensajes críticos desplazan al más
+    antiguo. Solo se usa desde el hilo del event loop.
+    """
+
+    def __init__(self, send, max_mensajes=100):
+        """
+        Inicializa la conexión
+
+        Args:
+            send: Función send de ASGI de la conexión
+            max_mensajes: Tamaño de la cola
+        """
+        self.send = send
+        self.max_mensajes = max_mensajes
+        self.cola = deque()
+        self.descartados = 0
+        self._hay_mensajes = asyncio.Event()
+
+    def publicar(self, mensaje, critico=False):
+        """Encola un mensaje sin bloquear; None cierra la conexión tras vaciar la cola"""
+        if len(self.cola) >= self.max_mensajes:
+            self._descartar()
+            if not critico:
+                return
+            self.cola.popleft()
+        self.cola.append(mensaje)
+        self._hay_mensajes.set()
+
+    def _descartar(self):
+        self.descartados += 1
+        if metricas.activo:
+            metricas.sumar('mensajes_descartados')
+
+    async def enviar(self):
+        """Envía los mensajes encolados hasta encontrar None"""
+        while True:
+            await self._hay_mensajes.wait()
+            while self.cola:
+                mensaje = self.cola.popleft()
+                if mensaje is None:
+                    return
+                await _enviar_texto(self.send, mensaje)
+            self._hay_mensajes.clear()
+
+
+class Difusion:
+    """
+    Suscripción única a un trabajo, repartida a todas sus conexiones
+
+    El hilo del entrenamiento publica cada mensaje una sola vez y el reparto
+    se hace en el event loop, así que el coste para el entrenamiento no
+    depende del número de espectadores.
+    """
+
+    def __init__(self, difusor, trabajo):
+        """
+        Inicializa la difusión y la suscribe al trabajo
+
+        Args:
+            difusor: Difusor al que pertenece
+            trabajo: Trabajo observado
+        """
+        self.difusor = difusor
+        self.trabajo = trabajo
+        self.conexiones = set()
+        # Lo calcula el event loop en cada reparto; otros hilos solo leen el entero
+        self._pendientes = 0
+        trabajo.suscribir(suscripcion=self)
+
+    def publicar(self, mensaje, critico=False):
+        """Recibe un mensaje del trabajo desde cualquier hilo"""
+        try:
+            self.difusor.loop.call_soon_threadsafe(self._repartir, mensaje, critico)
+        except RuntimeError:
+            # El event loop se cerró al apagar el servidor: ya no hay conexiones
+            pass
+
+    def pendientes(self):
+        """Mensajes encolados en la conexión más retrasada, según el último reparto"""
+        return self._pendientes
+
+    def agregar(self, conexion):
+        """Añade una conexión, que empieza por la instantánea del grid"""
+        conexion.publicar(self.trabajo.mensaje_inicio(), critico=True)
+        self.conexiones.add(conexion)
+        self._medir()
+
+    def quitar(self, conexion):
+        """Quita una conexión; sin conexiones, la difusión deja de estar suscrita"""
+        self.conexiones.discard(conexion)
+        self._medir()
+        if not self.conexiones:
+            self.difusor.cerrar(self)
+
+    def _repartir(self, mensaje, critico):
+        for conexion in self.conexiones:
+            conexion.publicar(mensaje, critico)
+        self._medir()
+        if mensaje is None:
+            self.difusor.cerrar(self)
+
+    def _medir(self):
+        self._pendientes = max((len(conexion.cola) for conexion in self.conexiones), default=0)
+
+
+class Difusor:
+    """Difusiones activas por trabajo, todas en el mismo event loop"""
+
+    def __init__(self):
+        """Inicializa el difusor; el event loop se toma en la primera conexión"""
+        self.loop = None
+        self.difusiones = {}
+
+    def conectar(self, trabajo, conexion):
+        """Añade una conexión a la difusión de un trabajo, creándola si hace falta"""
+        self.loop = asyncio.get_running_loop()
+        difusion = self.difusiones.get(trabajo.id)
+        if difusion is None:
+            difusion = self.difusiones[trabajo.id] = Difusion(self, trabajo)
+        difusion.agregar(conexion)
+        return difusion
+
+    def cerrar(self, difusion):
+        """Desuscribe una difusión de su trabajo"""
+        if self.difusiones.get(difusion.trabajo.id) is difusion:
+            del self.difusiones[difusion.trabajo.id]
+        difusion.trabajo.desuscribir(difusion)
+
+    def conexiones(self):
+        """Número de conexiones abiertas"""
+        return sum(len(difusion.conexiones) for difusion in list(self.difusiones.values()))
+
+
+class _WebSocketHilo:
+    """
+    Interfaz de flask_sock (send y connected) sobre una conexión ASGI, para
+    los manejadores síncronos que se ejecutan en un hilo
+    """
+
+    def __init__(self, loop, send):
+        self.loop = loop
+        self._send = send
+        self.connected = True
+
+    def send(self, mensaje):
+        asyncio.run_coroutine_threadsafe(_enviar_texto(self._send, mensaje), self.loop).result()
+
+
+async def _esperar_desconexion(receive):
+    while (await receive())['type'] != 'websocket.disconnect':
+        pass
+
+
+def _id_sesion(scope):
+    """Identificador de sesión de la cookie `sesion` o de la cabecera X-Sesion"""
+    cabeceras = dict(scope.get('headers', []))
+    cookies = SimpleCookie(cabeceras.get(b'cookie', b'').decode('latin-1'))
+    if 'sesion' in cookies:
+        return cookies['sesion'].value
+    return cabeceras.get(b'x-sesion', b'').decode('latin-1') or None
+
+
+class AplicacionAsgi:
+    """
+    Aplicación ASGI: /ws/entrenar, /ws/trabajos/<id> y /ws/repeticion/<id>
+    en el event loop, y el resto de rutas en la aplicación Flask
+    """
+
+    def __init__(self, app_wsgi, hilos_wsgi=16, max_mensajes=100):
+        """
+        Inicializa la aplicación
+
+        Args:
+            app_wsgi: Aplicación Flask
+            hilos_wsgi: Hilos del pool que atiende las rutas HTTP
+            max_mensajes: Tamaño de la cola de cada conexión WebSocket
+        """
+        self.http = WSGIMiddleware(app_wsgi, workers=hilos_wsgi)
+        self.max_mensajes = max_mensajes
+        self.difusor = Difusor()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'websocket':
+            await self.http(scope, receive, send)
+            return
+
+        ruta = scope['path'].rstrip('/').split('/')[1:]
+        if ruta == ['ws', 'entrenar']:
+            await self._entrenar(scope, receive, send)
+        elif len(ruta) == 3 and ruta[:2] == ['ws', 'trabajos']:
+            await self._trabajo(ruta[2], receive, send)
+        elif len(ruta) == 3 and ruta[:2] == ['ws', 'repeticion']:
+            await self._repeticion(scope, ruta[2], receive, send)
+        else:
+            await send({'type': 'websocket.close', 'code': 1008})
+
+    async def _aceptar(self, receive, send):
+        if (await receive())['type'] != 'websocket.connect':
+            return False
+        await send({'type': 'websocket.accept'})
+        return True
+
+    async def _entrenar(self, scope, receive, send):
+        """Equivalente de /ws/entrenar: recibe la configuración, lanza el trabajo y lo retransmite"""
+        if not await self._aceptar(receive, send):
+            return
+        try:
+            mensaje = await receive()
+            if mensaje['type'] == 'websocket.disconnect':
+                return
+            config = json.loads(mensaje.get('text') or mensaje.get('bytes'))
+
+            # Restaurar la sesión o crear el trabajo puede tocar el disco
+            loop = asyncio.get_running_loop()
+            sesion = await loop.run_in_executor(None, registro_sesiones.obtener, _id_sesion(scope))
+            trabajo = await loop.run_in_executor(None, _entrenar_en_sesion, sesion, config)
+            await send({'type': 'websocket.send', 'text': json.dumps({'tipo': 'trabajo', 'id': trabajo.id})})
+        except Exception as e:
+            await send({'type': 'websocket.send', 'text': json.dumps({'tipo': 'error', 'mensaje': str(e)})})
+            await send({'type': 'websocket.close', 'code': 1000})
+            return
+        await self._retransmitir(trabajo, receive, send)
+
+    async def _trabajo(self, id_trabajo, receive, send):
+        """Equivalente de /ws/trabajos/<id>"""
+        if not await self._aceptar(receive, send):
+            return
+        trabajo = gestor_trabajos.obtener(id_trabajo)
+        if trabajo is None:
+            await send({'type': 'websocket.send',
+                        'text': json.dumps({'tipo': 'error', 'mensaje': f"Trabajo no encontrado: {id_trabajo}"})})
+            await send({'type': 'websocket.close', 'code': 1000})
+            return
+        await self._retransmitir(trabajo, receive, send)
+
+    async def _retransmitir(self, trabajo, receive, send):
+        """Envía el progreso de un trabajo hasta que termine o el cliente se desconecte"""
+        conexion = Conexion(send, self.max_mensajes)
+        difusion = self.difusor.conectar(trabajo, conexion)
+        envio = asyncio.ensure_future(conexion.enviar())
+        desconexion = asyncio.ensure_future(_esperar_desconexion(receive))
+        try:
+            await asyncio.wait((envio, desconexion), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            difusion.quitar(conexion)
+            envio.cancel()
+            desconexion.cancel()
+        if not desconexion.cancelled() and desconexion.done():
+            return
+        await send({'type': 'websocket.close', 'code': 1000})
+
+    async def _repeticion(self, scope, id_trabajo, receive, send):
+        """
+        Equivalente de /ws/repeticion/<id>
+
+        Cada repetición lee su propio registro a su propio ritmo, así que no
+        se difunde: se ejecuta el manejador síncrono en un hilo.
+        """
+        if not await self._aceptar(receive, send):
+            return
+        loop = asyncio.get_running_loop()
+        ws = _WebSocketHilo(loop, send)
+        args = MultiDict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        reproduccion = loop.run_in_executor(None, _reproducir, ws, id_trabajo, args)
+        desconexion = asyncio.ensure_future(_esperar_desconexion(receive))
+        await asyncio.wait((reproduccion, desconexion), return_when=asyncio.FIRST_COMPLETED)
+        if desconexion.done():
+            ws.connected = False
+            await reproduccion
+            return
+        desconexion.cancel()
+        await send({'type': 'websocket.close', 'code': 1000})
+
+
+aplicacion = AplicacionAsgi(app)
+
+metricas.registrar_medidor('conexiones_ws', aplicacion.difusor.conexiones)
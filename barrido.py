@@ -0,0 +1,265 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from entorno import GridWorld
+from agente import AgenteQLearning
+from entrenar import Entrenador
+
+def generar_combinaciones(alphas, gammas, epsilons, semillas):
+    """
+    Genera la rejilla completa de hiperparámetros
+
+    Returns:
+        Lista de diccionarios con alpha, gamma, epsilon y semilla
+    """
+    return [
+        {'alpha': alpha, 'gamma': gamma, 'epsilon': epsilon, 'semilla': semilla}
+        for alpha, gamma, epsilon, semilla in itertools.product(alphas, gammas, epsilons, semillas)
+    ]
+
+
+def muestrear_combinaciones(num_muestras, semillas, rango_alpha=(0.01, 1.0),
+                            rango_gamma=(0.5, 0.999), rango_epsilon=(0.0, 0.5), semilla=None):
+    """
+    Genera combinaciones aleatorias de hiperparámetros (búsqueda aleatoria)
+
+    Cada muestra se entrena con todas las semillas indicadas.
+
+    Returns:
+        Lista de diccionarios con alpha, gamma, epsilon y semilla
+    """
+    rng = np.random.default_rng(semilla)
+    combinaciones = []
+    for _ in range(num_muestras):
+        alpha = float(rng.uniform(*rango_alpha))
+        gamma = float(rng.uniform(*rango_gamma))
+        epsilon = float(rng.uniform(*rango_epsilon))
+        for s in semillas:
+            combinaciones.append({'alpha': alpha, 'gamma': gamma, 'epsilon': epsilon, 'semilla': s})
+    return combinaciones
+
+
+def _entrenar_combinacion(tarea):
+    """Entrena una combinación en un proceso del pool y retorna sus estadísticas"""
+    layout, combinacion, num_episodios = tarea
+
+    random.seed(combinacion['semilla'])
+    np.random.seed(combinacion['semilla'])
+
+    entorno = GridWorld(size=layout['size'], max_pasos=layout['max_pasos'], trampas=layout['trampas'])
+    agente = AgenteQLearning(entorno.get_num_estados(), entorno.get_num_acciones(),
+                             alpha=combinacion['alpha'], gamma=combinacion['gamma'],
+                             epsilon=combinacion['epsilon'])
+    estadisticas = Entrenador(entorno, agente).entrenar(num_episodios)
+
+    return (np.asarray(estadisticas['recompensas'], dtype=np.int32),
+            np.asarray(estadisticas['pasos'], dtype=np.int32),
+            np.asarray(estadisticas['exitos'], dtype=np.int8))
+
+
+def ejecutar_barrido(entorno, combinaciones, num_episodios, procesos=None, ruta=None, al_progreso=None):
+    """
+    Entrena cada combinación de hiperparámetros sobre la misma cuadrícula
+    repartiendo el trabajo entre todos los núcleos
+
+    Args:
+        entorno: GridWorld cuya cuadrícula comparten todas las combinaciones
+        combinaciones: Lista de diccionarios con alpha, gamma, epsilon y semilla
+        num_episodios: Episodios por combinación
+        procesos: Número de procesos (por defecto, todos los núcleos)
+        ruta: Archivo .npz opcional donde guardar los resultados
+        al_progreso: Función opcional llamada con (completadas, total)
+
+    Returns:
+        Diccionario de arrays: hiperparámetros de forma (C,) y recompensas,
+        pasos y éxitos de forma (C, num_episodios)
+    """
+    layout = {
+        'size': entorno.size,
+        'max_pasos': entorno.max_pasos,
+        'trampas': sorted(entorno.trampas)
+    }
+    total = len(combinaciones)
+
+    resultados = {
+        'alpha': np.array([c['alpha'] for c in combinaciones], dtype=np.float64),
+        'gamma': np.array([c['gamma'] for c in combinaciones], dtype=np.float64),
+        'epsilon': np.array([c['epsilon'] for c in combinaciones], dtype=np.float64),
+        'semilla': np.array([c['semilla'] for c in combinaciones], dtype=np.int64),
+        'recompensas': np.zeros((total, num_episodios), dtype=np.int32),
+        'pasos': np.zeros((total, num_episodios), dtype=np.int32),
+        'exitos': np.zeros((total, num_episodios), dtype=np.int8),
+    }
+
+    tareas = [(layout, c, num_episodios) for c in combinaciones]
+    # spawn evita heredar hilos y locks del proceso servidor
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as pool:
+        for i, (recompensas, pasos, exitos) in enumerate(pool.map(_entrenar_combinacion, tareas)):
+            resultados['recompensas'][i] = recompensas
+            resultados['pasos'][i] = pasos
+            resultados['exitos'][i] = exitos
+            if al_progreso is not None:
+                al_progreso(i + 1, total)
+
+    if ruta is not None:
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        np.savez_compressed(ruta, **resultados)
+
+    return resultados
+
+
+def resumir(resultados, ultimos=100):
+    """
+    Resume cada combinación con sus métricas en los últimos episodios
+
+    Returns:
+        Lista de diccionarios ordenada por tasa de éxito y recompensa media
+    """
+    filas = []
+    for i in range(len(resultados['alpha'])):
+        filas.append({
+            'alpha': float(resultados['alpha'][i]),
+            'gamma': float(resultados['gamma'][i]),
+            'epsilon': float(resultados['epsilon'][i]),
+            'semilla': int(resultados['semilla'][i]),
+            'recompensa_media': float(np.mean(resultados['recompensas'][i, -ultimos:])),
+            'pasos_medios': float(np.mean(resultados['pasos'][i, -ultimos:])),
+            'tasa_exito': float(np.mean(resultados['exitos'][i, -ultimos:]) * 100)
+        })
+    filas.sort(key=lambda f: (f['tasa_exito'], f['recompensa_media']), reverse=True)
+    return filas
+
+
+class Barrido:
+    """
+    Barrido de hiperparámetros ejecutado en segundo plano
+
+    Al terminar, los resultados solo quedan en el archivo .npz y el barrido
+    suelta el entorno, así que un barrido terminado apenas ocupa memoria.
+    """
+
+    def __init__(self, entorno, combinaciones, num_episodios, procesos=None,
+                 carpeta_salida='resultados/barridos'):
+        """
+        Inicializa el barrido
+
+        Args:
+            entorno: GridWorld cuya cuadrícula comparten todas las combinaciones
+            combinaciones: Lista de diccionarios con alpha, gamma, epsilon y semilla
+            num_episodios: Episodios por combinación
+            procesos: Número de procesos (por defecto, todos los núcleos)
+            carpeta_salida: Carpeta donde guardar el archivo de resultados
+        """
+        self.id = uuid.uuid4().hex[:12]
+        self.entorno = entorno
+        self.combinaciones = combinaciones
+        self.num_episodios = num_episodios
+        self.procesos = procesos
+        self.ruta = os.path.join(carpeta_salida, f"barrido_{self.id}.npz")
+
+        self.estado = 'pendiente'
+        self.completadas = 0
+        self.error = None
+        self.duracion = None
+
+        self._hilo = threading.Thread(target=self._ejecutar, name=f"barrido-{self.id}", daemon=True)
+
+    def iniciar(self):
+        """Arranca el barrido en un hilo"""
+        self.estado = 'ejecutando'
+        self._hilo.start()
+
+    def _ejecutar(self):
+        inicio = time.perf_counter()
+
+        def al_progreso(completadas, total):
+            self.completadas = completadas
+
+        try:
+            ejecutar_barrido(self.entorno, self.combinaciones, self.num_episodios,
+                             procesos=self.procesos, ruta=self.ruta, al_progreso=al_progreso)
+            self.estado = 'completado'
+        except Exception as e:
+            self.error = str(e)
+            self.estado = 'error'
+        self.entorno = None
+        self.duracion = time.perf_counter() - inicio
+
+    @property
+    def terminado(self):
+        """Si el barrido ya no está en curso"""
+        return self.estado in ('completado', 'error')
+
+    def cargar_resultados(self):
+        """Lee los resultados del archivo .npz de un barrido completado"""
+        with np.load(self.ruta) as datos:
+            return {clave: datos[clave] for clave in datos.files}
+
+    def resumen(self, ultimos=100):
+        """Retorna el estado del barrido y, si terminó, su tabla resumida"""
+        datos = {
+            'id': self.id,
+            'estado': self.estado,
+            'combinaciones': len(self.combinaciones),
+            'completadas': self.completadas,
+            'num_episodios': self.num_episodios,
+            'duracion': self.duracion
+        }
+        if self.estado == 'completado':
+            datos['archivo'] = self.ruta
+            datos['resultados'] = resumir(self.cargar_resultados(), ultimos)
+        if self.error is not None:
+            datos['mensaje'] = self.error
+        return datos
+
+
+def main(argv=None):
+    """Punto de entrada de línea de comandos"""
+    parser = argparse.ArgumentParser(description='Barrido de hiperparámetros de Q-Learning')
+    parser.add_argument('--episodios', type=int, default=1000, help='Episodios por combinación')
+    parser.add_argument('--size', type=int, default=10, help='Tamaño del grid')
+    parser.add_argument('--trampas', type=int, default=10, help='Número de trampas')
+    parser.add_argument('--max-pasos', type=int, default=200, help='Máximo de pasos por episodio')
+    parser.add_argument('--semilla-grid', type=int, default=None,
+                        help='Semilla de la disposición de las trampas')
+    parser.add_argument('--resoluble', action='store_true',
+                        help='Garantizar un camino sin trampas del inicio al tesoro')
+    parser.add_argument('--alphas', type=float, nargs='+', default=[0.05, 0.1, 0.3, 0.5])
+    parser.add_argument('--gammas', type=float, nargs='+', default=[0.9, 0.95, 0.99])
+    parser.add_argument('--epsilons', type=float, nargs='+', default=[0.05, 0.1, 0.2])
+    parser.add_argument('--semillas', type=int, nargs='+', default=[0, 1, 2])
+    parser.add_argument('--muestras', type=int, default=None,
+                        help='Número de combinaciones aleatorias en lugar de la rejilla completa')
+    parser.add_argument('--procesos', type=int, default=None, help='Número de procesos')
+    parser.add_argument('--salida', default='resultados/barridos/barrido.npz', help='Archivo de resultados')
+    args = parser.parse_args(argv)
+
+    entorno = GridWorld(size=args.size, num_trampas=args.trampas, max_pasos=args.max_pasos,
+                       semilla=args.semilla_grid, resoluble=args.resoluble)
+    if args.muestras is not None:
+        combinaciones = muestrear_combinaciones(args.muestras, args.semillas)
+    else:
+        combinaciones = generar_combinaciones(args.alphas, args.gammas, args.epsilons, args.semillas)
+
+    inicio = time.perf_counter()
+    resultados = ejecutar_barrido(entorno, combinaciones, args.episodios,
+                                  procesos=args.procesos, ruta=args.salida)
+    print(f"{len(combinaciones)} combinaciones en {time.perf_counter() - inicio:.2f}s")
+    print(f"Resultados guardados en: {args.salida}")
+
+    for fila in resumir(resultados)[:10]:
+        print(f"alpha={fila['alpha']:.3f} gamma={fila['gamma']:.3f} epsilon={fila['epsilon']:.3f} "
+              f"semilla={fila['semilla']} | éxito: {fila['tasa_exito']:.1f}% | "
+              f"recompensa: {fila['recompensa_media']:.1f}")
+
+
+if __name__ == '__main__':
+    main()
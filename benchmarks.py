@@ -0,0 +1,432 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from entorno import GridWorld, VectorGridWorld
+from agente import MODOS, AgenteQLearning, crear_agente
+from entrenar import Entrenador
+
+# Las métricas terminadas en estos sufijos mejoran al subir o al bajar; el
+# resto no se comparan
+SUFIJOS_MAYOR_ES_MEJOR = ('_por_segundo',)
+SUFIJOS_MENOR_ES_MEJOR = ('_segundos', '_ms', 'episodios_objetivo')
+
+
+def _medir(funcion, duracion):
+    """Repite funcion durante `duracion` segundos y retorna (repeticiones, segundos)"""
+    repeticiones = 0
+    inicio = time.perf_counter()
+    fin = inicio + duracion
+    while True:
+        funcion()
+        repeticiones += 1
+        ahora = time.perf_counter()
+        if ahora >= fin:
+            return repeticiones, ahora - inicio
+
+
+def _crear_entorno(size, densidad):
+    num_trampas = int(size * size * densidad)
+    return GridWorld(size=size, num_trampas=num_trampas, max_pasos=max(200, 4 * size))
+
+
+def bench_entorno(size=10, densidad=0.1, duracion=1.0, lote=1000):
+    """Pasos por segundo de GridWorld.step, GridWorld.step_idx y VectorGridWorld.step"""
+    entorno = _crear_entorno(size, densidad)
+    acciones = [random.randrange(4) for _ in range(lote)]
+    resultados = {}
+
+    def con_step():
+        for accion in acciones:
+            _, _, terminado, _ = entorno.step(accion)
+            if terminado:
+                entorno.reset()
+
+    entorno.reset()
+    repeticiones, segundos = _medir(con_step, duracion)
+    resultados['step.pasos_por_segundo'] = repeticiones * lote / segundos
+
+    def con_step_idx():
+        estado = entorno.indice_agente
+        for accion in acciones:
+            estado, _, terminado, _ = entorno.step_idx(estado, accion)
+            if terminado:
+                entorno.reset()
+                estado = entorno.indice_agente
+
+    entorno.reset()
+    repeticiones, segundos = _medir(con_step_idx, duracion)
+    resultados['step_idx.pasos_por_segundo'] = repeticiones * lote / segundos
+
+    vectorial = VectorGridWorld(lote, entorno=entorno)
+    acciones_lote = np.random.randint(0, 4, lote)
+    repeticiones, segundos = _medir(lambda: vectorial.step(acciones_lote), duracion)
+    resultados['vectorial.pasos_por_segundo'] = repeticiones * lote / segundos
+
+    return resultados
+
+
+def bench_agente(size=10, duracion=1.0, lote=1000):
+    """Operaciones por segundo de elegir_accion/actualizar_q y de sus versiones por lotes"""
+    num_estados = size * size
+    agente = AgenteQLearning(num_estados, 4)
+    agente.tabla_q[:] = np.random.random((num_estados, 4))
+    agente.politica.invalidar()
+
+    estados = np.random.randint(0, num_estados, lote)
+    acciones = np.random.randint(0, 4, lote)
+    recompensas = np.random.randint(-10, 10, lote)
+    siguientes = np.random.randint(0, num_estados, lote)
+    terminados = np.random.random(lote) < 0.05
+
+    estados_l = estados.tolist()
+    acciones_l = acciones.tolist()
+    recompensas_l = recompensas.tolist()
+    siguientes_l = siguientes.tolist()
+    terminados_l = terminados.tolist()
+
+    resultados = {}
+
+    def elegir():
+        for estado in estados_l:
+            agente.elegir_accion(estado)
+
+    repeticiones, segundos = _medir(elegir, duracion)
+    resultados['elegir_accion.ops_por_segundo'] = repeticiones * lote / segundos
+
+    def actualizar():
+        for i in range(lote):
+            agente.actualizar_q(estados_l[i], acciones_l[i], recompensas_l[i],
+                                siguientes_l[i], terminados_l[i])
+
+    repeticiones, segundos = _medir(actualizar, duracion)
+    resultados['actualizar_q.ops_por_segundo'] = repeticiones * lote / segundos
+
+    repeticiones, segundos = _medir(lambda: agente.elegir_acciones(estados), duracion)
+    resultados['elegir_acciones.ops_por_segundo'] = repeticiones * lote / segundos
+
+    repeticiones, segundos = _medir(
+        lambda: agente.actualizar_q_lote(estados, acciones, recompensas, siguientes, terminados), duracion)
+    resultados['actualizar_q_lote.ops_por_segundo'] = repeticiones * lote / segundos
+
+    return resultados
+
+
+def bench_episodios(size=10, densidad=0.1, objetivo=90.0, ventana=100, max_segundos=10.0, semilla=0,
+                    modo='q'):
+    """
+    Episodios por segundo y tiempo hasta alcanzar una tasa de éxito objetivo
+
+    La tasa de éxito se mide sobre los últimos `ventana` episodios. Si no se
+    alcanza en `max_segundos`, el tiempo hasta el objetivo queda en None.
+    Con la misma semilla, todos los modos entrenan sobre el mismo grid.
+    """
+    random.seed(semilla)
+    np.random.seed(semilla)
+    entorno = _crear_entorno(size, densidad)
+    agente = crear_agente(modo, entorno.get_num_estados(), entorno.get_num_acciones())
+    entrenador = Entrenador(entorno, agente)
+
+    exitos = []
+    pasos_totales = 0
+    tiempo_objetivo = None
+    episodios_objetivo = None
+
+    inicio = time.perf_counter()
+    while True:
+        _, pasos, exito = entrenador.ejecutar_episodio()
+        entrenador.episodios_completados += 1
+        exitos.append(1 if exito else 0)
+        pasos_totales += pasos
+
+        transcurrido = time.perf_counter() - inicio
+        if (tiempo_objetivo is None and len(exitos) >= ventana and
+                sum(exitos[-ventana:]) * 100 / ventana >= objetivo):
+            tiempo_objetivo = transcurrido
+            episodios_objetivo = len(exitos)
+        if tiempo_objetivo is not None or transcurrido >= max_segundos:
+            break
+
+    return {
+        'episodios_por_segundo': len(exitos) / transcurrido,
+        'pasos_por_segundo': pasos_totales / transcurrido,
+        'tiempo_objetivo_segundos': tiempo_objetivo,
+        'episodios_objetivo': episodios_objetivo
+    }
+
+
+def bench_websocket(num_episodios=2000, fps=60):
+    """
+    Rendimiento de extremo a extremo de /ws/entrenar con un servidor y un
+    cliente WebSocket locales en el mismo proceso
+    """
+    import simple_websocket
+    from werkzeug.serving import make_server
+    import app as aplicacion
+
+    servidor = make_server('127.0.0.1', 0, aplicacion.app, threaded=True)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+
+    try:
+        inicio = time.perf_counter()
+        cliente = simple_websocket.Client.connect(f"ws://127.0.0.1:{servidor.server_port}/ws/entrenar")
+        cliente.send(json.dumps({'num_episodios': num_episodios, 'velocidad': 0, 'fps': fps}))
+
+        mensajes = 0
+        bytes_recibidos = 0
+        latencia_inicio = None
+        llegadas = []
+
+        while True:
+            mensaje = cliente.receive(timeout=60)
+            if mensaje is None:
+                break
+            ahora = time.perf_counter()
+            if latencia_inicio is None:
+                latencia_inicio = ahora - inicio
+            llegadas.append(ahora)
+            mensajes += 1
+            bytes_recibidos += len(mensaje)
+            if json.loads(mensaje)['tipo'] in ('entrenamiento_completo', 'error'):
+                break
+
+        duracion = time.perf_counter() - inicio
+        cliente.close()
+    finally:
+        servidor.shutdown()
+
+    intervalos = np.diff(llegadas) * 1000 if len(llegadas) > 1 else np.zeros(1)
+    return {
+        'mensajes_por_segundo': mensajes / duracion,
+        'bytes_por_segundo': bytes_recibidos / duracion,
+        'episodios_por_segundo': num_episodios / duracion,
+        'latencia_inicio_ms': latencia_inicio * 1000 if latencia_inicio is not None else None,
+        'intervalo_p50_ms': float(np.percentile(intervalos, 50)),
+        'intervalo_p99_ms': float(np.percentile(intervalos, 99)),
+        'duracion_segundos': duracion
+    }
+
+
+def bench_difusion(espectadores=200, num_episodios=20000, fps=30):
+    """
+    Reparto de un entrenamiento a muchos espectadores con el servidor ASGI
+
+    Lanza un trabajo en un uvicorn local y conecta `espectadores` clientes
+    a /ws/trabajos/<id> mientras entrena. Mide los episodios por
+    segundo del entrenamiento, que no debería caer con el número de
+    espectadores, y los mensajes entregados a cada uno.
+    """
+    import simple_websocket
+    import uvicorn
+    import asgi
+
+    servidor = uvicorn.Server(uvicorn.Config(asgi.aplicacion, host='127.0.0.1', port=0, log_level='warning'))
+    hilo = threading.Thread(target=servidor.run, daemon=True)
+    hilo.start()
+    while not servidor.started:
+        time.sleep(0.01)
+    puerto = servidor.servers[0].sockets[0].getsockname()[1]
+
+    recibidos = [0] * espectadores
+
+    def observar(i, id_trabajo):
+        cliente = simple_websocket.Client.connect(f"ws://127.0.0.1:{puerto}/ws/trabajos/{id_trabajo}")
+        while True:
+            mensaje = cliente.receive(timeout=120)
+            if mensaje is None:
+                break
+            recibidos[i] += 1
+            if json.loads(mensaje)['tipo'] in ('entrenamiento_completo', 'error'):
+                break
+        cliente.close()
+
+    try:
+        entorno = GridWorld(size=10, num_trampas=10)
+        agente = AgenteQLearning(entorno.get_num_estados(), entorno.get_num_acciones())
+        trabajo = asgi.gestor_trabajos.crear(entorno, agente, num_episodios, velocidad=0, fps=fps)
+        inicio = time.perf_counter()
+        hilos = [threading.Thread(target=observar, args=(i, trabajo.id), daemon=True)
+                 for i in range(espectadores)]
+        for hilo_espectador in hilos:
+            hilo_espectador.start()
+        trabajo.esperar()
+        duracion = time.perf_counter() - inicio
+        for hilo_espectador in hilos:
+            hilo_espectador.join(timeout=30)
+    finally:
+        servidor.should_exit = True
+        hilo.join(timeout=10)
+
+    return {
+        'episodios_por_segundo': trabajo.entrenador.episodios_completados / duracion,
+        'mensajes_por_segundo': sum(recibidos) / duracion,
+        'mensajes_min_espectador': min(recibidos, default=0),
+        'duracion_segundos': duracion
+    }
+
+
+def bench_paralelo(size=50, densidad=0.1, procesos=2, num_episodios=20000, semilla=0):
+    """Episodios por segundo del entrenamiento Hogwild con `procesos` trabajadores"""
+    from paralelo import EntrenadorParalelo
+
+    np.random.seed(semilla)
+    entorno = _crear_entorno(size, densidad)
+    agente = AgenteQLearning(entorno.get_num_estados(), entorno.get_num_acciones())
+    entrenador = EntrenadorParalelo(entorno, agente, procesos=procesos, semilla=semilla)
+
+    inicio = time.perf_counter()
+    estadisticas = entrenador.entrenar(num_episodios, cada_ms=1000)
+    duracion = time.perf_counter() - inicio
+    return {
+        'episodios_por_segundo': num_episodios / duracion,
+        'pasos_por_segundo': sum(estadisticas['pasos']) / duracion,
+        'tasa_exito_final': sum(estadisticas['exitos'][-1000:]) / min(num_episodios, 1000) * 100
+    }
+
+
+def ejecutar(tamanos=(10, 50, 100, 500), densidades=(0.05, 0.1, 0.2), duracion=1.0,
+             max_segundos=10.0, objetivo=90.0, websocket=True, modos=('q',), espectadores=0,
+             procesos=()):
+    """
+    Ejecuta la batería completa
+
+    Returns:
+        Diccionario con metadatos y un diccionario plano de métricas
+    """
+    resultados = {}
+
+    def agregar(prefijo, metricas):
+        for nombre, valor in metricas.items():
+            resultados[f"{prefijo}.{nombre}"] = valor
+
+    for size in tamanos:
+        print(f"Entorno y agente: size={size}")
+        agregar(f"entorno.size{size}", bench_entorno(size, duracion=duracion))
+        agregar(f"agente.size{size}", bench_agente(size, duracion=duracion))
+
+        for densidad in densidades:
+            for modo in modos:
+                print(f"Episodios: size={size} densidad={densidad} modo={modo}")
+                # El modo q conserva los nombres previos para comparar con bases antiguas
+                sufijo = '' if modo == 'q' else f".{modo}"
+                agregar(f"episodios.size{size}.densidad{densidad}{sufijo}",
+                        bench_episodios(size, densidad, objetivo=objetivo, max_segundos=max_segundos,
+                                        modo=modo))
+
+    for num_procesos in procesos:
+        print(f"Hogwild: {num_procesos} procesos")
+        agregar(f"paralelo.procesos{num_procesos}", bench_paralelo(procesos=num_procesos))
+
+    if websocket:
+        print("WebSocket /ws/entrenar")
+        agregar("websocket", bench_websocket())
+    if espectadores:
+        print(f"Difusión ASGI a {espectadores} espectadores")
+        agregar(f"difusion.espectadores{espectadores}", bench_difusion(espectadores))
+
+    return {
+        'meta': {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'plataforma': platform.platform(),
+            'procesador': platform.processor()
+        },
+        'resultados': resultados
+    }
+
+
+def comparar(actual, base, tolerancia=0.1):
+    """
+    Compara dos ejecuciones y detecta regresiones
+
+    Args:
+        actual: Resultado de ejecutar()
+        base: Resultado de referencia
+        tolerancia: Empeoramiento relativo permitido (0.1 = 10%)
+
+    Returns:
+        Lista de regresiones (nombre, base, actual, cambio relativo). Una
+        métrica que la base tiene y la ejecución actual no (por ejemplo, un
+        objetivo que ya no se alcanza) es una regresión con actual y cambio None
+    """
+    regresiones = []
+    for nombre, valor_base in base['resultados'].items():
+        mayor_es_mejor = nombre.endswith(SUFIJOS_MAYOR_ES_MEJOR)
+        if valor_base is None or not (mayor_es_mejor or nombre.endswith(SUFIJOS_MENOR_ES_MEJOR)):
+            continue
+        valor = actual['resultados'].get(nombre)
+        if valor is None:
+            regresiones.append((nombre, valor_base, None, None))
+            continue
+        if valor_base == 0:
+            continue
+
+        cambio = (valor - valor_base) / abs(valor_base)
+        empeora = cambio < -tolerancia if mayor_es_mejor else cambio > tolerancia
+
+        if empeora:
+            regresiones.append((nombre, valor_base, valor, cambio))
+    return regresiones
+
+
+def main(argv=None):
+    """Punto de entrada de línea de comandos"""
+    parser = argparse.ArgumentParser(description='Benchmarks del entorno, el agente, el entrenamiento y el WebSocket')
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[10, 50, 100, 500])
+    parser.add_argument('--densidades', type=float, nargs='+', default=[0.05, 0.1, 0.2])
+    parser.add_argument('--duracion', type=float, default=1.0, help='Segundos por microbenchmark')
+    parser.add_argument('--max-segundos', type=float, default=10.0,
+                        help='Límite para alcanzar la tasa de éxito objetivo')
+    parser.add_argument('--objetivo', type=float, default=90.0, help='Tasa de éxito objetivo (%%)')
+    parser.add_argument('--modos', nargs='+', default=['q'], choices=sorted(MODOS),
+                        help='Modos de aprendizaje a comparar en el tiempo hasta el objetivo')
+    parser.add_argument('--sin-websocket', action='store_true', help='Omitir el benchmark del WebSocket')
+    parser.add_argument('--espectadores', type=int, default=0,
+                        help='Medir el reparto por el servidor ASGI a N espectadores (requiere uvicorn)')
+    parser.add_argument('--procesos', type=int, nargs='+', default=[],
+                        help='Medir el entrenamiento Hogwild con cada número de procesos')
+    parser.add_argument('--salida', default='benchmark.json', help='Archivo JSON de resultados')
+    parser.add_argument('--base', default=None, help='Archivo JSON de referencia para detectar regresiones')
+    parser.add_argument('--tolerancia', type=float, default=0.1, help='Empeoramiento relativo permitido')
+    args = parser.parse_args(argv)
+
+    actual = ejecutar(args.tamanos, args.densidades, args.duracion, args.max_segundos,
+                      args.objetivo, websocket=not args.sin_websocket, modos=args.modos,
+                      espectadores=args.espectadores, procesos=args.procesos)
+
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(actual, f, indent=2)
+    print(f"Resultados guardados en: {args.salida}")
+
+    for nombre, valor in actual['resultados'].items():
+        print(f"  {nombre}: {valor:.4g}" if isinstance(valor, float) else f"  {nombre}: {valor}")
+
+    if args.base is None:
+        return 0
+
+    with open(args.base, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+
+    regresiones = comparar(actual, base, args.tolerancia)
+    if not regresiones:
+        print(f"Sin regresiones respecto a {args.base}")
+        return 0
+
+    print(f"Regresiones respecto a {args.base}:")
+    for nombre, valor_base, valor, cambio in regresiones:
+        if valor is None:
+            print(f"  {nombre}: {valor_base:.4g} -> sin valor")
+        else:
+            print(f"  {nombre}: {valor_base:.4g} -> {valor:.4g} ({cambio:+.1%})")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
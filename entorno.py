@@ -1,12 +1,119 @@
 import numpy as np
-import random
+from array import array
+from functools import lru_cache
+
+# Códigos de evento compactos (índices en EVENTOS)
+EVENTO_PASO = 0
+EVENTO_PARED = 1
+EVENTO_TRAMPA = 2
+EVENTO_TESORO = 3
+EVENTO_MAX_PASOS = 4
+
+EVENTOS = ("paso", "pared", "trampa", "tesoro", "max_pasos")
+
+# Desplazamiento (dx, dy) de cada acción: 0=Arriba, 1=Abajo, 2=Izquierda, 3=Derecha
+DELTAS_X = np.array([-1, 1, 0, 0])
+DELTAS_Y = np.array([0, 0, -1, 1])
+NUM_ACCIONES = len(DELTAS_X)
+
+# Intentos de muestreo libre antes de reservar un camino al tesoro
+INTENTOS_RESOLUBLE = 5
+
+
+def alcanzable(size, bloqueado, origen, destino):
+    """
+    Si `destino` es alcanzable desde `origen` sin pisar celdas bloqueadas
+
+    BFS por frentes: cada iteración expande a la vez todas las celdas a la
+    misma distancia, así que el coste en Python depende de la longitud del
+    camino y no del número de celdas.
+
+    Args:
+        size: Tamaño del grid
+        bloqueado: Array booleano plano de size * size celdas
+        origen: Índice de la celda de partida
+        destino: Índice de la celda buscada
+    """
+    visitado = bloqueado.copy()
+    visitado[origen] = True
+    frente = np.array([origen])
+    while frente.size and not visitado[destino]:
+        x, y = np.divmod(frente, size)
+        vecinos = np.concatenate((
+            frente[x > 0] - size,
+            frente[x < size - 1] + size,
+            frente[y > 0] - 1,
+            frente[y < size - 1] + 1
+        ))
+        frente = np.unique(vecinos[~visitado[vecinos]])
+        visitado[frente] = True
+    return bool(visitado[destino])
+
+
+def _muestrear_trampas(size, num_trampas, aleatorio, resoluble):
+    """Índices de las trampas, muestreados sin reemplazo entre las celdas libres"""
+    tesoro = size * size - 1
+    # Todas las celdas salvo el inicio (0) y el tesoro
+    libres = np.arange(1, tesoro)
+    if not resoluble:
+        return np.sort(aleatorio.choice(libres, num_trampas, replace=False))
+
+    bloqueado = np.zeros(size * size, dtype=bool)
+    for _ in range(INTENTOS_RESOLUBLE):
+        trampas = aleatorio.choice(libres, num_trampas, replace=False)
+        bloqueado[:] = False
+        bloqueado[trampas] = True
+        if alcanzable(size, bloqueado, 0, tesoro):
+            return np.sort(trampas)
+
+    # Grid demasiado denso: reserva un camino monótono aleatorio al tesoro y
+    # muestrea las trampas entre las celdas restantes
+    movimientos = aleatorio.permutation(np.repeat([size, 1], size - 1))
+    camino = np.cumsum(movimientos)[:-1]
+    libres = np.setdiff1d(libres, camino, assume_unique=True)
+    if num_trampas > libres.size:
+        raise ValueError(f"Con {num_trampas} trampas no queda ningún camino sin trampas al tesoro "
+                         f"(máximo {libres.size} en un grid de {size}x{size})")
+    return np.sort(aleatorio.choice(libres, num_trampas, replace=False))
+
+
+@lru_cache(maxsize=128)
+def _trampas_cacheadas(size, num_trampas, semilla, resoluble):
+    trampas = _muestrear_trampas(size, num_trampas, np.random.RandomState(semilla), resoluble)
+    trampas.setflags(write=False)
+    return trampas
+
+
+def generar_trampas(size, num_trampas, semilla=None, resoluble=False):
+    """
+    Coloca las trampas de un grid con el inicio en (0, 0) y el tesoro en la esquina opuesta
+
+    Args:
+        size: Tamaño del grid
+        num_trampas: Número de trampas
+        semilla: Semilla del muestreo; con semilla, la disposición se guarda en
+                 caché por (size, num_trampas, semilla, resoluble) y repetirla
+                 es inmediato. Sin ella se usa el estado global de np.random
+        resoluble: Garantizar que existe un camino al tesoro sin trampas
+
+    Returns:
+        Array ordenado con el índice de estado de cada trampa
+
+    Raises:
+        ValueError: Si las trampas no caben (o no dejan camino, con resoluble)
+    """
+    if not 0 <= num_trampas <= max(size * size - 2, 0):
+        raise ValueError(f"Número de trampas fuera de rango para un grid de {size}x{size}: {num_trampas}")
+    if semilla is None:
+        return _muestrear_trampas(size, num_trampas, np.random, resoluble)
+    return _trampas_cacheadas(size, num_trampas, int(semilla), bool(resoluble))
 
 class GridWorld:
     """
     Entorno GridWorld donde un agente busca un tesoro evitando trampas
     """
 
-    def __init__(self, size=10, num_trampas=10, max_pasos=200):
+    def __init__(self, size=10, num_trampas=10, max_pasos=200, trampas=None, semilla=None, resoluble=False):
         """
         Inicializa el entorno
 
@@ -14,6 +121,10 @@ class GridWorld:
             size: Tamaño del grid (size x size)
             num_trampas: Número de trampas
             max_pasos: Máximo número de pasos por episodio
+            trampas: Posiciones (x, y) de trampas predefinidas; si se indican
+                     se usan en lugar de generarlas aleatoriamente
+            semilla: Semilla de la disposición aleatoria de las trampas
+            resoluble: Garantizar un camino sin trampas del inicio al tesoro
         """
         self.size = size
         self.num_trampas = num_trampas
@@ -22,7 +133,17 @@ class GridWorld:
         self.inicio = (0, 0)
         self.tesoro = (size-1, size-1)
 
-        self.trampas = self._generar_trampas()
+        if trampas is not None:
+            self.trampas = {tuple(t) for t in trampas}
+            self.num_trampas = len(self.trampas)
+            indices_trampas = [self.estado_a_indice(trampa) for trampa in self.trampas]
+        else:
+            indices_trampas = generar_trampas(size, num_trampas, semilla, resoluble)
+            x, y = np.divmod(indices_trampas, size)
+            self.trampas = set(zip(x.tolist(), y.tolist()))
+
+        self.indice_inicio = self.estado_a_indice(self.inicio)
+        self.indice_tesoro = self.estado_a_indice(self.tesoro)
 
         self.posicion_agente = self.inicio
         self.pasos_actuales = 0
@@ -30,15 +151,67 @@ class GridWorld:
         # Acciones: 0=Arriba, 1=Abajo, 2=Izquierda, 3=Derecha
         self.acciones = [0, 1, 2, 3]
 
-    def _generar_trampas(self):
-        """Genera posiciones aleatorias para las trampas"""
-        trampas = set()
-        while len(trampas) < self.num_trampas:
-            x = random.randint(0, self.size - 1)
-            y = random.randint(0, self.size - 1)
-            if (x, y) != self.inicio and (x, y) != self.tesoro:
-                trampas.add((x, y))
-        return trampas
+        self._compilar_tablas(indices_trampas)
+
+    @property
+    def posicion_agente(self):
+        """Posición (x, y) del agente, derivada de su índice de estado"""
+        return divmod(self.indice_agente, self.size)
+
+    @posicion_agente.setter
+    def posicion_agente(self, posicion):
+        self.indice_agente = self.estado_a_indice(posicion)
+
+    def _compilar_tablas(self, indices_trampas):
+        """
+        Precalcula las tablas densas de transición indexadas por [estado, acción]
+
+        La cuadrícula es estática una vez construida, así que cada movimiento
+        queda resuelto de antemano:
+            siguiente: índice del estado alcanzado
+            recompensa: recompensa obtenida
+            terminal: si la transición termina el episodio
+            evento: código de evento (EVENTO_*)
+
+        El límite de pasos depende del tiempo y se aplica aparte en step_idx.
+
+        Args:
+            indices_trampas: Índice de estado de cada trampa
+        """
+        num_estados = self.get_num_estados()
+        estados = np.arange(num_estados)
+        x, y = np.divmod(estados, self.size)
+
+        nueva_x = x[:, None] + DELTAS_X[None, :]
+        nueva_y = y[:, None] + DELTAS_Y[None, :]
+        pared = (nueva_x < 0) | (nueva_x >= self.size) | (nueva_y < 0) | (nueva_y >= self.size)
+
+        self.es_trampa = np.zeros(num_estados, dtype=bool)
+        self.es_trampa[np.asarray(indices_trampas, dtype=np.int64)] = True
+
+        self.siguiente = np.where(pared, estados[:, None], nueva_x * self.size + nueva_y)
+
+        tesoro = ~pared & (self.siguiente == self.indice_tesoro)
+        trampa = ~pared & ~tesoro & self.es_trampa[self.siguiente]
+
+        self.evento = np.full(self.siguiente.shape, EVENTO_PASO, dtype=np.int8)
+        self.evento[pared] = EVENTO_PARED
+        self.evento[trampa] = EVENTO_TRAMPA
+        self.evento[tesoro] = EVENTO_TESORO
+
+        self.recompensa = np.full(self.siguiente.shape, -1, dtype=np.int64)
+        self.recompensa[pared] = -10
+        self.recompensa[trampa] = -100
+        self.recompensa[tesoro] = 100
+
+        self.terminal = tesoro
+
+        # Copias planas indexadas por estado * num_acciones + acción para el
+        # camino escalar: devuelven enteros de Python sin crear escalares NumPy
+        self._siguiente = array('q', self.siguiente.ravel().astype(np.int64).tobytes())
+        self._recompensa = array('q', self.recompensa.ravel().astype(np.int64).tobytes())
+        self._evento = array('b', self.evento.ravel().tobytes())
+        self._terminal = self.terminal.ravel().tolist()
 
     def reset(self):
         """Reinicia el entorno"""
@@ -46,55 +219,50 @@ class GridWorld:
         self.pasos_actuales = 0
         return self.posicion_agente
 
-    def step(self, accion):
+    def step_idx(self, estado_idx, accion):
         """
-        Ejecuta una acción
+        Ejecuta una acción consultando las tablas precalculadas
+
+        Camino rápido sin diccionarios ni tuplas: solo trabaja con enteros de
+        Python y códigos de evento (EVENTO_*). step lo usa internamente.
+
+        Args:
+            estado_idx: Índice del estado actual
+            accion: Acción a ejecutar
 
         Returns:
-            nuevo_estado, recompensa, terminado, info
+            siguiente_idx, recompensa, terminado, evento
         """
-        x, y = self.posicion_agente
-        self.pasos_actuales += 1
+        pasos = self.pasos_actuales = self.pasos_actuales + 1
+        i = estado_idx * NUM_ACCIONES + accion
+
+        siguiente_idx = self._siguiente[i]
+        evento = self._evento[i]
+        terminado = self._terminal[i]
 
-        #posiciones
-        if accion == 0:  # Arriba
-            nueva_x, nueva_y = x - 1, y
-        elif accion == 1:  # Abajo
-            nueva_x, nueva_y = x + 1, y
-        elif accion == 2:  # Izquierda
-            nueva_x, nueva_y = x, y - 1
-        else:  # Derecha
-            nueva_x, nueva_y = x, y + 1
-
-        if nueva_x < 0 or nueva_x >= self.size or nueva_y < 0 or nueva_y >= self.size:
-            recompensa = -10
-            terminado = False
-            info = {"evento": "pared", "pasos": self.pasos_actuales}
-            return self.posicion_agente, recompensa, terminado, info
-
-        self.posicion_agente = (nueva_x, nueva_y)
-
-        if self.posicion_agente == self.tesoro:
-            recompensa = 100
+        # El límite de pasos solo se evalúa en movimientos normales
+        if evento == EVENTO_PASO and pasos >= self.max_pasos:
+            evento = EVENTO_MAX_PASOS
             terminado = True
-            info = {"evento": "tesoro", "pasos": self.pasos_actuales, "exito": True}
-            return self.posicion_agente, recompensa, terminado, info
 
-        if self.posicion_agente in self.trampas:
-            recompensa = -100
-            terminado = False
-            info = {"evento": "trampa", "pasos": self.pasos_actuales}
-            return self.posicion_agente, recompensa, terminado, info
+        self.indice_agente = siguiente_idx
+        return siguiente_idx, self._recompensa[i], terminado, evento
 
-        if self.pasos_actuales >= self.max_pasos:
-            recompensa = -1
-            terminado = True
-            info = {"evento": "max_pasos", "pasos": self.pasos_actuales, "exito": False}
-            return self.posicion_agente, recompensa, terminado, info
+    def step(self, accion):
+        """
+        Ejecuta una acción
+
+        Returns:
+            nuevo_estado, recompensa, terminado, info
+        """
+        _, recompensa, terminado, evento = self.step_idx(self.indice_agente, accion)
+
+        info = {"evento": EVENTOS[evento], "pasos": self.pasos_actuales}
+        if evento == EVENTO_TESORO:
+            info["exito"] = True
+        elif evento == EVENTO_MAX_PASOS:
+            info["exito"] = False
 
-        recompensa = -1
-        terminado = False
-        info = {"evento": "paso", "pasos": self.pasos_actuales}
         return self.posicion_agente, recompensa, terminado, info
 
     def get_estado_grid(self):
@@ -120,3 +288,98 @@ class GridWorld:
     def get_num_acciones(self):
         """Retorna el número de acciones"""
         return len(self.acciones)
+
+
+class VectorGridWorld:
+    """
+    Lote de N entornos GridWorld que comparten la misma cuadrícula y avanzan
+    todos a la vez con una sola llamada a step
+    """
+
+    def __init__(self, num_entornos, size=10, num_trampas=10, max_pasos=200, entorno=None):
+        """
+        Inicializa el lote de entornos
+
+        Args:
+            num_entornos: Número de entornos simulados en paralelo
+            size: Tamaño del grid (size x size)
+            num_trampas: Número de trampas
+            max_pasos: Máximo número de pasos por episodio
+            entorno: GridWorld opcional del que copiar la cuadrícula
+        """
+        if entorno is None:
+            entorno = GridWorld(size=size, num_trampas=num_trampas, max_pasos=max_pasos)
+
+        self.num_entornos = num_entornos
+        self.size = entorno.size
+        self.num_trampas = entorno.num_trampas
+        self.max_pasos = entorno.max_pasos
+
+        self.inicio = entorno.inicio
+        self.tesoro = entorno.tesoro
+        self.trampas = set(entorno.trampas)
+
+        self.indice_inicio = entorno.indice_inicio
+        self.indice_tesoro = entorno.indice_tesoro
+
+        # Tablas de transición compartidas con el GridWorld de origen
+        self.siguiente = entorno.siguiente
+        self.recompensa = entorno.recompensa
+        self.terminal = entorno.terminal
+        self.evento = entorno.evento
+
+        self.acciones = list(entorno.acciones)
+
+        self.estados = np.full(num_entornos, self.indice_inicio, dtype=np.int64)
+        self.pasos_actuales = np.zeros(num_entornos, dtype=np.int64)
+
+    def reset(self):
+        """Reinicia todos los entornos y retorna sus índices de estado"""
+        self.estados.fill(self.indice_inicio)
+        self.pasos_actuales.fill(0)
+        return self.estados.copy()
+
+    def step(self, acciones):
+        """
+        Ejecuta una acción en cada entorno
+
+        Los entornos que terminan se reinician automáticamente: los estados
+        retornados son los alcanzados por la transición, mientras que
+        self.estados ya contiene el estado inicial para el siguiente episodio.
+
+        Args:
+            acciones: Array de N acciones
+
+        Returns:
+            siguientes_estados, recompensas, terminados, eventos
+        """
+        acciones = np.asarray(acciones)
+        self.pasos_actuales += 1
+
+        siguientes = self.siguiente[self.estados, acciones]
+        recompensas = self.recompensa[self.estados, acciones]
+        eventos = self.evento[self.estados, acciones]
+
+        # Igual que GridWorld.step: el límite de pasos solo se evalúa en movimientos normales
+        max_pasos = (eventos == EVENTO_PASO) & (self.pasos_actuales >= self.max_pasos)
+        eventos[max_pasos] = EVENTO_MAX_PASOS
+
+        terminados = self.terminal[self.estados, acciones] | max_pasos
+
+        self.estados = np.where(terminados, self.indice_inicio, siguientes)
+        self.pasos_actuales[terminados] = 0
+
+        return siguientes, recompensas, terminados, eventos
+
+    def estado_a_indice(self, estado):
+        """Convierte un estado (x, y) a un índice único"""
+        x, y = estado
+        return x * self.size + y
+
+    def get_num_estados(self):
+        """Retorna el número total de estados"""
+        return self.size * self.size
+
+    def get_num_acciones(self):
+        """Retorna el número de acciones"""
+        return len(self.acciones)
@@ -0,0 +1,452 @@
+import argparse
+import os
+import time
+from entorno import GridWorld, EVENTO_TESORO
+from agente import MODOS, crear_agente
+from almacen import AlmacenModelos
+from planificacion import precalentar, recorrido_greedy
+from puntos_control import PuntosControl, reanudar
+from metricas import metricas, CapturaPerfil
+from tablas import ALMACENAMIENTOS, TIPOS
+from grabacion import GrabadorEpisodios
+from programas import TIPOS_PROGRAMA, crear_programa
+from parada import crear_criterios
+
+class Entrenador:
+    """
+    Motor de entrenamiento sin interfaz que ejecuta episodios a máxima
+    velocidad y notifica el progreso de forma periódica
+    """
+
+    def __init__(self, entorno, agente, puntos_control=None, grabador=None,
+                 programa_epsilon=None, programa_alpha=None, criterios=None):
+        """
+        Inicializa el motor
+
+        Args:
+            entorno: Objeto GridWorld
+            agente: Objeto AgenteQLearning
+            puntos_control: PuntosControl opcional para guardar periódicamente
+            grabador: GrabadorEpisodios opcional donde registrar cada episodio
+            programa_epsilon: Programa opcional para ε (ver programas.py)
+            programa_alpha: Programa opcional para α
+            criterios: Criterios de parada temprana (ver parada.py); el
+                       entrenamiento para cuando se cumple cualquiera
+        """
+        self.entorno = entorno
+        self.agente = agente
+        self.puntos_control = puntos_control
+        self.grabador = grabador
+        self.programa_epsilon = programa_epsilon
+        self.programa_alpha = programa_alpha
+        self.criterios = criterios or []
+        self.motivo_parada = None
+        # Con grabador, los episodios se juegan sobre una vista que anota las acciones
+        self._entorno_episodio = grabador.envolver(entorno) if grabador is not None else entorno
+
+        self.activo = False
+        self.episodios_completados = 0
+        self.victorias = 0
+        self.estadisticas = {'recompensas': [], 'pasos': [], 'exitos': []}
+        self.captura = None
+
+    def detener(self):
+        """Solicita detener el entrenamiento al terminar el episodio actual"""
+        self.activo = False
+
+    def ejecutar_episodio(self, al_paso=None):
+        """
+        Ejecuta un episodio completo de entrenamiento
+
+        Args:
+            al_paso: Función opcional llamada tras cada paso con (episodio, pasos)
+
+        Returns:
+            recompensa_total, pasos, exito
+        """
+        if metricas.detallado and self.agente.visitas is None:
+            resultado = self._episodio_instrumentado(al_paso)
+        else:
+            resultado = self.agente.entrenar_episodio(self._entorno_episodio, al_paso,
+                                                      self.episodios_completados + 1)
+        if self.grabador is not None:
+            self.grabador.terminar_episodio(self._entorno_episodio)
+        return resultado
+
+    def _episodio_instrumentado(self, al_paso=None):
+        """Episodio paso a paso que cronometra por separado cada fase del paso"""
+        agente = self.agente
+        entorno = self._entorno_episodio
+        episodio = self.episodios_completados + 1
+        reloj = time.perf_counter
+        tiempo_eleccion = tiempo_entorno = tiempo_actualizacion = tiempo_aviso = 0.0
+
+        entorno.reset()
+        estado = entorno.indice_agente
+        recompensa_total = 0
+
+        while True:
+            t0 = reloj()
+            accion = agente.elegir_accion(estado, entrenar=True)
+            t1 = reloj()
+            siguiente_estado, recompensa, terminado, evento = entorno.step_idx(estado, accion)
+            t2 = reloj()
+            agente.actualizar_q(estado, accion, recompensa, siguiente_estado, terminado)
+            t3 = reloj()
+            tiempo_eleccion += t1 - t0
+            tiempo_entorno += t2 - t1
+            tiempo_actualizacion += t3 - t2
+            recompensa_total += recompensa
+
+            if al_paso is not None:
+                al_paso(episodio, entorno.pasos_actuales)
+                tiempo_aviso += reloj() - t3
+
+            if terminado:
+                break
+            estado = siguiente_estado
+
+        pasos = entorno.pasos_actuales
+        metricas.medir('eleccion_accion', tiempo_eleccion, pasos)
+        metricas.medir('paso_entorno', tiempo_entorno, pasos)
+        metricas.medir('actualizacion_q', tiempo_actualizacion, pasos)
+        if al_paso is not None:
+            metricas.medir('aviso_paso', tiempo_aviso, pasos)
+        return recompensa_total, pasos, evento == EVENTO_TESORO
+
+    def solicitar_perfil(self, segundos):
+        """
+        Pide una captura cProfile del entrenamiento en curso
+
+        La captura empieza y termina entre episodios, en el hilo de
+        entrenamiento.
+
+        Returns:
+            CapturaPerfil cuyo método esperar() retorna el informe
+        """
+        captura = CapturaPerfil(segundos)
+        if not self.activo:
+            captura.cancelar()
+        else:
+            self.captura = captura
+        return captura
+
+    def progreso(self):
+        """Retorna un resumen del último episodio y del acumulado"""
+        episodios = self.episodios_completados
+        hay_estadisticas = bool(self.estadisticas['pasos'])
+        return {
+            'episodio': episodios,
+            'pasos': self.estadisticas['pasos'][-1] if hay_estadisticas else 0,
+            'exito': bool(self.estadisticas['exitos'][-1]) if hay_estadisticas else False,
+            'recompensa': self.estadisticas['recompensas'][-1] if hay_estadisticas else 0,
+            'victorias': self.victorias,
+            'tasa_exito': (self.victorias / episodios) * 100 if episodios else 0.0
+        }
+
+    def entrenar(self, num_episodios, al_progreso=None, cada_episodios=None,
+                 cada_ms=None, al_paso=None):
+        """
+        Entrena al agente durante varios episodios
+
+        El progreso se notifica cada `cada_episodios` episodios o cada
+        `cada_ms` milisegundos, lo que ocurra primero. Si no se indica ninguno
+        de los dos se notifica tras cada episodio.
+
+        Args:
+            num_episodios: Número de episodios a ejecutar
+            al_progreso: Función llamada con el diccionario de progreso
+            cada_episodios: Intervalo de notificación en episodios
+            cada_ms: Intervalo de notificación en milisegundos
+            al_paso: Función opcional llamada tras cada paso
+
+        Returns:
+            Diccionario de estadísticas con recompensas, pasos y éxitos
+        """
+        if cada_episodios is None and cada_ms is None:
+            cada_episodios = 1
+
+        self.activo = True
+        ultimo_aviso = time.perf_counter()
+        episodios_desde_aviso = 0
+
+        agente = self.agente
+        epsilon_base, alpha_base = agente.epsilon, agente.alpha
+        # Los programas por episodio ajustan ε y α antes de cada episodio; los
+        # programas por estado los aplica el propio agente en cada paso
+        por_episodio = [(nombre, programa) for nombre, programa in
+                        (('epsilon', self.programa_epsilon), ('alpha', self.programa_alpha))
+                        if programa is not None and not programa.por_estado]
+        por_estado = {nombre: programa for nombre, programa in
+                      (('epsilon', self.programa_epsilon), ('alpha', self.programa_alpha))
+                      if programa is not None and programa.por_estado}
+        if por_estado:
+            agente.usar_visitas(**por_estado)
+        self.motivo_parada = None
+        for criterio in self.criterios:
+            criterio.reiniciar()
+
+        try:
+            for _ in range(num_episodios):
+                if not self.activo:
+                    break
+
+                if self.captura is not None and self.captura.tal_vez_avanzar():
+                    self.captura = None
+
+                for nombre, programa in por_episodio:
+                    setattr(agente, nombre, programa.valor(self.episodios_completados))
+
+                if metricas.activo:
+                    inicio_episodio = time.perf_counter()
+                    recompensa, pasos, exito = self.ejecutar_episodio(al_paso)
+                    metricas.medir('episodio', time.perf_counter() - inicio_episodio)
+                    metricas.sumar('episodios')
+                    metricas.sumar('pasos', pasos)
+                else:
+                    recompensa, pasos, exito = self.ejecutar_episodio(al_paso)
+
+                self.episodios_completados += 1
+                if exito:
+                    self.victorias += 1
+                self.estadisticas['recompensas'].append(recompensa)
+                self.estadisticas['pasos'].append(pasos)
+                self.estadisticas['exitos'].append(1 if exito else 0)
+
+                if self.puntos_control is not None:
+                    self.puntos_control.tal_vez_guardar(self)
+
+                for criterio in self.criterios:
+                    if criterio.comprobar(self):
+                        self.motivo_parada = criterio.nombre
+                        self.activo = False
+                        break
+
+                if al_progreso is None:
+                    continue
+
+                episodios_desde_aviso += 1
+                ahora = time.perf_counter()
+                if ((cada_episodios is not None and episodios_desde_aviso >= cada_episodios) or
+                        (cada_ms is not None and (ahora - ultimo_aviso) * 1000 >= cada_ms)):
+                    al_progreso(self.progreso())
+                    ultimo_aviso = ahora
+                    episodios_desde_aviso = 0
+
+            if al_progreso is not None and episodios_desde_aviso > 0:
+                al_progreso(self.progreso())
+        finally:
+            self.activo = False
+            # ε y α vuelven a su valor configurado para el siguiente entrenamiento
+            agente.epsilon, agente.alpha = epsilon_base, alpha_base
+            if por_estado:
+                agente.usar_visitas()
+            if self.captura is not None:
+                self.captura.cancelar()
+                self.captura = None
+            if self.puntos_control is not None and self.puntos_control.pendientes(self):
+                self.puntos_control.guardar(self)
+            if self.grabador is not None:
+                self.grabador.vaciar()
+
+        return self.estadisticas
+
+
+def main(argv=None):
+    """Punto de entrada de línea de comandos"""
+    parser = argparse.ArgumentParser(description='Entrenamiento Q-Learning sin interfaz')
+    parser.add_argument('--episodios', type=int, default=1000, help='Número de episodios')
+    parser.add_argument('--size', type=int, default=10, help='Tamaño del grid')
+    parser.add_argument('--trampas', type=int, default=10, help='Número de trampas')
+    parser.add_argument('--max-pasos', type=int, default=200, help='Máximo de pasos por episodio')
+    parser.add_argument('--semilla-grid', type=int, default=None,
+                        help='Semilla de la disposición de las trampas')
+    parser.add_argument('--resoluble', action='store_true',
+                        help='Garantizar un camino sin trampas del inicio al tesoro')
+    parser.add_argument('--alpha', type=float, default=0.1, help='Tasa de aprendizaje')
+    parser.add_argument('--gamma', type=float, default=0.9, help='Factor de descuento')
+    parser.add_argument('--epsilon', type=float, default=0.1, help='Tasa de exploración')
+    parser.add_argument('--modo', default='q', choices=sorted(MODOS),
+                        help='Modo de aprendizaje: q, dyna, priorizado, qlambda o npasos')
+    parser.add_argument('--pasos-planificacion', type=int, default=10,
+                        help='Actualizaciones simuladas por paso real (dyna/priorizado)')
+    parser.add_argument('--lambda', dest='lambda_', type=float, default=0.9,
+                        help='Decaimiento de las trazas de elegibilidad (qlambda)')
+    parser.add_argument('--n-pasos', type=int, default=3, help='Pasos de cada retorno (npasos)')
+    parser.add_argument('--programa-epsilon', default='constante', choices=TIPOS_PROGRAMA,
+                        help='Programa de ε: constante, lineal, exponencial o visitas (por estado)')
+    parser.add_argument('--epsilon-final', type=float, default=0.01, help='Valor final de ε')
+    parser.add_argument('--programa-alpha', default='constante', choices=TIPOS_PROGRAMA,
+                        help='Programa de α: constante, lineal, exponencial o visitas (por estado)')
+    parser.add_argument('--alpha-final', type=float, default=0.01, help='Valor final de α')
+    parser.add_argument('--duracion-programa', type=int, default=None,
+                        help='Episodios de los programas lineal y exponencial (por defecto, '
+                             '--episodios) o visitas a medio camino del programa visitas')
+    parser.add_argument('--parar-delta-q', type=float, default=None, metavar='TOLERANCIA',
+                        help='Parar cuando el máximo |ΔQ| de una ventana baje de TOLERANCIA')
+    parser.add_argument('--parar-politica-estable', action='store_true',
+                        help='Parar cuando la política greedy no cambie en varias ventanas')
+    parser.add_argument('--parar-meseta', type=float, default=None, metavar='PUNTOS',
+                        help='Parar cuando la tasa de éxito varíe menos de PUNTOS entre ventanas')
+    parser.add_argument('--ventana-parada', type=int, default=100,
+                        help='Episodios de cada ventana de los criterios de parada')
+    parser.add_argument('--almacenamiento', default='densa', choices=ALMACENAMIENTOS,
+                        help='Almacenamiento de la tabla Q: densa, bloques o dispersa')
+    parser.add_argument('--dtype', default='float64', choices=TIPOS, help='Tipo de los valores Q')
+    parser.add_argument('--cada', type=int, default=None, help='Reportar cada K episodios')
+    parser.add_argument('--cada-ms', type=float, default=1000, help='Reportar cada T milisegundos')
+    parser.add_argument('--precalentar', action='store_true',
+                        help='Inicializar la tabla Q con la solución de iteración de valor')
+    parser.add_argument('--guardar', action='store_true', help='Guardar el modelo al terminar')
+    parser.add_argument('--carpeta-modelos', default='modelos', help='Carpeta del almacén de modelos')
+    parser.add_argument('--punto-control-cada', type=int, default=None,
+                        help='Guardar un punto de control cada N episodios')
+    parser.add_argument('--punto-control-segundos', type=float, default=None,
+                        help='Guardar un punto de control cada T segundos')
+    parser.add_argument('--conservar', type=int, default=3, help='Puntos de control recientes a conservar')
+    parser.add_argument('--reanudar', default=None, metavar='EJECUCION',
+                        help='Reanudar una ejecución desde su último punto de control')
+    parser.add_argument('--graficar-cada', type=int, default=None,
+                        help='Actualizar el dashboard en vivo como mucho cada N episodios')
+    parser.add_argument('--carpeta-graficas', default='resultados/graficas',
+                        help='Carpeta donde guardar el dashboard')
+    parser.add_argument('--grabar', default=None, metavar='RUTA',
+                        help='Grabar la trayectoria de cada episodio en RUTA.bin y RUTA.idx')
+    parser.add_argument('--metricas', action='store_true',
+                        help='Medir el tiempo de cada fase del paso y mostrar el desglose al terminar')
+    parser.add_argument('--procesos', type=int, default=1,
+                        help='Entrenar con N procesos sobre una tabla Q compartida (Hogwild)')
+    parser.add_argument('--semilla', type=int, default=None,
+                        help='Semilla de los generadores de los procesos de --procesos')
+    args = parser.parse_args(argv)
+
+    if args.procesos > 1 and (args.grabar or args.metricas or args.programa_epsilon != 'constante' or
+                              args.programa_alpha != 'constante'):
+        parser.error("--procesos no admite --grabar, --metricas ni programas de ε o α")
+
+    if args.metricas:
+        metricas.activar(detallado=True)
+
+    almacen = AlmacenModelos(args.carpeta_modelos)
+    episodios_previos = 0
+    victorias_previas = 0
+
+    if args.reanudar is not None:
+        entorno, agente, entrada = reanudar(almacen, args.reanudar)
+        episodios_previos = entrada['episodio']
+        victorias_previas = entrada['metricas'].get('victorias', 0)
+        print(f"Reanudando ejecución {args.reanudar} desde el episodio {episodios_previos}")
+    else:
+        entorno = GridWorld(size=args.size, num_trampas=args.trampas, max_pasos=args.max_pasos,
+                            semilla=args.semilla_grid, resoluble=args.resoluble)
+        agente = crear_agente(args.modo, entorno.get_num_estados(), entorno.get_num_acciones(),
+                              alpha=args.alpha, gamma=args.gamma, epsilon=args.epsilon,
+                              pasos_planificacion=args.pasos_planificacion,
+                              lambda_=args.lambda_, n_pasos=args.n_pasos,
+                              almacenamiento=args.almacenamiento, dtype=args.dtype)
+        if args.precalentar:
+            iteraciones = precalentar(agente, entorno)
+            print(f"Tabla Q precalentada con iteración de valor ({iteraciones} iteraciones)")
+
+    puntos_control = None
+    if args.reanudar is not None or args.punto_control_cada or args.punto_control_segundos:
+        puntos_control = PuntosControl(almacen, ejecucion=args.reanudar,
+                                       cada_episodios=args.punto_control_cada,
+                                       cada_segundos=args.punto_control_segundos,
+                                       conservar=args.conservar)
+        print(f"Ejecución: {puntos_control.ejecucion}")
+
+    grabador = None
+    if args.grabar:
+        grabador = GrabadorEpisodios(args.grabar, entorno, primer_episodio=episodios_previos + 1)
+
+    duracion_programa = args.duracion_programa or args.episodios
+    programa_epsilon = programa_alpha = None
+    if args.programa_epsilon != 'constante':
+        programa_epsilon = crear_programa(args.programa_epsilon, agente.epsilon, args.epsilon_final,
+                                          duracion_programa)
+    if args.programa_alpha != 'constante':
+        programa_alpha = crear_programa(args.programa_alpha, agente.alpha, args.alpha_final,
+                                        duracion_programa)
+    criterios = crear_criterios(delta_q=args.parar_delta_q, politica_estable=args.parar_politica_estable,
+                                meseta=args.parar_meseta, ventana=args.ventana_parada)
+
+    if args.procesos > 1:
+        from paralelo import EntrenadorParalelo
+        entrenador = EntrenadorParalelo(entorno, agente, procesos=args.procesos, semilla=args.semilla,
+                                        puntos_control=puntos_control, criterios=criterios)
+    else:
+        entrenador = Entrenador(entorno, agente, puntos_control=puntos_control, grabador=grabador,
+                                programa_epsilon=programa_epsilon, programa_alpha=programa_alpha,
+                                criterios=criterios)
+    entrenador.episodios_completados = episodios_previos
+    entrenador.victorias = victorias_previas
+
+    tablero = None
+    if args.graficar_cada:
+        from visualizacion import Visualizador
+        tablero = Visualizador(args.carpeta_graficas).dashboard_vivo(entorno)
+    ultimo_grafico = [episodios_previos]
+
+    def actualizar_tablero():
+        # Igual que en los trabajos de la API, el panel muestra el recorrido greedy actual
+        acciones, _ = agente.politica.politica()
+        estados, _ = recorrido_greedy(entorno, acciones)
+        tablero.actualizar_trayectoria([divmod(estado, entorno.size) for estado in estados])
+        tablero.sincronizar(entrenador.estadisticas)
+
+    def mostrar(progreso):
+        print(f"Episodio {progreso['episodio']}/{args.episodios} | "
+              f"pasos: {progreso['pasos']} | "
+              f"tasa de éxito: {progreso['tasa_exito']:.1f}%")
+        # El dashboard se actualiza en el primer aviso tras cada N episodios
+        if tablero is not None and progreso['episodio'] - ultimo_grafico[0] >= args.graficar_cada:
+            actualizar_tablero()
+            tablero.guardar()
+            ultimo_grafico[0] = progreso['episodio']
+
+    inicio = time.perf_counter()
+    try:
+        entrenador.entrenar(args.episodios - episodios_previos, al_progreso=mostrar,
+                            cada_episodios=args.cada, cada_ms=args.cada_ms)
+    except KeyboardInterrupt:
+        print("Entrenamiento interrumpido")
+    duracion = time.perf_counter() - inicio
+
+    if puntos_control is not None:
+        puntos_control.cerrar()
+
+    if grabador is not None:
+        grabador.cerrar()
+        print(f"Episodios grabados en: {args.grabar}.bin "
+              f"({os.path.getsize(args.grabar + '.bin') / 1024:.0f} KB)")
+
+    if tablero is not None:
+        actualizar_tablero()
+        print(f"Dashboard guardado en: {tablero.guardar()}")
+
+    if entrenador.motivo_parada is not None:
+        print(f"Convergido ({entrenador.motivo_parada}) en el episodio {entrenador.episodios_completados}")
+
+    episodios = entrenador.episodios_completados
+    nuevos = episodios - episodios_previos
+    print(f"{nuevos} episodios en {duracion:.2f}s "
+          f"({nuevos / max(duracion, 1e-9):.0f} episodios/s), "
+          f"victorias: {entrenador.victorias}")
+
+    if args.metricas:
+        for fase, valores in sorted(metricas.instantanea()['fases'].items()):
+            print(f"  {fase}: {valores['segundos']:.3f}s en {valores['llamadas']} llamadas "
+                  f"({valores['media_us']:.2f} µs/llamada)")
+
+    if args.guardar:
+        id_modelo = almacen.guardar(agente, entorno, metricas={
+            'episodios': episodios,
+            'victorias': entrenador.victorias,
+            'tasa_exito': entrenador.progreso()['tasa_exito']
+        })
+        print(f"Modelo {id_modelo} guardado en: {args.carpeta_modelos}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+import json
+import os
+import struct
+import threading
+import numpy as np
+from entorno import GridWorld, EVENTO_TESORO
+
+MAGICO = b'RLEP'
+VERSION = 1
+CABECERA = struct.Struct('<4sBI')
+
+
+def _varint(valor, salida):
+    """Añade un entero no negativo en LEB128 (7 bits por byte)"""
+    while valor >= 0x80:
+        salida.append((valor & 0x7F) | 0x80)
+        valor >>= 7
+    salida.append(valor)
+
+
+def _leer_varint(datos, posicion):
+    """Retorna (valor, posición siguiente) de un entero LEB128"""
+    valor = 0
+    desplazamiento = 0
+    while True:
+        byte = datos[posicion]
+        posicion += 1
+        valor |= (byte & 0x7F) << desplazamiento
+        if byte < 0x80:
+            return valor, posicion
+        desplazamiento += 7
+
+
+def empaquetar_acciones(acciones, longitudes):
+    """
+    Empaqueta las acciones de varios episodios a 2 bits por acción
+
+    Cada episodio empieza en un byte nuevo, así que se puede decodificar por
+    separado a partir de su desplazamiento.
+
+    Args:
+        acciones: Array uint8 con las acciones de todos los episodios seguidas
+        longitudes: Número de acciones de cada episodio
+
+    Returns:
+        Array uint8 empaquetado y número de bytes de cada episodio
+    """
+    longitudes = np.asarray(longitudes, dtype=np.int64)
+    bytes_episodio = (longitudes + 3) // 4
+    # Cada episodio se rellena con ceros hasta un múltiplo de 4 acciones
+    inicio_relleno = np.repeat(np.cumsum(bytes_episodio * 4) - bytes_episodio * 4, longitudes)
+    inicio_original = np.repeat(np.cumsum(longitudes) - longitudes, longitudes)
+    destino = inicio_relleno + np.arange(len(acciones)) - inicio_original
+
+    rellenas = np.zeros(int(bytes_episodio.sum()) * 4, dtype=np.uint8)
+    rellenas[destino] = acciones
+    grupos = rellenas.reshape(-1, 4)
+    empaquetadas = grupos[:, 0] | (grupos[:, 1] << 2) | (grupos[:, 2] << 4) | (grupos[:, 3] << 6)
+    return empaquetadas, bytes_episodio
+
+
+def desempaquetar_acciones(datos, pasos):
+    """Retorna un array uint8 con las `pasos` primeras acciones de un bloque empaquetado"""
+    bloque = np.frombuffer(datos, dtype=np.uint8)
+    acciones = np.empty((len(bloque), 4), dtype=np.uint8)
+    for i in range(4):
+        acciones[:, i] = (bloque >> (2 * i)) & 3
+    return acciones.ravel()[:pasos]
+
+
+class _EntornoGrabado:
+    """
+    Vista de un entorno que anota cada acción antes de ejecutarla
+
+    El bucle fusionado del agente lee entorno.step_idx una vez por episodio,
+    así que grabar cuesta una llamada extra por paso y nada si no se graba.
+    """
+
+    def __init__(self, entorno, acciones):
+        self._entorno = entorno
+        self._anotar = acciones.append
+        self._step_idx = entorno.step_idx
+        self.inicio = None
+        self.evento = None
+
+    def __getattr__(self, nombre):
+        return getattr(self._entorno, nombre)
+
+    def reset(self):
+        resultado = self._entorno.reset()
+        self.inicio = self._entorno.indice_agente
+        return resultado
+
+    def step_idx(self, estado_idx, accion):
+        self._anotar(accion)
+        resultado = self._step_idx(estado_idx, accion)
+        self.evento = resultado[3]
+        return resultado
+
+
+class GrabadorEpisodios:
+    """
+    Registro binario de solo añadido con la trayectoria de cada episodio
+
+    Cada episodio ocupa el estado inicial y el número de pasos junto con el
+    evento final (en varints), más sus acciones a 2 bits cada una. Los
+    estados intermedios, recompensas y eventos se reconstruyen al leer con
+    las tablas de transición del entorno, que se guardan en la cabecera.
+    Un millón de pasos ocupa unos 250 KB de acciones más unos pocos bytes
+    por episodio.
+
+    Archivos:
+        <ruta>.bin: cabecera y registros de episodio
+        <ruta>.idx: desplazamiento (uint64) de cada episodio en el .bin
+
+    Los episodios se acumulan en memoria y se escriben por lotes; el índice
+    se escribe después de los datos, de modo que un lector nunca ve un
+    episodio a medio escribir.
+    """
+
+    def __init__(self, ruta, entorno, primer_episodio=1, lote=1000):
+        """
+        Crea el registro (o lo continúa si ya existe)
+
+        Al continuar un registro, por ejemplo al reanudar desde un punto de
+        control anterior a su final, se recortan los episodios desde
+        `primer_episodio` en adelante para que los nuevos conserven su número.
+        Si el registro empieza después de `primer_episodio`, deja un hueco o
+        es de otra cuadrícula, se vuelve a crear.
+
+        Args:
+            ruta: Ruta base de los archivos, sin extensión
+            entorno: Objeto GridWorld que se va a grabar
+            primer_episodio: Número del primer episodio que se va a grabar
+            lote: Episodios acumulados antes de escribir a disco
+        """
+        self.ruta = ruta
+        self.lote = lote
+        self.acciones = bytearray()
+        self._pendientes = 0
+        self._longitudes = []
+        self._metadatos = []
+        self._lock = threading.Lock()
+
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+
+        cabecera = {
+            'size': entorno.size,
+            'trampas': sorted(list(t) for t in entorno.trampas),
+            'max_pasos': entorno.max_pasos,
+            'primer_episodio': primer_episodio
+        }
+        if not (os.path.exists(ruta + '.bin') and self._continuar(cabecera)):
+            self.episodios = 0
+            cabecera = json.dumps(cabecera, separators=(',', ':')).encode()
+            with open(ruta + '.bin', 'wb') as f:
+                f.write(CABECERA.pack(MAGICO, VERSION, len(cabecera)))
+                f.write(cabecera)
+            open(ruta + '.idx', 'wb').close()
+
+    def _continuar(self, cabecera):
+        """Prepara un registro existente para seguir grabando; retorna False si hay que crearlo de nuevo"""
+        lector = LectorEpisodios(self.ruta)
+        existente = dict(lector.cabecera, primer_episodio=cabecera['primer_episodio'])
+        if existente != cabecera:
+            return False
+        conservar = cabecera['primer_episodio'] - lector.primer_episodio
+        if not 0 <= conservar <= lector.num_episodios:
+            return False
+
+        if conservar < lector.num_episodios:
+            # El índice se recorta primero: un lector nunca ve un episodio sin datos
+            with open(self.ruta + '.idx', 'r+b') as f:
+                f.truncate(conservar * 8)
+            with open(self.ruta + '.bin', 'r+b') as f:
+                f.truncate(int(lector.indice[conservar]))
+        self.episodios = conservar
+        return True
+
+    def envolver(self, entorno):
+        """Retorna una vista del entorno que graba las acciones del episodio en curso"""
+        return _EntornoGrabado(entorno, self.acciones)
+
+    def terminar_episodio(self, entorno):
+        """
+        Cierra el episodio en curso
+
+        Args:
+            entorno: Vista retornada por envolver() con la que se jugó
+        """
+        inicio, evento = entorno.inicio, entorno.evento
+        with self._lock:
+            pasos = len(self.acciones) - self._pendientes
+            self._pendientes += pasos
+            self._longitudes.append(pasos)
+            self._metadatos.append((inicio, pasos, evento))
+            if len(self._longitudes) >= self.lote:
+                self._escribir()
+
+    def vaciar(self):
+        """Escribe a disco los episodios pendientes"""
+        with self._lock:
+            if self._longitudes:
+                self._escribir()
+
+    def _escribir(self):
+        acciones = np.frombuffer(bytes(self.acciones), dtype=np.uint8)
+        empaquetadas, bytes_episodio = empaquetar_acciones(acciones, self._longitudes)
+        empaquetadas = empaquetadas.tobytes()
+
+        registros = bytearray()
+        desplazamientos = np.empty(len(self._metadatos), dtype=np.uint64)
+        base = os.path.getsize(self.ruta + '.bin')
+        leido = 0
+        for i, (inicio, pasos, evento) in enumerate(self._metadatos):
+            desplazamientos[i] = base + len(registros)
+            _varint(inicio, registros)
+            # El evento final (0-7) va en los 3 bits bajos del número de pasos
+            _varint(pasos << 3 | evento, registros)
+            fin = leido + int(bytes_episodio[i])
+            registros += empaquetadas[leido:fin]
+            leido = fin
+
+        with open(self.ruta + '.bin', 'ab') as f:
+            f.write(registros)
+        with open(self.ruta + '.idx', 'ab') as f:
+            f.write(desplazamientos.tobytes())
+
+        self.episodios += len(self._metadatos)
+        self.acciones.clear()
+        self._pendientes = 0
+        self._longitudes.clear()
+        self._metadatos.clear()
+
+    def cerrar(self):
+        """Escribe lo pendiente; el registro puede seguir leyéndose después"""
+        self.vaciar()
+
+
+class LectorEpisodios:
+    """
+    Lectura aleatoria de un registro de GrabadorEpisodios
+
+    Solo ve los episodios ya escritos a disco al abrirlo o al llamar a
+    refrescar(), así que puede leer mientras el entrenamiento sigue grabando.
+    """
+
+    def __init__(self, ruta):
+        """
+        Abre un registro
+
+        Args:
+            ruta: Ruta base de los archivos, sin extensión
+        """
+        self.ruta = ruta
+        with open(ruta + '.bin', 'rb') as f:
+            magico, version, longitud = CABECERA.unpack(f.read(CABECERA.size))
+            if magico != MAGICO or version != VERSION:
+                raise ValueError(f"No es un registro de episodios: {ruta}")
+            self.cabecera = json.loads(f.read(longitud))
+        self.primer_episodio = self.cabecera['primer_episodio']
+        self.entorno = GridWorld(size=self.cabecera['size'], max_pasos=self.cabecera['max_pasos'],
+                                 trampas=self.cabecera['trampas'])
+        self.refrescar()
+
+    def refrescar(self):
+        """Vuelve a leer el índice para ver los episodios escritos desde entonces"""
+        self.indice = np.fromfile(self.ruta + '.idx', dtype=np.uint64)
+        self.tam_datos = os.path.getsize(self.ruta + '.bin')
+        self.num_episodios = len(self.indice)
+
+    def leer(self, episodio):
+        """
+        Lee el registro crudo de un episodio
+
+        Args:
+            episodio: Número de episodio (contando desde primer_episodio)
+
+        Returns:
+            Índice de estado inicial, array de acciones y evento final
+        """
+        i = episodio - self.primer_episodio
+        if not 0 <= i < self.num_episodios:
+            raise IndexError(f"Episodio no grabado: {episodio}")
+        desde = int(self.indice[i])
+        hasta = int(self.indice[i + 1]) if i + 1 < self.num_episodios else self.tam_datos
+        with open(self.ruta + '.bin', 'rb') as f:
+            f.seek(desde)
+            datos = f.read(hasta - desde)
+
+        inicio, posicion = _leer_varint(datos, 0)
+        pasos_evento, posicion = _leer_varint(datos, posicion)
+        pasos = pasos_evento >> 3
+        return inicio, desempaquetar_acciones(datos[posicion:], pasos), pasos_evento & 7
+
+    def decodificar(self, episodio):
+        """
+        Reconstruye un episodio con las tablas de transición del entorno
+
+        Returns:
+            Diccionario con episodio, estados (incluido el inicial), acciones,
+            recompensas, eventos de cada paso y éxito
+        """
+        inicio, acciones, evento_final = self.leer(episodio)
+        siguiente = self.entorno.siguiente
+        estados = [inicio]
+        estado = inicio
+        for accion in acciones.tolist():
+            estado = int(siguiente[estado, accion])
+            estados.append(estado)
+
+        origenes = np.asarray(estados[:-1], dtype=np.int64)
+        eventos = self.entorno.evento[origenes, acciones].astype(np.int64)
+        if len(eventos):
+            # El límite de pasos no está en las tablas: se toma del registro
+            eventos[-1] = evento_final
+        return {
+            'episodio': episodio,
+            'estados': estados,
+            'acciones': acciones,
+            'recompensas': self.entorno.recompensa[origenes, acciones],
+            'eventos': eventos,
+            'exito': evento_final == EVENTO_TESORO
+        }
+
+    def episodios(self, desde=None, hasta=None):
+        """Itera los episodios decodificados de desde a hasta (ambos incluidos)"""
+        desde = self.primer_episodio if desde is None else max(desde, self.primer_episodio)
+        ultimo = self.primer_episodio + self.num_episodios - 1
+        hasta = ultimo if hasta is None else min(hasta, ultimo)
+        for episodio in range(desde, hasta + 1):
+            yield self.decodificar(episodio)
+
+    def resumen(self):
+        """Retorna el tamaño y el rango de episodios del registro"""
+        return {
+            'episodios': self.num_episodios,
+            'primer_episodio': self.primer_episodio,
+            'bytes': self.tam_datos + self.num_episodios * 8,
+            'grid': self.entorno.get_estado_grid()
+        }
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+import numpy as np
+
+# Cambiar al modificar el aspecto de las gráficas para invalidar la caché
+VERSION = 1
+
+GRAFICAS = ('recompensas', 'pasos', 'tasa_exito', 'trayectoria', 'dashboard')
+FORMATOS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+# Datos de los que depende cada gráfica
+DEPENDENCIAS = {
+    'recompensas': ('recompensas',),
+    'pasos': ('pasos',),
+    'tasa_exito': ('exitos',),
+    'trayectoria': ('entorno', 'trayectoria'),
+    'dashboard': ('recompensas', 'pasos', 'exitos', 'entorno', 'trayectoria'),
+}
+
+# Nombre de archivo que usa Visualizador para cada gráfica
+ARCHIVOS = {
+    'recompensas': 'evolucion_recompensas',
+    'pasos': 'evolucion_pasos',
+    'tasa_exito': 'tasa_exito',
+    'trayectoria': 'trayectoria_agente',
+    'dashboard': 'dashboard_completo',
+}
+
+
+def preparar_datos(estadisticas, entorno, trayectoria):
+    """
+    Copia las entradas de las gráficas en una forma estable y serializable
+
+    Las estadísticas se recortan a la longitud común por si otro hilo está
+    añadiendo episodios mientras tanto.
+    """
+    n = min(len(estadisticas['recompensas']), len(estadisticas['pasos']), len(estadisticas['exitos']))
+    return {
+        'recompensas': np.asarray(estadisticas['recompensas'][:n], dtype=np.float64),
+        'pasos': np.asarray(estadisticas['pasos'][:n], dtype=np.float64),
+        'exitos': np.asarray(estadisticas['exitos'][:n], dtype=np.int8),
+        'entorno': {
+            'size': entorno.size,
+            'inicio': list(entorno.inicio),
+            'tesoro': list(entorno.tesoro),
+            'trampas': [list(t) for t in sorted(entorno.trampas)]
+        },
+        'trayectoria': np.asarray(trayectoria if trayectoria is not None else [], dtype=np.int64).reshape(-1, 2)
+    }
+
+
+def clave_grafica(tipo, datos, opciones):
+    """Hash del tipo de gráfica, de los datos de los que depende y de las opciones de render"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{VERSION}:{tipo}:{json.dumps(opciones, sort_keys=True)}".encode())
+    for nombre in DEPENDENCIAS[tipo]:
+        valor = datos[nombre]
+        h.update(nombre.encode())
+        if isinstance(valor, np.ndarray):
+            h.update(str(valor.shape).encode())
+            h.update(np.ascontiguousarray(valor).tobytes())
+        else:
+            h.update(json.dumps(valor, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def _renderizar(tarea):
+    """Dibuja una gráfica en un proceso del pool y la escribe en su ruta de la caché"""
+    tipo, datos, opciones, ruta = tarea
+
+    import matplotlib
+    matplotlib.use('Agg')
+    from visualizacion import Visualizador
+
+    ventana = opciones['ventana']
+    if 'entorno' in datos:
+        entorno = SimpleNamespace(
+            size=datos['entorno']['size'],
+            inicio=tuple(datos['entorno']['inicio']),
+            tesoro=tuple(datos['entorno']['tesoro']),
+            trampas={tuple(t) for t in datos['entorno']['trampas']}
+        )
+        trayectoria = [tuple(p) for p in datos['trayectoria'].tolist()]
+
+    visualizador = Visualizador(os.path.dirname(ruta))
+    if tipo == 'recompensas':
+        figura = visualizador.graficar_recompensas(datos['recompensas'], ventana, guardar=False)
+    elif tipo == 'pasos':
+        figura = visualizador.graficar_pasos(datos['pasos'], ventana, guardar=False)
+    elif tipo == 'tasa_exito':
+        figura = visualizador.graficar_tasa_exito(datos['exitos'], ventana, guardar=False)
+    elif tipo == 'trayectoria':
+        figura = visualizador.graficar_trayectoria(entorno, trayectoria, guardar=False)
+    else:
+        estadisticas = {clave: datos[clave] for clave in ('recompensas', 'pasos', 'exitos')}
+        figura = visualizador.crear_dashboard(estadisticas, entorno, trayectoria, guardar=False)
+
+    ruta_temporal = f"{ruta}.{os.getpid()}.tmp"
+    figura.savefig(ruta_temporal, dpi=opciones['dpi'], format=opciones['formato'], bbox_inches='tight')
+    os.replace(ruta_temporal, ruta)
+    return ruta
+
+
+class CacheGraficas:
+    """
+    Caché en disco de gráficas direccionada por contenido
+
+    Cada archivo se llama como el hash de sus entradas, así que una gráfica
+    nunca cambia una vez escrita y las peticiones repetidas solo comprueban
+    que el archivo existe. Se conservan las `max_archivos` usadas más
+    recientemente.
+    """
+
+    def __init__(self, carpeta='resultados/cache_graficas', max_archivos=500):
+        """
+        Inicializa la caché
+
+        Args:
+            carpeta: Carpeta donde guardar las gráficas
+            max_archivos: Número máximo de gráficas conservadas
+        """
+        self.carpeta = carpeta
+        self.max_archivos = max_archivos
+        os.makedirs(carpeta, exist_ok=True)
+
+    def ruta(self, clave, formato):
+        """Ruta del archivo de una clave"""
+        return os.path.join(self.carpeta, f"{clave}.{formato}")
+
+    def obtener(self, clave, formato):
+        """Retorna la ruta si la gráfica está en caché (y la marca como usada), o None"""
+        ruta = self.ruta(clave, formato)
+        try:
+            os.utime(ruta)
+        except FileNotFoundError:
+            return None
+        return ruta
+
+    def podar(self):
+        """Borra las gráficas menos usadas recientemente por encima del límite"""
+        archivos = []
+        for entrada in os.scandir(self.carpeta):
+            if entrada.is_file() and not entrada.name.endswith('.tmp'):
+                archivos.append((entrada.stat().st_mtime, entrada.path))
+        if len(archivos) <= self.max_archivos:
+            return
+        archivos.sort()
+        for _, ruta in archivos[:len(archivos) - self.max_archivos]:
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+
+
+class Renderizador:
+    """
+    Genera gráficas en paralelo en un pool de procesos, pasando por la caché
+
+    Las gráficas que ya están en caché se devuelven sin dibujar nada; las que
+    faltan se reparten entre los procesos del pool, y si dos peticiones piden
+    la misma gráfica a la vez comparten el mismo render.
+    """
+
+    def __init__(self, cache=None, procesos=None):
+        """
+        Inicializa el renderizador
+
+        Args:
+            cache: CacheGraficas (por defecto, una en resultados/cache_graficas)
+            procesos: Número de procesos del pool (por defecto, todos los núcleos)
+        """
+        self.cache = cache or CacheGraficas()
+        self.procesos = procesos
+        self._pool = None
+        self._en_curso = {}
+        self._lock = threading.Lock()
+
+    def _obtener_pool(self):
+        if self._pool is None:
+            # spawn evita heredar hilos y locks del proceso servidor
+            contexto = multiprocessing.get_context('spawn')
+            self._pool = ProcessPoolExecutor(max_workers=self.procesos, mp_context=contexto)
+        return self._pool
+
+    def renderizar(self, estadisticas, entorno, trayectoria=None, graficas=GRAFICAS,
+                   formato='png', dpi=150, ventana=50):
+        """
+        Obtiene las gráficas pedidas, dibujando solo las que no están en caché
+
+        Args:
+            estadisticas: Diccionario con recompensas, pasos y éxitos por episodio
+            entorno: GridWorld (o cualquier objeto con size, inicio, tesoro y trampas)
+            trayectoria: Lista de posiciones (x, y)
+            graficas: Tipos de gráfica a generar
+            formato: 'png' o 'svg'
+            dpi: Resolución
+            ventana: Ventana de los promedios móviles
+
+        Returns:
+            Diccionario tipo -> (clave, ruta)
+        """
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato no soportado: {formato}")
+        for tipo in graficas:
+            if tipo not in DEPENDENCIAS:
+                raise ValueError(f"Gráfica desconocida: {tipo}")
+
+        datos = preparar_datos(estadisticas, entorno, trayectoria)
+        opciones = {'formato': formato, 'dpi': dpi, 'ventana': ventana}
+
+        resultados = {}
+        pendientes = {}
+        for tipo in graficas:
+            clave = clave_grafica(tipo, datos, opciones)
+            ruta = self.cache.obtener(clave, formato)
+            if ruta is not None:
+                resultados[tipo] = (clave, ruta)
+                continue
+
+            with self._lock:
+                futuro = self._en_curso.get((clave, formato))
+                if futuro is None:
+                    tarea = (tipo, {nombre: datos[nombre] for nombre in DEPENDENCIAS[tipo]},
+                             opciones, self.cache.ruta(clave, formato))
+                    futuro = self._obtener_pool().submit(_renderizar, tarea)
+                    self._en_curso[(clave, formato)] = futuro
+                    futuro.add_done_callback(lambda _, k=(clave, formato): self._terminar(k))
+            pendientes[tipo] = (clave, futuro)
+
+        for tipo, (clave, futuro) in pendientes.items():
+            resultados[tipo] = (clave, futuro.result())
+
+        if pendientes:
+            self.cache.podar()
+        return resultados
+
+    def _terminar(self, clave):
+        with self._lock:
+            self._en_curso.pop(clave, None)
+
+    def cerrar(self):
+        """Detiene el pool de procesos"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,10 @@
+# gunicorn -c gunicorn.conf.py
+# Un solo proceso: las sesiones, los trabajos y sus difusiones viven en su
+# memoria. Los WebSockets se reparten en el event loop de ese proceso (asgi.py).
+bind = '0.0.0.0:8000'
+wsgi_app = 'asgi:aplicacion'
+workers = 1
+worker_class = 'uvicorn_worker.UvicornWorker'
+# El entrenamiento corre en hilos propios; un trabajo largo no es una petición colgada
+timeout = 0
+graceful_timeout = 10
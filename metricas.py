@@ -0,0 +1,257 @@
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+
+class Metricas:
+    """
+    Contadores y temporizadores por fase del entrenamiento
+
+    Está desactivado por defecto y se puede activar en caliente. Con
+    `activo` se cuentan pasos, episodios, bytes y frames y se mide el tiempo
+    de cada fase de envío; con `detallado` además se cronometran por separado
+    la elección de acción, el paso del entorno y la actualización Q de cada
+    paso (más costoso, porque desactiva el episodio fusionado).
+    """
+
+    def __init__(self, ventana=10.0):
+        """
+        Inicializa las métricas
+
+        Args:
+            ventana: Segundos usados para calcular las tasas por segundo
+        """
+        self.activo = False
+        self.detallado = False
+        self.ventana = ventana
+
+        self._lock = threading.Lock()
+        self.contadores = defaultdict(float)
+        self.tiempos = defaultdict(float)
+        self.llamadas = defaultdict(int)
+        self._medidores = {}
+        self._muestras = deque([(time.perf_counter(), {})], maxlen=int(ventana) + 2)
+        self.inicio = time.time()
+
+    def activar(self, activo=True, detallado=False):
+        """Activa o desactiva la instrumentación"""
+        self.activo = activo
+        self.detallado = activo and detallado
+
+    def reiniciar(self):
+        """Pone a cero contadores y tiempos"""
+        with self._lock:
+            self.contadores.clear()
+            self.tiempos.clear()
+            self.llamadas.clear()
+            self._muestras.clear()
+            self._muestras.append((time.perf_counter(), {}))
+            self.inicio = time.time()
+
+    def sumar(self, nombre, valor=1):
+        """Incrementa un contador"""
+        with self._lock:
+            self.contadores[nombre] += valor
+
+    def medir(self, fase, segundos, veces=1):
+        """Acumula tiempo en una fase"""
+        with self._lock:
+            self.tiempos[fase] += segundos
+            self.llamadas[fase] += veces
+
+    def registrar_medidor(self, nombre, funcion):
+        """Registra un valor instantáneo calculado al consultar (por ejemplo profundidad de colas)"""
+        self._medidores[nombre] = funcion
+
+    def _tasas(self):
+        """Tasas por segundo de cada contador sobre la ventana configurada"""
+        ahora = time.perf_counter()
+        with self._lock:
+            actuales = dict(self.contadores)
+
+            # La muestra más antigua dentro de la ventana o, si todas son
+            # más antiguas, la más reciente
+            referencia = self._muestras[-1]
+            for muestra in self._muestras:
+                if ahora - muestra[0] <= self.ventana:
+                    referencia = muestra
+                    break
+
+            if ahora - self._muestras[-1][0] >= 1.0:
+                self._muestras.append((ahora, actuales))
+
+        instante, previos = referencia
+        transcurrido = ahora - instante
+        if transcurrido <= 0:
+            return {nombre: 0.0 for nombre in actuales}
+        return {nombre: (valor - previos.get(nombre, 0.0)) / transcurrido
+                for nombre, valor in actuales.items()}
+
+    def instantanea(self):
+        """Retorna todas las métricas como diccionario serializable"""
+        tasas = self._tasas()
+        with self._lock:
+            contadores = dict(self.contadores)
+            fases = {
+                fase: {
+                    'segundos': self.tiempos[fase],
+                    'llamadas': self.llamadas[fase],
+                    'media_us': self.tiempos[fase] / self.llamadas[fase] * 1e6 if self.llamadas[fase] else 0.0
+                }
+                for fase in self.tiempos
+            }
+
+        medidores = {}
+        for nombre, funcion in list(self._medidores.items()):
+            try:
+                medidores[nombre] = funcion()
+            except Exception:
+                continue
+
+        return {
+            'activo': self.activo,
+            'detallado': self.detallado,
+            'desde': self.inicio,
+            'contadores': contadores,
+            'por_segundo': tasas,
+            'fases': fases,
+            'medidores': medidores
+        }
+
+    def prometheus(self, prefijo='rl'):
+        """Retorna las métricas en formato de texto de Prometheus"""
+        datos = self.instantanea()
+        lineas = []
+
+        for nombre, valor in sorted(datos['contadores'].items()):
+            metrica = f"{prefijo}_{nombre}_total"
+            lineas.append(f"# TYPE {metrica} counter")
+            lineas.append(f"{metrica} {valor:g}")
+
+        for nombre, valor in sorted(datos['por_segundo'].items()):
+            metrica = f"{prefijo}_{nombre}_por_segundo"
+            lineas.append(f"# TYPE {metrica} gauge")
+            lineas.append(f"{metrica} {valor:g}")
+
+        if datos['fases']:
+            lineas.append(f"# TYPE {prefijo}_fase_segundos_total counter")
+            for fase, valores in sorted(datos['fases'].items()):
+                lineas.append(f'{prefijo}_fase_segundos_total{{fase="{fase}"}} {valores["segundos"]:g}')
+            lineas.append(f"# TYPE {prefijo}_fase_llamadas_total counter")
+            for fase, valores in sorted(datos['fases'].items()):
+                lineas.append(f'{prefijo}_fase_llamadas_total{{fase="{fase}"}} {valores["llamadas"]}')
+
+        for nombre, valor in sorted(datos['medidores'].items()):
+            metrica = f"{prefijo}_{nombre}"
+            lineas.append(f"# TYPE {metrica} gauge")
+            lineas.append(f"{metrica} {valor:g}")
+
+        lineas.append(f"# TYPE {prefijo}_instrumentacion_activa gauge")
+        lineas.append(f"{prefijo}_instrumentacion_activa {1 if datos['activo'] else 0}")
+        return '\n'.join(lineas) + '\n'
+
+
+class CapturaPerfil:
+    """
+    Captura cProfile de un entrenamiento en curso
+
+    cProfile solo perfila el hilo en el que se activa, así que la captura
+    la inicia y la detiene el propio bucle de entrenamiento entre episodios.
+    """
+
+    def __init__(self, segundos):
+        self.segundos = segundos
+        self.perfil = None
+        self.fin = None
+        self.resultado = None
+        self._terminada = threading.Event()
+
+    def tal_vez_avanzar(self):
+        """Llamado por el hilo de entrenamiento; retorna True cuando la captura terminó"""
+        if self.perfil is None:
+            self.perfil = cProfile.Profile()
+            self.fin = time.perf_counter() + self.segundos
+            self.perfil.enable()
+            return False
+
+        if time.perf_counter() < self.fin:
+            return False
+
+        self.perfil.disable()
+        salida = io.StringIO()
+        pstats.Stats(self.perfil, stream=salida).sort_stats('cumulative').print_stats(30)
+        self.resultado = salida.getvalue()
+        self._terminada.set()
+        return True
+
+    def cancelar(self):
+        """Termina la captura si el entrenamiento acaba antes de tiempo"""
+        if self.perfil is not None and not self._terminada.is_set():
+            self.fin = 0
+            self.tal_vez_avanzar()
+        elif self.perfil is None:
+            self.resultado = ''
+            self._terminada.set()
+
+    def esperar(self, timeout=None):
+        """Espera el resultado de la captura como texto de pstats"""
+        self._terminada.wait(timeout)
+        return self.resultado
+
+
+def perfilar_muestreo(id_hilo, segundos=5.0, intervalo=0.005, limite=30):
+    """
+    Perfil por muestreo de un hilo en ejecución
+
+    Lee periódicamente la pila del hilo con sys._current_frames, sin
+    instrumentar el código perfilado.
+
+    Args:
+        id_hilo: Identificador (ident) del hilo a muestrear
+        segundos: Duración de la captura
+        intervalo: Segundos entre muestras
+        limite: Número de funciones a retornar
+
+    Returns:
+        Diccionario con el número de muestras y las funciones más frecuentes,
+        tanto en la cima de la pila (propio) como en cualquier nivel (acumulado)
+    """
+    propio = defaultdict(int)
+    acumulado = defaultdict(int)
+    muestras = 0
+
+    fin = time.perf_counter() + segundos
+    while time.perf_counter() < fin:
+        marco = sys._current_frames().get(id_hilo)
+        if marco is None:
+            break
+
+        muestras += 1
+        vistas = set()
+        cima = True
+        while marco is not None:
+            codigo = marco.f_code
+            clave = f"{codigo.co_filename}:{codigo.co_firstlineno}({codigo.co_name})"
+            if cima:
+                propio[clave] += 1
+                cima = False
+            if clave not in vistas:
+                acumulado[clave] += 1
+                vistas.add(clave)
+            marco = marco.f_back
+        time.sleep(intervalo)
+
+    def top(conteos):
+        return [
+            {'funcion': clave, 'muestras': n, 'porcentaje': n * 100 / muestras}
+            for clave, n in sorted(conteos.items(), key=lambda e: e[1], reverse=True)[:limite]
+        ]
+
+    return {'muestras': muestras, 'propio': top(propio), 'acumulado': top(acumulado)}
+
+
+# Instancia compartida por el motor de entrenamiento y el servidor
+metricas = Metricas()
@@ -0,0 +1,165 @@
+import numpy as np
+
+
+def _cierra_ventana(criterio, episodios):
+    """Suma episodios al contador del criterio y retorna si se ha cruzado el final de una ventana"""
+    antes = criterio.episodios
+    criterio.episodios += episodios
+    return criterio.episodios // criterio.ventana > antes // criterio.ventana
+
+
+class CriterioDeltaQ:
+    """
+    Converge cuando la tabla Q apenas cambia en una ventana de episodios
+
+    Cada `ventana` episodios compara la tabla con la copia guardada al
+    principio de la ventana; comparar por ventanas y no por episodios deja
+    el coste en una copia de la tabla cada `ventana` episodios.
+    """
+
+    nombre = 'delta_q'
+
+    def __init__(self, tolerancia=1e-3, ventana=100):
+        """
+        Args:
+            tolerancia: Máximo |ΔQ| admitido en la ventana
+            ventana: Episodios entre comparaciones
+        """
+        self.tolerancia = tolerancia
+        self.ventana = ventana
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Olvida el estado de las comprobaciones anteriores"""
+        self.episodios = 0
+        self.anterior = None
+        self.ultimo_delta = None
+
+    def comprobar(self, entrenador, episodios=1):
+        """
+        Retorna True si el entrenamiento ha convergido tras los últimos episodios
+
+        Args:
+            entrenador: Entrenador cuyo estado se comprueba
+            episodios: Episodios nuevos desde la llamada anterior
+        """
+        if not _cierra_ventana(self, episodios):
+            return False
+
+        tabla = np.array(entrenador.agente.tabla_q, dtype=np.float64)
+        anterior, self.anterior = self.anterior, tabla
+        if anterior is None:
+            return False
+        self.ultimo_delta = float(np.max(np.abs(tabla - anterior)))
+        return self.ultimo_delta < self.tolerancia
+
+
+class CriterioPoliticaEstable:
+    """Converge cuando la política greedy no cambia en `ventanas` ventanas seguidas"""
+
+    nombre = 'politica_estable'
+
+    def __init__(self, ventana=100, ventanas=3):
+        """
+        Args:
+            ventana: Episodios entre comparaciones
+            ventanas: Comparaciones seguidas sin cambios necesarias
+        """
+        self.ventana = ventana
+        self.ventanas = ventanas
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Olvida el estado de las comprobaciones anteriores"""
+        self.episodios = 0
+        self.anterior = None
+        self.estables = 0
+
+    def comprobar(self, entrenador, episodios=1):
+        """
+        Retorna True si el entrenamiento ha convergido tras los últimos episodios
+
+        Args:
+            entrenador: Entrenador cuyo estado se comprueba
+            episodios: Episodios nuevos desde la llamada anterior
+        """
+        if not _cierra_ventana(self, episodios):
+            return False
+
+        # La caché de la política solo recalcula las filas modificadas
+        acciones, _ = entrenador.agente.politica.politica()
+        anterior, self.anterior = self.anterior, acciones
+        if anterior is None:
+            return False
+        self.estables = self.estables + 1 if np.array_equal(acciones, anterior) else 0
+        return self.estables >= self.ventanas
+
+
+class CriterioMeseta:
+    """
+    Converge cuando la tasa de éxito deja de mejorar
+
+    Compara la tasa de éxito de los últimos `ventana` episodios con la de la
+    ventana anterior. Con `tasa_minima` no se para en una meseta baja, por
+    ejemplo al principio de un grid grande donde aún no se ha encontrado el
+    tesoro.
+    """
+
+    nombre = 'meseta'
+
+    def __init__(self, tolerancia=1.0, ventana=100, tasa_minima=50.0):
+        """
+        Args:
+            tolerancia: Diferencia máxima entre ventanas, en puntos porcentuales
+            ventana: Episodios de cada ventana
+            tasa_minima: Tasa de éxito (%) por debajo de la cual no se para
+        """
+        self.tolerancia = tolerancia
+        self.ventana = ventana
+        self.tasa_minima = tasa_minima
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Olvida el estado de las comprobaciones anteriores"""
+        self.episodios = 0
+        self.anterior = None
+
+    def comprobar(self, entrenador, episodios=1):
+        """
+        Retorna True si el entrenamiento ha convergido tras los últimos episodios
+
+        Args:
+            entrenador: Entrenador cuyo estado se comprueba
+            episodios: Episodios nuevos desde la llamada anterior
+        """
+        if not _cierra_ventana(self, episodios):
+            return False
+
+        tasa = sum(entrenador.estadisticas['exitos'][-self.ventana:]) * 100 / self.ventana
+        anterior, self.anterior = self.anterior, tasa
+        if anterior is None:
+            return False
+        return tasa >= self.tasa_minima and abs(tasa - anterior) <= self.tolerancia
+
+
+def crear_criterios(delta_q=None, politica_estable=False, meseta=None, ventana=100):
+    """
+    Crea los criterios de parada temprana pedidos
+
+    Args:
+        delta_q: Tolerancia de |ΔQ| por ventana, o None
+        politica_estable: Si parar cuando la política greedy deja de cambiar
+        meseta: Tolerancia (puntos porcentuales) de la meseta de éxito, o None
+        ventana: Episodios de cada ventana
+
+    Returns:
+        Lista de criterios; el entrenamiento para cuando se cumple cualquiera
+    """
+    criterios = []
+    if delta_q is not None:
+        criterios.append(CriterioDeltaQ(delta_q, ventana))
+    if politica_estable:
+        criterios.append(CriterioPoliticaEstable(ventana))
+    if meseta is not None:
+        criterios.append(CriterioMeseta(meseta, ventana))
+    return criterios
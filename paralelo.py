@@ -0,0 +1,303 @@
+import multiprocessing
+import queue
+import random
+import time
+import traceback
+from multiprocessing import shared_memory
+import numpy as np
+from entorno import GridWorld
+from agente import crear_agente, PARAMETROS_MODO
+from entrenar import Entrenador
+from metricas import metricas
+from tablas import convertir_tabla
+
+
+def _trabajador(indice, nombre_memoria, forma, dtype, layout, parametros, num_episodios, semilla,
+                parar, cola, lote):
+    """
+    Proceso trabajador: juega episodios en su propio GridWorld y actualiza
+    sin bloqueos la tabla Q compartida
+
+    Envía a la cola lotes (indice, recompensas, pasos, éxitos, finales), con
+    el instante (time.monotonic) en que acabó cada episodio, y al terminar
+    (indice, None, None, error, None), con error None o el traceback de la
+    excepción que lo detuvo.
+    """
+    # Con spawn los trabajadores comparten el resource tracker del
+    # coordinador, que es quien borra el bloque al terminar
+    memoria = None
+    agente = None
+    error = None
+    try:
+        memoria = shared_memory.SharedMemory(name=nombre_memoria)
+        random.seed(semilla)
+        np.random.seed(semilla)
+
+        entorno = GridWorld(size=layout['size'], max_pasos=layout['max_pasos'], trampas=layout['trampas'])
+        agente = crear_agente(parametros['modo'], entorno.get_num_estados(), entorno.get_num_acciones(),
+                              alpha=parametros['alpha'], gamma=parametros['gamma'],
+                              epsilon=parametros['epsilon'], **parametros['extra'])
+        # El agente escribe directamente en la memoria compartida (Hogwild):
+        # cada actualización es una escritura de un solo valor alineado
+        agente.tabla_q = np.ndarray(forma, dtype=dtype, buffer=memoria.buf)
+
+        recompensas, pasos, exitos, finales = [], [], [], []
+        for _ in range(num_episodios):
+            if parar.is_set():
+                break
+            recompensa, pasos_episodio, exito = agente.entrenar_episodio(entorno)
+            recompensas.append(recompensa)
+            pasos.append(pasos_episodio)
+            exitos.append(1 if exito else 0)
+            finales.append(time.monotonic())
+            if len(recompensas) >= lote:
+                cola.put((indice, recompensas, pasos, exitos, finales))
+                recompensas, pasos, exitos, finales = [], [], [], []
+        if recompensas:
+            cola.put((indice, recompensas, pasos, exitos, finales))
+    except Exception:
+        # El error viaja al coordinador; el proceso termina con código 0
+        error = traceback.format_exc()
+    finally:
+        cola.put((indice, None, None, error, None))
+        # Las vistas de NumPy deben soltarse antes de cerrar el bloque
+        agente = None
+        if memoria is not None:
+            memoria.close()
+
+
+class EntrenadorParalelo(Entrenador):
+    """
+    Entrenamiento Hogwild: varios procesos juegan episodios a la vez y
+    actualizan sin bloqueos una única tabla Q en memoria compartida
+
+    Cada trabajador tiene su propio GridWorld y su propia semilla, derivada
+    de `semilla` con SeedSequence. Las escrituras concurrentes sobre la misma
+    celda pueden perder alguna actualización, lo que en la práctica no
+    afecta a la convergencia porque cada episodio toca pocas filas. El
+    coordinador (este proceso) agrega las estadísticas que los trabajadores
+    envían por lotes, guarda los puntos de control, comprueba los criterios
+    de parada y detiene a todos si se le pide.
+
+    Los criterios se comprueban una vez por lote recibido y solo cuentan los
+    episodios que acabaron después de la última instantánea de la tabla: los
+    lotes atrasados ya están reflejados en ella, y contarlos haría que dos
+    ventanas seguidas vieran la misma tabla y pareciera que converge.
+    """
+
+    def __init__(self, entorno, agente, procesos=None, semilla=None, lote=50,
+                 puntos_control=None, criterios=None):
+        """
+        Inicializa el coordinador
+
+        Args:
+            entorno: Objeto GridWorld cuya cuadrícula usan todos los trabajadores
+            agente: Agente cuya tabla Q se entrena; al terminar contiene la tabla compartida
+            procesos: Número de trabajadores (por defecto, todos los núcleos)
+            semilla: Semilla raíz de los generadores de los trabajadores
+            lote: Episodios que cada trabajador agrupa en cada envío de estadísticas
+            puntos_control: PuntosControl opcional para guardar periódicamente
+            criterios: Criterios de parada temprana (ver parada.py)
+        """
+        super().__init__(entorno, agente, puntos_control=puntos_control, criterios=criterios)
+        self.procesos = procesos or multiprocessing.cpu_count()
+        self.semilla = semilla
+        self.lote = lote
+
+        # spawn evita heredar hilos y locks del proceso servidor
+        self._contexto = multiprocessing.get_context('spawn')
+        self._parar = self._contexto.Event()
+        # Instante de la última instantánea de la tabla tomada por los criterios
+        self._instantanea = None
+
+    def detener(self):
+        """Solicita a todos los trabajadores que paren tras su episodio actual"""
+        self.activo = False
+        self._parar.set()
+
+    def _parametros(self):
+        agente = self.agente
+        extra = {nombre: getattr(agente, nombre) for nombre in PARAMETROS_MODO if hasattr(agente, nombre)}
+        return {'modo': agente.modo, 'alpha': agente.alpha, 'gamma': agente.gamma,
+                'epsilon': agente.epsilon, 'extra': extra}
+
+    def _vaciar(self, cola, trabajadores, activos):
+        """Descarta los lotes pendientes para que ningún trabajador quede bloqueado escribiendo en la cola"""
+        while activos:
+            try:
+                _, recompensas, _, _, _ = cola.get(timeout=1.0)
+            except queue.Empty:
+                if not any(trabajador.is_alive() for trabajador in trabajadores):
+                    return
+                continue
+            if recompensas is None:
+                activos -= 1
+
+    def _comprobar_criterios(self, finales):
+        """
+        Comprueba los criterios de parada con los episodios de un lote
+
+        Solo cuentan los episodios acabados después de la última instantánea;
+        sin ninguno, la tabla puede no haber cambiado y no se comprueba nada.
+        time.monotonic usa el reloj del sistema, común a todos los procesos.
+        """
+        nuevos = sum(1 for final in finales if final > self._instantanea)
+        if not nuevos:
+            return
+        tomada = False
+        for criterio in self.criterios:
+            ventanas = criterio.episodios // criterio.ventana
+            convergido = criterio.comprobar(self, nuevos)
+            tomada = tomada or criterio.episodios // criterio.ventana > ventanas
+            if convergido:
+                self.motivo_parada = criterio.nombre
+                self.detener()
+                break
+        if tomada:
+            # Se toma después de leer la tabla: lo que acabe entre medias no cuenta
+            self._instantanea = time.monotonic()
+
+    def _comprobar_trabajadores(self, trabajadores, terminados):
+        """
+        Lanza RuntimeError si algún trabajador murió sin avisar
+
+        Un trabajador que sale con código 0 ya dejó su aviso en la cola. Uno
+        que muere de otra forma (por ejemplo, con SIGKILL) puede haber dejado
+        la cola bloqueada, así que se terminan todos para no esperarlos.
+        """
+        for indice, trabajador in enumerate(trabajadores):
+            if indice in terminados or trabajador.is_alive() or trabajador.exitcode == 0:
+                continue
+            for otro in trabajadores:
+                otro.terminate()
+            raise RuntimeError(f"El trabajador {trabajador.name} terminó de forma anómala "
+                               f"(código {trabajador.exitcode})")
+
+    def entrenar(self, num_episodios, al_progreso=None, cada_episodios=None, cada_ms=None, al_paso=None):
+        """
+        Reparte num_episodios entre los trabajadores y espera a que terminen
+
+        Args:
+            num_episodios: Episodios en total, sumando todos los trabajadores
+            al_progreso: Función llamada con el diccionario de progreso
+            cada_episodios: Intervalo de notificación en episodios
+            cada_ms: Intervalo de notificación en milisegundos
+            al_paso: No soportado: los pasos ocurren en otros procesos
+
+        Returns:
+            Diccionario de estadísticas con recompensas, pasos y éxitos, en
+            el orden en que llegaron los lotes
+
+        Raises:
+            RuntimeError: Si un trabajador falla o termina de forma anómala
+        """
+        if al_paso is not None:
+            raise ValueError("El entrenamiento paralelo no admite al_paso")
+        if cada_episodios is None and cada_ms is None:
+            cada_episodios = 1
+
+        agente = self.agente
+        almacenamiento, dtype = agente.almacenamiento
+        tabla_inicial = np.asarray(agente.tabla_q, dtype=dtype)
+        entorno = self.entorno
+        layout = {'size': entorno.size, 'max_pasos': entorno.max_pasos, 'trampas': sorted(entorno.trampas)}
+
+        procesos = max(1, min(self.procesos, num_episodios))
+        reparto = [num_episodios // procesos + (1 if i < num_episodios % procesos else 0)
+                   for i in range(procesos)]
+        semillas = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(self.semilla).spawn(procesos)]
+
+        memoria = shared_memory.SharedMemory(create=True, size=max(tabla_inicial.nbytes, 1))
+        tabla = np.ndarray(tabla_inicial.shape, dtype=tabla_inicial.dtype, buffer=memoria.buf)
+        tabla[:] = tabla_inicial
+        # Durante el entrenamiento el agente del coordinador ve la tabla compartida,
+        # así que los puntos de control y los criterios leen su estado actual
+        agente.tabla_q = tabla
+
+        self._parar.clear()
+        cola = self._contexto.Queue()
+        trabajadores = [
+            self._contexto.Process(target=_trabajador, name=f"hogwild-{i}", daemon=True,
+                                   args=(i, memoria.name, tabla.shape, tabla.dtype.str, layout,
+                                         self._parametros(), reparto[i], semillas[i], self._parar,
+                                         cola, self.lote))
+            for i in range(procesos)
+        ]
+
+        self.activo = True
+        self.motivo_parada = None
+        for criterio in self.criterios:
+            criterio.reiniciar()
+        self._instantanea = time.monotonic()
+        ultimo_aviso = time.perf_counter()
+        episodios_desde_aviso = 0
+
+        activos = 0
+        try:
+            for trabajador in trabajadores:
+                trabajador.start()
+                activos += 1
+
+            terminados = set()
+            ultima_comprobacion = time.perf_counter()
+            while activos:
+                # Los demás trabajadores siguen enviando lotes, así que la cola
+                # no basta para notar que uno ha muerto
+                if time.perf_counter() - ultima_comprobacion >= 1.0:
+                    self._comprobar_trabajadores(trabajadores, terminados)
+                    ultima_comprobacion = time.perf_counter()
+                try:
+                    indice, recompensas, pasos, exitos, finales = cola.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+                if recompensas is None:
+                    activos -= 1
+                    terminados.add(indice)
+                    if exitos is not None:
+                        raise RuntimeError(f"El trabajador {trabajadores[indice].name} falló:\n{exitos}")
+                    continue
+
+                # Los trabajadores no marcan las filas de la política del coordinador
+                agente.politica.marcar(slice(None))
+                for recompensa, pasos_episodio, exito in zip(recompensas, pasos, exitos):
+                    self.episodios_completados += 1
+                    self.victorias += exito
+                    self.estadisticas['recompensas'].append(recompensa)
+                    self.estadisticas['pasos'].append(pasos_episodio)
+                    self.estadisticas['exitos'].append(exito)
+
+                    if self.puntos_control is not None:
+                        self.puntos_control.tal_vez_guardar(self)
+                if self.motivo_parada is None:
+                    self._comprobar_criterios(finales)
+
+                if metricas.activo:
+                    metricas.sumar('episodios', len(recompensas))
+                    metricas.sumar('pasos', sum(pasos))
+
+                if al_progreso is None:
+                    continue
+                episodios_desde_aviso += len(recompensas)
+                ahora = time.perf_counter()
+                if ((cada_episodios is not None and episodios_desde_aviso >= cada_episodios) or
+                        (cada_ms is not None and (ahora - ultimo_aviso) * 1000 >= cada_ms)):
+                    al_progreso(self.progreso())
+                    ultimo_aviso = ahora
+                    episodios_desde_aviso = 0
+
+            if al_progreso is not None and episodios_desde_aviso > 0:
+                al_progreso(self.progreso())
+        finally:
+            self.detener()
+            self._vaciar(cola, trabajadores, activos)
+            for trabajador in trabajadores:
+                trabajador.join()
+            # La tabla final se copia fuera de la memoria compartida antes de liberarla
+            agente.tabla_q = convertir_tabla(tabla, almacenamiento)
+            if self.puntos_control is not None and self.puntos_control.pendientes(self):
+                self.puntos_control.guardar(self)
+            del tabla
+            memoria.close()
+            memoria.unlink()
+
+        return self.estadisticas
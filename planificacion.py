@@ -0,0 +1,179 @@
+import numpy as np
+
+def _q_desde_valores(entorno, valores, gamma):
+    """Calcula Q(s, a) = r(s, a) + γ V(s') para todas las parejas a la vez"""
+    continuar = ~entorno.terminal
+    return entorno.recompensa + gamma * continuar * valores[entorno.siguiente]
+
+
+def iteracion_valor(entorno, gamma=0.9, tolerancia=1e-6, max_iteraciones=10000):
+    """
+    Resuelve el GridWorld con iteración de valor vectorizada
+
+    Usa las tablas de transición precalculadas del entorno, así que cada
+    iteración actualiza todos los estados con unas pocas operaciones NumPy.
+    El límite de pasos por episodio no forma parte del modelo.
+
+    Args:
+        entorno: Objeto GridWorld
+        gamma: Factor de descuento
+        tolerancia: Cambio máximo de V para considerar que convergió
+        max_iteraciones: Límite de iteraciones
+
+    Returns:
+        tabla_q óptima con la misma forma que AgenteQLearning.tabla_q, iteraciones
+    """
+    valores = np.zeros(entorno.get_num_estados())
+    nuevos_valores = np.empty_like(valores)
+
+    # Buffers reutilizados entre iteraciones para no reservar memoria en el bucle
+    descuento = gamma * (~entorno.terminal)
+    recompensa = entorno.recompensa.astype(np.float64)
+    q = np.empty(entorno.siguiente.shape)
+
+    for iteracion in range(1, max_iteraciones + 1):
+        np.take(valores, entorno.siguiente, out=q)
+        q *= descuento
+        q += recompensa
+        q.max(axis=1, out=nuevos_valores)
+        delta = np.max(np.abs(nuevos_valores - valores))
+        valores, nuevos_valores = nuevos_valores, valores
+        if delta < tolerancia:
+            break
+
+    return _q_desde_valores(entorno, valores, gamma), iteracion
+
+
+def evaluar_politica(entorno, politica, gamma=0.9, tolerancia=1e-6, max_iteraciones=10000):
+    """
+    Calcula V^π de una política determinista
+
+    Args:
+        entorno: Objeto GridWorld
+        politica: Array con la acción de cada estado
+        gamma: Factor de descuento
+
+    Returns:
+        Array de valores por estado
+    """
+    estados = np.arange(entorno.get_num_estados())
+    siguientes = entorno.siguiente[estados, politica]
+    recompensas = entorno.recompensa[estados, politica]
+    continuar = ~entorno.terminal[estados, politica]
+
+    valores = np.zeros(len(estados))
+    for _ in range(max_iteraciones):
+        nuevos_valores = recompensas + gamma * continuar * valores[siguientes]
+        delta = np.max(np.abs(nuevos_valores - valores))
+        valores = nuevos_valores
+        if delta < tolerancia:
+            break
+    return valores
+
+
+def iteracion_politica(entorno, gamma=0.9, tolerancia=1e-6, max_iteraciones=1000):
+    """
+    Resuelve el GridWorld con iteración de política
+
+    Returns:
+        tabla_q óptima, iteraciones
+    """
+    politica = np.zeros(entorno.get_num_estados(), dtype=np.int64)
+
+    for iteracion in range(1, max_iteraciones + 1):
+        valores = evaluar_politica(entorno, politica, gamma, tolerancia)
+        q = _q_desde_valores(entorno, valores, gamma)
+        # Solo se cambia de acción si mejora, para no oscilar entre empates
+        mejor = q.argmax(axis=1)
+        mejora = q[np.arange(len(politica)), mejor] > q[np.arange(len(politica)), politica] + tolerancia
+        if not mejora.any():
+            break
+        politica = np.where(mejora, mejor, politica)
+
+    return _q_desde_valores(entorno, valores, gamma), iteracion
+
+
+def brecha_optimalidad(entorno, tabla_q, q_optima, gamma=0.9):
+    """
+    Mide cuánto se aleja la política greedy de una tabla Q de la óptima
+
+    Returns:
+        Diccionario con la pérdida de valor desde el inicio, la pérdida media
+        por estado, la fracción de estados con acción óptima y el error
+        máximo de la tabla Q
+    """
+    tabla_q = np.asarray(tabla_q)
+    politica = tabla_q.argmax(axis=1)
+    valores = evaluar_politica(entorno, politica, gamma)
+    valores_optimos = q_optima.max(axis=1)
+
+    estados = np.arange(len(politica))
+    optima = q_optima[estados, politica] >= valores_optimos - 1e-6
+    inicio = entorno.indice_inicio
+
+    return {
+        'perdida_inicio': float(valores_optimos[inicio] - valores[inicio]),
+        'perdida_media': float(np.mean(valores_optimos - valores)),
+        'acciones_optimas': float(np.mean(optima)),
+        'error_q_max': float(np.max(np.abs(tabla_q - q_optima)))
+    }
+
+
+def precalentar(agente, entorno, metodo='valor'):
+    """
+    Inicializa la tabla Q del agente con la solución exacta del entorno
+
+    Args:
+        agente: Objeto AgenteQLearning
+        entorno: Objeto GridWorld
+        metodo: 'valor' (iteración de valor) o 'politica' (iteración de política)
+
+    Returns:
+        Número de iteraciones usadas
+    """
+    if metodo == 'politica':
+        q_optima, iteraciones = iteracion_politica(entorno, agente.gamma)
+    else:
+        q_optima, iteraciones = iteracion_valor(entorno, agente.gamma)
+
+    agente.tabla_q[:] = q_optima
+    agente.politica.invalidar()
+    return iteraciones
+
+
+def recorrido_greedy(entorno, politica, max_pasos=None, inicio=None):
+    """
+    Sigue una política determinista desde un estado, sin explorar
+
+    Usa las tablas de transición del entorno, así que no modifica su estado.
+    Como el entorno y la política son deterministas, volver a un estado ya
+    visitado significa que el agente está en un bucle.
+
+    Args:
+        entorno: Objeto GridWorld
+        politica: Array con la acción de cada estado (por ejemplo
+                  agente.politica.politica()[0])
+        max_pasos: Límite de pasos (por defecto, el del entorno)
+        inicio: Índice de estado inicial (por defecto, el inicio del entorno)
+
+    Returns:
+        Lista de índices de estado visitados (incluido el inicial) y el motivo
+        del final: 'tesoro', 'bucle' o 'max_pasos'
+    """
+    max_pasos = entorno.max_pasos if max_pasos is None else max_pasos
+    estado = entorno.indice_inicio if inicio is None else inicio
+    estados = [estado]
+    visitados = {estado}
+
+    for _ in range(max_pasos):
+        accion = politica[estado]
+        terminado = entorno.terminal[estado, accion]
+        estado = int(entorno.siguiente[estado, accion])
+        estados.append(estado)
+        if terminado:
+            return estados, 'tesoro'
+        if estado in visitados:
+            return estados, 'bucle'
+        visitados.add(estado)
+
+    return estados, 'max_pasos'
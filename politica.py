@@ -0,0 +1,205 @@
+import threading
+import numpy as np
+from tablas import TablaQDispersa
+
+class PoliticaCacheada:
+    """
+    Política greedy y valores V(s) = max_a Q(s, a) precalculados por estado
+
+    Quien modifica la tabla Q marca la fila en `sucias` (un bytearray, para
+    que marcar cueste una asignación de Python en el bucle de entrenamiento)
+    y las consultas recalculan solo las filas marcadas antes de responder.
+    Las consultas nunca bloquean al hilo de entrenamiento: primero se borran
+    las marcas y después se leen las filas, así que una escritura concurrente
+    vuelve a marcar su fila y se recoge en la siguiente consulta.
+    """
+
+    def __init__(self, tabla_q):
+        """
+        Inicializa la caché con todas las filas pendientes de calcular
+
+        Args:
+            tabla_q: Tabla Q (densa o dispersa) de la que derivar la política
+        """
+        self.tabla_q = tabla_q
+        num_estados = len(tabla_q)
+
+        self.sucias = bytearray(b'\x01') * num_estados
+        self._sucias = np.frombuffer(self.sucias, dtype=np.uint8)
+        self.acciones = np.zeros(num_estados, dtype=np.int64)
+        self.valores = np.zeros(num_estados)
+        self._lock = threading.Lock()
+
+    def marcar(self, estados):
+        """Marca como modificadas las filas de un array de estados"""
+        self._sucias[estados] = 1
+
+    def invalidar(self):
+        """Marca todas las filas, por ejemplo tras sobrescribir la tabla entera"""
+        self._sucias[:] = 1
+
+    def refrescar(self):
+        """
+        Recalcula las filas marcadas
+
+        Returns:
+            Número de filas recalculadas
+        """
+        with self._lock:
+            filas = np.flatnonzero(self._sucias)
+            if not len(filas):
+                return 0
+            # Las marcas se borran antes de leer la tabla; ver la docstring de la clase
+            self._sucias[filas] = 0
+            q = np.asarray(self.tabla_q[filas])
+            self.acciones[filas] = q.argmax(axis=1)
+            self.valores[filas] = q.max(axis=1)
+            return len(filas)
+
+    @property
+    def nbytes(self):
+        """Memoria de las marcas y de la caché"""
+        return len(self.sucias) + self.acciones.nbytes + self.valores.nbytes
+
+    def accion(self, estado):
+        """Acción greedy de un estado"""
+        if self.sucias[estado]:
+            self.refrescar()
+        return int(self.acciones[estado])
+
+    def consultar(self, estados):
+        """
+        Acciones greedy y valores de un lote de estados
+
+        Returns:
+            Array de acciones, array de valores
+        """
+        self.refrescar()
+        return self.acciones[estados], self.valores[estados]
+
+    def politica(self):
+        """Retorna copias de la política y los valores de todos los estados"""
+        self.refrescar()
+        return self.acciones.copy(), self.valores.copy()
+
+
+class PoliticaDispersa(PoliticaCacheada):
+    """
+    Caché de la política para las tablas Q dispersas (bloques o hash)
+
+    Solo guarda los estados que la tabla tiene materializados: las marcas son
+    un diccionario (`sucias[estado] = 1` sigue costando una asignación) y la
+    caché otro, de estado a (acción, valor). Los estados sin memoria en la
+    tabla tienen todas sus Q a 0, así que su acción es 0 y su valor 0 sin
+    necesidad de guardarlos.
+    """
+
+    def __init__(self, tabla_q):
+        """
+        Inicializa la caché vacía
+
+        Args:
+            tabla_q: Tabla Q dispersa de la que derivar la política
+        """
+        self.tabla_q = tabla_q
+        self.sucias = {}
+        self._cache = {}
+        self._todas = True
+        self._lock = threading.Lock()
+
+    def marcar(self, estados):
+        """Marca como modificadas las filas de un array de estados"""
+        if isinstance(estados, slice):
+            self.invalidar()
+            return
+        self.sucias.update(dict.fromkeys(np.asarray(estados).ravel().tolist(), 1))
+
+    def invalidar(self):
+        """Marca todas las filas materializadas"""
+        self._todas = True
+
+    def refrescar(self):
+        """
+        Recalcula las filas marcadas, o todas las materializadas tras invalidar
+
+        Returns:
+            Número de filas recalculadas
+        """
+        with self._lock:
+            if self._todas:
+                self._todas = False
+                self.sucias.clear()
+                self._cache.clear()
+                filas = self.tabla_q.estados_materializados()
+            else:
+                filas = list(self.sucias)
+                if not filas:
+                    return 0
+                # Las marcas se borran antes de leer la tabla; ver PoliticaCacheada
+                for estado in filas:
+                    del self.sucias[estado]
+                filas = np.array(filas, dtype=np.int64)
+            if not len(filas):
+                return 0
+            q = np.asarray(self.tabla_q[filas])
+            self._cache.update(zip(filas.tolist(), zip(q.argmax(axis=1).tolist(), q.max(axis=1).tolist())))
+            return len(filas)
+
+    @property
+    def nbytes(self):
+        """Memoria aproximada de las marcas y de la caché"""
+        return 100 * len(self._cache) + 64 * len(self.sucias)
+
+    def accion(self, estado):
+        """Acción greedy de un estado"""
+        if self._todas or estado in self.sucias:
+            self.refrescar()
+        fila = self._cache.get(estado)
+        return 0 if fila is None else fila[0]
+
+    def consultar(self, estados):
+        """
+        Acciones greedy y valores de un lote de estados
+
+        Returns:
+            Array de acciones, array de valores
+        """
+        self.refrescar()
+        if isinstance(estados, slice):
+            estados = np.arange(len(self.tabla_q))[estados]
+        estados = np.asarray(estados)
+        with self._lock:
+            cache = dict(self._cache)
+
+        acciones = np.zeros(estados.shape, dtype=np.int64)
+        valores = np.zeros(estados.shape)
+        if not cache:
+            return acciones, valores
+        claves = np.fromiter(cache.keys(), dtype=np.int64, count=len(cache))
+        pares = np.array(list(cache.values()))
+        orden = np.argsort(claves)
+        claves = claves[orden]
+        posiciones = np.minimum(np.searchsorted(claves, estados), len(claves) - 1)
+        presentes = claves[posiciones] == estados
+        acciones[presentes] = pares[orden[posiciones[presentes]], 0]
+        valores[presentes] = pares[orden[posiciones[presentes]], 1]
+        return acciones, valores
+
+    def politica(self):
+        """Retorna la política y los valores de todos los estados"""
+        return self.consultar(slice(None))
+
+
+def crear_politica(tabla_q):
+    """
+    Crea la caché de política adecuada para una tabla Q
+
+    Args:
+        tabla_q: Tabla Q densa o dispersa
+
+    Returns:
+        PoliticaDispersa para las tablas dispersas, PoliticaCacheada para el resto
+    """
+    if isinstance(tabla_q, TablaQDispersa):
+        return PoliticaDispersa(tabla_q)
+    return PoliticaCacheada(tabla_q)
@@ -0,0 +1,127 @@
+import math
+
+TIPOS_PROGRAMA = ('constante', 'lineal', 'exponencial', 'visitas')
+
+
+class ProgramaConstante:
+    """Valor fijo durante todo el entrenamiento"""
+
+    por_estado = False
+
+    def __init__(self, inicial):
+        """
+        Args:
+            inicial: Valor de todos los episodios
+        """
+        self.inicial = inicial
+
+    def valor(self, episodio):
+        """Valor para un episodio"""
+        return self.inicial
+
+
+class ProgramaLineal:
+    """Interpola linealmente de `inicial` a `final` en `episodios` episodios"""
+
+    por_estado = False
+
+    def __init__(self, inicial, final, episodios):
+        """
+        Args:
+            inicial: Valor en el episodio 0
+            final: Valor desde el episodio `episodios`
+            episodios: Duración de la interpolación
+        """
+        self.inicial = inicial
+        self.final = final
+        self.episodios = max(int(episodios), 1)
+
+    def valor(self, episodio):
+        """Valor para un episodio"""
+        fraccion = min(episodio / self.episodios, 1.0)
+        return self.inicial + (self.final - self.inicial) * fraccion
+
+
+class ProgramaExponencial:
+    """
+    Decae exponencialmente de `inicial` hacia `final`
+
+    La distancia al valor final se reduce a un 1 % en `episodios` episodios,
+    así que admite final = 0.
+    """
+
+    por_estado = False
+
+    def __init__(self, inicial, final, episodios):
+        """
+        Args:
+            inicial: Valor en el episodio 0
+            final: Valor al que tiende
+            episodios: Episodios hasta quedar a un 1 % del valor final
+        """
+        self.inicial = inicial
+        self.final = final
+        self.decaimiento = math.log(0.01) / max(int(episodios), 1)
+
+    def valor(self, episodio):
+        """Valor para un episodio"""
+        return self.final + (self.inicial - self.final) * math.exp(self.decaimiento * episodio)
+
+
+class ProgramaVisitas:
+    """
+    Valor por estado que decae con las visitas a ese estado
+
+    valor(n) = final + (inicial - final) * visitas / (visitas + n), es decir,
+    está a medio camino tras `visitas` visitas. El agente cuenta las visitas
+    y lo consulta en cada paso (ver AgenteQLearning.usar_visitas).
+    """
+
+    por_estado = True
+
+    def __init__(self, inicial, final, visitas):
+        """
+        Args:
+            inicial: Valor de un estado sin visitar
+            final: Valor al que tiende con muchas visitas
+            visitas: Visitas para quedar a medio camino
+        """
+        self.inicial = inicial
+        self.final = final
+        self.visitas = max(float(visitas), 1.0)
+
+    def valor(self, episodio):
+        """Valor nominal, el de un estado sin visitar"""
+        return self.inicial
+
+    def valor_estado(self, visitas):
+        """Valor para un estado visitado `visitas` veces"""
+        return self.final + (self.inicial - self.final) * self.visitas / (self.visitas + visitas)
+
+
+def crear_programa(tipo, inicial, final=None, duracion=1000):
+    """
+    Crea un programa para ε o α
+
+    Args:
+        tipo: 'constante', 'lineal', 'exponencial' o 'visitas'
+        inicial: Valor al empezar
+        final: Valor al que tiende (por defecto, el inicial)
+        duracion: Episodios hasta el valor final (lineal), hasta quedar a un
+                  1 % de él (exponencial), o visitas a un estado para quedar a
+                  medio camino (visitas)
+
+    Returns:
+        Programa con método valor(episodio)
+    """
+    if tipo not in TIPOS_PROGRAMA:
+        raise ValueError(f"Programa desconocido: {tipo}")
+
+    final = inicial if final is None else final
+    if tipo == 'constante':
+        return ProgramaConstante(inicial)
+    if tipo == 'lineal':
+        return ProgramaLineal(inicial, final, duracion)
+    if tipo == 'exponencial':
+        return ProgramaExponencial(inicial, final, duracion)
+    return ProgramaVisitas(inicial, final, duracion)
@@ -0,0 +1,152 @@
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from almacen import AlmacenModelos
+
+TIPO_PUNTO_CONTROL = 'punto_control'
+
+class PuntosControl:
+    """
+    Guardado periódico de puntos de control durante el entrenamiento
+
+    El bucle de entrenamiento solo copia la tabla Q; la escritura a disco la
+    hace un hilo escritor en segundo plano. Se conservan los últimos
+    `conservar` puntos de control más el mejor por tasa de éxito.
+    """
+
+    def __init__(self, almacen, ejecucion=None, cada_episodios=None, cada_segundos=None, conservar=3):
+        """
+        Inicializa el gestor de puntos de control
+
+        Args:
+            almacen: AlmacenModelos donde escribir los puntos de control
+            ejecucion: Identificador de la ejecución; si ya tiene puntos de
+                       control se continúa con su historial
+            cada_episodios: Guardar cada N episodios
+            cada_segundos: Guardar cada T segundos
+            conservar: Número de puntos de control recientes a conservar
+        """
+        self.almacen = almacen
+        self.ejecucion = ejecucion or uuid.uuid4().hex[:12]
+        self.cada_episodios = cada_episodios
+        self.cada_segundos = cada_segundos
+        self.conservar = conservar
+
+        self.ultimo_episodio = 0
+        self.ultimo_tiempo = time.perf_counter()
+
+        self.recientes = deque()
+        self.mejor_id = None
+        self.mejor_tasa = None
+
+        previos = self.listar(almacen, self.ejecucion)
+        for entrada in previos:
+            self._registrar(entrada['id'], entrada['metricas'].get('tasa_exito', 0.0))
+        if previos:
+            self.ultimo_episodio = previos[-1]['episodio']
+
+        self._cola = queue.Queue()
+        self._hilo = threading.Thread(target=self._escribir, name=f"puntos-control-{self.ejecucion}", daemon=True)
+        self._hilo.start()
+
+    @staticmethod
+    def listar(almacen, ejecucion):
+        """Retorna los puntos de control de una ejecución ordenados por episodio"""
+        entradas = almacen.listar(ejecucion=ejecucion, tipo=TIPO_PUNTO_CONTROL)
+        return sorted(entradas, key=lambda e: (e['episodio'], e['id']))
+
+    @classmethod
+    def ultimo(cls, almacen, ejecucion):
+        """Retorna la entrada del último punto de control de una ejecución, o None"""
+        entradas = cls.listar(almacen, ejecucion)
+        return entradas[-1] if entradas else None
+
+    def tal_vez_guardar(self, entrenador):
+        """Guarda un punto de control si se cumplió el intervalo configurado"""
+        episodios = entrenador.episodios_completados - self.ultimo_episodio
+        if episodios <= 0:
+            return
+        if ((self.cada_episodios is not None and episodios >= self.cada_episodios) or
+                (self.cada_segundos is not None and
+                 time.perf_counter() - self.ultimo_tiempo >= self.cada_segundos)):
+            self.guardar(entrenador)
+
+    def guardar(self, entrenador):
+        """Toma una instantánea del agente y la encola para escribirla"""
+        agente = entrenador.agente
+        progreso = entrenador.progreso()
+
+        self._cola.put((
+            agente.tabla_q.copy(),
+            AlmacenModelos.hiperparametros(agente),
+            entrenador.entorno,
+            {
+                'episodios': progreso['episodio'],
+                'victorias': progreso['victorias'],
+                'tasa_exito': progreso['tasa_exito']
+            }
+        ))
+        self.ultimo_episodio = entrenador.episodios_completados
+        self.ultimo_tiempo = time.perf_counter()
+
+    def pendientes(self, entrenador):
+        """Indica si hay episodios sin guardar desde el último punto de control"""
+        return entrenador.episodios_completados > self.ultimo_episodio
+
+    def cerrar(self, timeout=None):
+        """Espera a que se escriban los puntos de control pendientes y detiene el hilo escritor"""
+        self._cola.put(None)
+        self._hilo.join(timeout)
+
+    def _escribir(self):
+        while True:
+            tarea = self._cola.get()
+            if tarea is None:
+                return
+
+            tabla_q, hiperparametros, entorno, metricas = tarea
+            try:
+                id_modelo = self.almacen.guardar_tabla(
+                    tabla_q, hiperparametros, entorno=entorno, metricas=metricas,
+                    tipo=TIPO_PUNTO_CONTROL, ejecucion=self.ejecucion, episodio=metricas['episodios']
+                )
+                self._registrar(id_modelo, metricas['tasa_exito'])
+            except Exception as e:
+                print(f"Error al guardar punto de control: {e}")
+
+    def _registrar(self, id_modelo, tasa_exito):
+        """Añade un punto de control al historial y aplica la retención"""
+        self.recientes.append(id_modelo)
+
+        if self.mejor_tasa is None or tasa_exito >= self.mejor_tasa:
+            anterior = self.mejor_id
+            self.mejor_id = id_modelo
+            self.mejor_tasa = tasa_exito
+            if anterior is not None and anterior not in self.recientes:
+                self.almacen.borrar(anterior)
+
+        while len(self.recientes) > self.conservar:
+            id_viejo = self.recientes.popleft()
+            if id_viejo != self.mejor_id:
+                self.almacen.borrar(id_viejo)
+
+
+def reanudar(almacen, ejecucion):
+    """
+    Recupera el último punto de control de una ejecución
+
+    Returns:
+        entorno, agente, entrada del manifiesto
+
+    Raises:
+        KeyError: si la ejecución no tiene puntos de control
+    """
+    entrada = PuntosControl.ultimo(almacen, ejecucion)
+    if entrada is None:
+        raise KeyError(f"La ejecución {ejecucion} no tiene puntos de control")
+
+    entorno = almacen.cargar_entorno(entrada['id'])
+    agente = almacen.cargar(entrada['id'], solo_lectura=False)
+    return entorno, agente, entrada
@@ -0,0 +1,393 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import numpy as np
+from entorno import GridWorld
+from agente import crear_agente, PARAMETROS_MODO
+from almacen import AlmacenModelos
+
+# Bytes por pareja (s, a) de las tablas precalculadas de GridWorld: siguiente,
+# recompensa y sus copias planas (8 + 8 + 8 + 8), evento (1 + 1), terminal
+# (1 + 8 de la lista de Python)
+BYTES_ENTORNO = 43
+# Modelo de AgenteDynaQ: siguiente, recompensa, terminal, observados y prioridades
+BYTES_MODELO_DYNA = 33
+# PoliticaCacheada de una tabla densa, por estado: marca, acción y valor (1 + 8 + 8)
+BYTES_POLITICA = 17
+
+
+def estimar_bytes(num_estados, num_acciones, modo='q', almacenamiento='densa', dtype='float64'):
+    """
+    Estima la memoria de un entorno y un agente antes de crearlos
+
+    Las tablas dispersas, su caché de política y su modelo de Dyna-Q
+    empiezan casi vacíos, así que solo cuentan el entorno; su crecimiento se
+    mide después con medir_bytes.
+    """
+    celdas = num_estados * num_acciones
+    total = celdas * BYTES_ENTORNO
+    if almacenamiento == 'densa':
+        total += celdas * np.dtype(dtype).itemsize + num_estados * BYTES_POLITICA
+        if modo in ('dyna', 'priorizado'):
+            total += celdas * BYTES_MODELO_DYNA
+    return total
+
+
+def estimar_modelo(parametros):
+    """Estima la memoria de un modelo a partir de sus hiperparámetros (ver AlmacenModelos.hiperparametros)"""
+    return estimar_bytes(parametros['num_estados'], parametros['num_acciones'], parametros.get('modo', 'q'),
+                         parametros.get('almacenamiento', 'densa'), parametros.get('dtype', 'float64'))
+
+
+def medir_bytes(entorno, agente):
+    """
+    Memoria actual de un entorno y un agente, con la tabla Q, la caché de
+    política y el modelo medidos
+
+    Una tabla mapeada en copia-en-escritura (ver AlmacenModelos.cargar)
+    cuenta entera: sus páginas pasan a memoria privada en cuanto se entrena.
+    """
+    total = estimar_bytes(agente.num_estados, agente.num_acciones, agente.modo, almacenamiento='dispersa')
+    total += agente.politica.nbytes + getattr(agente, 'nbytes_modelo', 0)
+    return total + agente.tabla_q.nbytes
+
+
+class Sesion:
+    """
+    Entorno y agente de un cliente
+
+    Mientras está en memoria guarda el entorno y el agente; una vez volcada
+    solo conserva su descripción y la ruta de la tabla Q en disco.
+    """
+
+    def __init__(self, id_sesion, entorno, agente):
+        """
+        Inicializa la sesión
+
+        Args:
+            id_sesion: Identificador de la sesión
+            entorno: Objeto GridWorld
+            agente: Objeto AgenteQLearning
+        """
+        self.id = id_sesion
+        self.entorno = entorno
+        self.agente = agente
+        self.bytes = medir_bytes(entorno, agente)
+        self.ultimo_acceso = time.time()
+        self.trabajos = []
+
+        self.volcado = None
+
+    @property
+    def residente(self):
+        """Si el entorno y el agente están en memoria"""
+        return self.agente is not None
+
+    def en_uso(self):
+        """Si algún trabajo de la sesión sigue entrenando"""
+        return any(trabajo.estado == 'ejecutando' for trabajo in self.trabajos)
+
+    def resumen(self):
+        """Retorna el estado de la sesión como diccionario serializable"""
+        return {
+            'id': self.id,
+            'residente': self.residente,
+            'bytes': self.bytes if self.residente else 0,
+            'ultimo_acceso': self.ultimo_acceso,
+            'trabajos': [trabajo.id for trabajo in self.trabajos]
+        }
+
+
+class RegistroSesiones:
+    """
+    Registro de las sesiones de los clientes, en orden de último acceso (LRU)
+
+    Antes de crear un entorno y un agente se comprueba que quepan en el
+    presupuesto de memoria; si no caben se vuelcan a disco las sesiones
+    menos usadas que no están entrenando. Las sesiones inactivas se vuelcan
+    tras `inactividad` segundos y las volcadas se eliminan, con su archivo,
+    tras `expiracion` segundos o cuando hay más de `max_sesiones`. Una
+    sesión volcada se restaura al volver a usarla.
+    """
+
+    def __init__(self, carpeta='resultados/sesiones', presupuesto_bytes=1 << 30, max_sesiones=1000,
+                 inactividad=600.0, expiracion=86400.0):
+        """
+        Inicializa el registro
+
+        Args:
+            carpeta: Carpeta donde se vuelcan las tablas Q
+            presupuesto_bytes: Memoria máxima de las sesiones residentes
+            max_sesiones: Máximo de sesiones registradas, residentes o volcadas
+            inactividad: Segundos sin uso tras los que se vuelca una sesión
+            expiracion: Segundos sin uso tras los que se elimina una sesión volcada
+        """
+        self.carpeta = carpeta
+        self.presupuesto_bytes = presupuesto_bytes
+        self.max_sesiones = max_sesiones
+        self.inactividad = inactividad
+        self.expiracion = expiracion
+
+        self.sesiones = OrderedDict()
+        self.bytes_residentes = 0
+        # Reservados con reservar() y aún no consumidos por reemplazar()
+        self.bytes_reservados = 0
+        self._lock = threading.RLock()
+
+        os.makedirs(carpeta, exist_ok=True)
+
+    def obtener(self, id_sesion=None):
+        """
+        Retorna la sesión indicada, restaurándola si estaba volcada
+
+        Si no existe (o id_sesion es None) crea una nueva con el entorno y el
+        agente por defecto.
+        """
+        with self._lock:
+            self._mantener()
+            sesion = self.sesiones.get(id_sesion) if id_sesion else None
+            if sesion is None:
+                entorno = GridWorld()
+                num_estados, num_acciones = entorno.get_num_estados(), entorno.get_num_acciones()
+                reserva = self.reservar(estimar_bytes(num_estados, num_acciones))
+                try:
+                    sesion = Sesion(uuid.uuid4().hex, entorno, crear_agente('q', num_estados, num_acciones))
+                finally:
+                    self.liberar_reserva(reserva)
+                self.sesiones[sesion.id] = sesion
+                self.bytes_residentes += sesion.bytes
+                self._limitar()
+            elif not sesion.residente:
+                self._restaurar(sesion)
+            else:
+                self._remedir(sesion)
+
+            sesion.ultimo_acceso = time.time()
+            self.sesiones.move_to_end(sesion.id)
+            return sesion
+
+    def reservar(self, num_bytes, excepto=None):
+        """
+        Libera memoria hasta que quepan `num_bytes` más en el presupuesto y los reserva
+
+        La reserva cuenta en el presupuesto hasta que reemplazar() la consume
+        o liberar_reserva() la devuelve, así que dos peticiones simultáneas
+        no pueden usar la misma memoria libre.
+
+        Args:
+            num_bytes: Bytes que se van a reservar
+            excepto: Sesión que no debe volcarse (la que pide la memoria)
+
+        Returns:
+            Bytes reservados, para pasarlos a reemplazar() o liberar_reserva()
+
+        Raises:
+            MemoryError: Si ni volcando todas las sesiones libres caben
+        """
+        with self._lock:
+            if num_bytes > self.presupuesto_bytes:
+                raise MemoryError(f"Se necesitan {num_bytes} bytes y el presupuesto es de "
+                                  f"{self.presupuesto_bytes}")
+            for sesion in list(self.sesiones.values()):
+                if self._ocupados() + num_bytes <= self.presupuesto_bytes:
+                    break
+                if sesion is not excepto and sesion.residente and not sesion.en_uso():
+                    self._volcar(sesion)
+            if self._ocupados() + num_bytes > self.presupuesto_bytes:
+                raise MemoryError(f"Sin memoria para {num_bytes} bytes: "
+                                  f"{self._ocupados()} de {self.presupuesto_bytes} en sesiones activas "
+                                  f"y reservas pendientes")
+            self.bytes_reservados += num_bytes
+            return num_bytes
+
+    def liberar_reserva(self, num_bytes):
+        """Devuelve al presupuesto una reserva que no se va a usar"""
+        with self._lock:
+            self.bytes_reservados -= num_bytes
+
+    def _ocupados(self):
+        return self.bytes_residentes + self.bytes_reservados
+
+    def reemplazar(self, sesion, entorno, agente, reserva=0):
+        """
+        Cambia el entorno y el agente de una sesión
+
+        Quien los crea debe haber llamado antes a reservar() con su tamaño
+        estimado; aquí se consume esa reserva y la cuenta pasa a usar el
+        tamaño medido.
+
+        Args:
+            sesion: Sesión a modificar
+            entorno: Nuevo objeto GridWorld
+            agente: Nuevo agente
+            reserva: Bytes retornados por reservar() para este reemplazo
+        """
+        with self._lock:
+            self.bytes_reservados -= reserva
+            # Los trabajos terminados sueltan el entorno y el agente anteriores
+            for trabajo in sesion.trabajos:
+                trabajo.liberar()
+            if sesion.residente:
+                self.bytes_residentes -= sesion.bytes
+            else:
+                self._borrar_volcado(sesion)
+            sesion.entorno = entorno
+            sesion.agente = agente
+            sesion.bytes = medir_bytes(entorno, agente)
+            self.bytes_residentes += sesion.bytes
+
+    def iniciar_trabajo(self, sesion, crear):
+        """
+        Lanza un trabajo con el entorno y el agente de una sesión libre
+
+        La comprobación y la creación se hacen bajo el lock del registro, así
+        que dos peticiones simultáneas no pueden entrenar el mismo agente.
+
+        Args:
+            sesion: Sesión residente
+            crear: Función (entorno, agente) que crea y arranca el trabajo
+
+        Returns:
+            El trabajo creado, o None si la sesión ya tiene uno en curso
+        """
+        with self._lock:
+            if sesion.en_uso():
+                return None
+            trabajo = crear(sesion.entorno, sesion.agente)
+            sesion.trabajos.append(trabajo)
+            return trabajo
+
+    def estimar_reemplazo(self, sesion, num_bytes):
+        """Bytes a reservar para sustituir el entorno y el agente de una sesión por otros de num_bytes"""
+        if sesion.residente and not sesion.en_uso():
+            # Los actuales se liberan al reemplazarlos
+            return max(num_bytes - sesion.bytes, 0)
+        return num_bytes
+
+    def _remedir(self, sesion):
+        """Actualiza la cuenta de una sesión residente cuya tabla dispersa ha crecido"""
+        bytes_actuales = medir_bytes(sesion.entorno, sesion.agente)
+        self.bytes_residentes += bytes_actuales - sesion.bytes
+        sesion.bytes = bytes_actuales
+
+    def _ruta_volcado(self, sesion, extension):
+        return os.path.join(self.carpeta, f"{sesion.id}.{extension}")
+
+    def _volcar(self, sesion):
+        """
+        Guarda la tabla Q de una sesión en disco y libera su entorno y su agente
+
+        Una tabla densa se guarda como .npy; de una dispersa solo se guardan
+        las filas materializadas, en un .npz con sus estados.
+        """
+        tabla_q = sesion.agente.tabla_q
+        parametros = AlmacenModelos.hiperparametros(sesion.agente)
+        if parametros['almacenamiento'] == 'densa':
+            ruta = self._ruta_volcado(sesion, 'npy')
+        else:
+            ruta = self._ruta_volcado(sesion, 'npz')
+        ruta_temporal = ruta + '.tmp'
+        with open(ruta_temporal, 'wb') as f:
+            if parametros['almacenamiento'] == 'densa':
+                np.save(f, np.asarray(tabla_q))
+            else:
+                estados = tabla_q.estados_materializados()
+                np.savez(f, estados=estados, filas=tabla_q[estados])
+        os.replace(ruta_temporal, ruta)
+
+        sesion.volcado = {
+            'ruta': ruta,
+            'bytes': sesion.bytes,
+            'hiperparametros': parametros,
+            'entorno': AlmacenModelos.describir_entorno(sesion.entorno)
+        }
+        # Los trabajos terminados de la sesión también sueltan sus referencias
+        for trabajo in sesion.trabajos:
+            trabajo.liberar()
+        sesion.entorno = None
+        sesion.agente = None
+        self.bytes_residentes -= sesion.bytes
+
+    def _restaurar(self, sesion):
+        """Vuelve a cargar en memoria una sesión volcada"""
+        volcado = sesion.volcado
+        parametros = volcado['hiperparametros']
+        config = volcado['entorno']
+        # Una tabla dispersa ocupa lo que ocupaba al volcarla, no lo que estima estimar_modelo
+        reserva = self.reservar(max(estimar_modelo(parametros), volcado['bytes']), excepto=sesion)
+
+        try:
+            entorno = GridWorld(size=config['size'], max_pasos=config['max_pasos'], trampas=config['trampas'])
+            agente = crear_agente(parametros['modo'], parametros['num_estados'], parametros['num_acciones'],
+                                  alpha=parametros['alpha'], gamma=parametros['gamma'],
+                                  epsilon=parametros['epsilon'], almacenamiento=parametros['almacenamiento'],
+                                  dtype=parametros['dtype'],
+                                  **{nombre: parametros[nombre] for nombre in PARAMETROS_MODO
+                                     if nombre in parametros})
+            if parametros['almacenamiento'] == 'densa':
+                # Se copia sobre la tabla ya reservada, sin una segunda copia en memoria
+                agente.tabla_q[:] = np.load(volcado['ruta'], mmap_mode='r')
+            else:
+                with np.load(volcado['ruta']) as volcada:
+                    agente.tabla_q[volcada['estados']] = volcada['filas']
+            agente.politica.invalidar()
+        except Exception:
+            self.liberar_reserva(reserva)
+            raise
+        self.reemplazar(sesion, entorno, agente, reserva)
+
+    def _borrar_volcado(self, sesion):
+        if sesion.volcado is None:
+            return
+        try:
+            os.remove(sesion.volcado['ruta'])
+        except FileNotFoundError:
+            pass
+        sesion.volcado = None
+
+    def _eliminar(self, sesion):
+        """Quita una sesión del registro, borrando su volcado"""
+        for trabajo in sesion.trabajos:
+            trabajo.liberar()
+        if sesion.residente:
+            self.bytes_residentes -= sesion.bytes
+        self._borrar_volcado(sesion)
+        del self.sesiones[sesion.id]
+
+    def _mantener(self):
+        """Vuelca las sesiones inactivas y elimina las volcadas que han expirado"""
+        ahora = time.time()
+        # El orden LRU permite parar en la primera sesión usada recientemente
+        for sesion in list(self.sesiones.values()):
+            inactiva = ahora - sesion.ultimo_acceso
+            if inactiva < self.inactividad:
+                break
+            if sesion.en_uso():
+                continue
+            if sesion.residente:
+                self._volcar(sesion)
+            elif inactiva >= self.expiracion:
+                self._eliminar(sesion)
+
+    def _limitar(self):
+        """Elimina las sesiones menos usadas que sobran de max_sesiones"""
+        for sesion in list(self.sesiones.values()):
+            if len(self.sesiones) <= self.max_sesiones:
+                return
+            if not sesion.en_uso():
+                self._eliminar(sesion)
+
+    def resumen(self):
+        """Retorna el uso de memoria y el número de sesiones"""
+        with self._lock:
+            residentes = sum(1 for sesion in self.sesiones.values() if sesion.residente)
+            return {
+                'sesiones': len(self.sesiones),
+                'residentes': residentes,
+                'volcadas': len(self.sesiones) - residentes,
+                'bytes_residentes': self.bytes_residentes,
+                'bytes_reservados': self.bytes_reservados,
+                'presupuesto_bytes': self.presupuesto_bytes
+            }
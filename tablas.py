@@ -0,0 +1,366 @@
+import math
+import numpy as np
+
+ALMACENAMIENTOS = ('densa', 'bloques', 'dispersa')
+TIPOS = ('float64', 'float32', 'float16')
+
+
+def _es_entero(indice):
+    return isinstance(indice, (int, np.integer))
+
+
+class TablaQDispersa:
+    """
+    Base de las tablas Q que solo reservan memoria para los estados visitados
+
+    Imita la indexación de un array NumPy de forma (num_estados, num_acciones)
+    en los casos que usa el agente: tabla[s] (fila), tabla[s, a] (valor),
+    tabla[estados] y tabla[estados, acciones] con arrays, y tabla[:] = matriz.
+    Los estados nunca escritos valen 0. np.asarray(tabla) materializa la
+    tabla densa completa, así que solo debe usarse para guardarla o analizarla.
+
+    Las subclases implementan _fila, _valor, _asignar, _leer_filas,
+    _escribir y estados_materializados.
+    """
+
+    def __init__(self, num_estados, num_acciones, dtype='float64'):
+        self.num_estados = num_estados
+        self.num_acciones = num_acciones
+        self.dtype = np.dtype(dtype)
+        self.shape = (num_estados, num_acciones)
+        self.ndim = 2
+
+        # Fila de solo lectura para los estados sin memoria reservada
+        self._ceros = np.zeros(num_acciones, dtype=self.dtype)
+        self._ceros.flags.writeable = False
+
+    def __len__(self):
+        return self.num_estados
+
+    def __getitem__(self, indice):
+        # Atajo para los accesos escalares del bucle de entrenamiento
+        tipo = type(indice)
+        if tipo is int:
+            return self._fila(indice)
+        if tipo is tuple and type(indice[0]) is int and type(indice[1]) is int:
+            return self._valor(indice[0], indice[1])
+
+        if isinstance(indice, tuple):
+            estado, accion = indice
+            if _es_entero(estado) and _es_entero(accion):
+                return self._valor(int(estado), int(accion))
+            estados, acciones = np.broadcast_arrays(np.asarray(estado), np.asarray(accion))
+            filas = self._leer_filas(estados.ravel())
+            return filas[np.arange(estados.size), acciones.ravel()].reshape(estados.shape)
+
+        if _es_entero(indice):
+            return self._fila(int(indice))
+        if isinstance(indice, slice):
+            return np.asarray(self)[indice]
+
+        estados = np.asarray(indice)
+        return self._leer_filas(estados.ravel()).reshape(estados.shape + (self.num_acciones,))
+
+    def __setitem__(self, indice, valor):
+        if type(indice) is tuple and type(indice[0]) is int and type(indice[1]) is int:
+            self._asignar(indice[0], indice[1], valor)
+            return
+
+        if isinstance(indice, tuple):
+            estado, accion = indice
+            if _es_entero(estado) and _es_entero(accion):
+                self._asignar(int(estado), int(accion), valor)
+                return
+            estados, acciones, valores = np.broadcast_arrays(np.asarray(estado), np.asarray(accion),
+                                                             np.asarray(valor, dtype=self.dtype))
+            self._escribir(estados.ravel(), acciones.ravel(), valores.ravel())
+            return
+
+        if _es_entero(indice):
+            self._escribir(np.full(self.num_acciones, int(indice)), np.arange(self.num_acciones),
+                           np.broadcast_to(np.asarray(valor, dtype=self.dtype), (self.num_acciones,)))
+            return
+
+        if isinstance(indice, slice):
+            estados = np.arange(self.num_estados)[indice]
+        else:
+            estados = np.asarray(indice)
+
+        valores = np.broadcast_to(np.asarray(valor, dtype=self.dtype), (len(estados), self.num_acciones))
+        # Las filas que quedan a cero no necesitan memoria
+        escribir = valores.any(axis=1) | self._materializados(estados)
+        estados = estados[escribir]
+        valores = valores[escribir]
+        acciones = np.tile(np.arange(self.num_acciones), len(estados))
+        self._escribir(np.repeat(estados, self.num_acciones), acciones, valores.ravel())
+
+    def __array__(self, dtype=None, copy=None):
+        densa = np.zeros(self.shape, dtype=self.dtype)
+        estados = self.estados_materializados()
+        if len(estados):
+            densa[estados] = self._leer_filas(estados)
+        return densa if dtype is None else densa.astype(dtype)
+
+    def max(self, axis=None):
+        return np.asarray(self).max(axis=axis)
+
+    def argmax(self, axis=None):
+        return np.asarray(self).argmax(axis=axis)
+
+    def copy(self):
+        """Copia independiente con el mismo almacenamiento"""
+        copia = self._vacia()
+        estados = self.estados_materializados()
+        if len(estados):
+            copia[estados] = self._leer_filas(estados)
+        return copia
+
+    def _materializados(self, estados):
+        """Máscara de los estados que ya tienen memoria reservada"""
+        marcados = np.zeros(self.num_estados, dtype=bool)
+        marcados[self.estados_materializados()] = True
+        return marcados[estados]
+
+
+class TablaQBloques(TablaQDispersa):
+    """
+    Tabla Q por bloques de estados reservados al primer uso
+
+    Un agente dirigido a un objetivo solo visita una parte del grid, así que
+    la memoria crece con la región explorada y no con el tamaño del grid.
+    Sin `ancho` cada bloque agrupa `tam_bloque` índices consecutivos; con el
+    ancho del grid cada bloque es un cuadrado de celdas vecinas, de modo que
+    un camino que cruza el grid en vertical no reserva un bloque por fila.
+    Cada bloque es un array denso y leer una fila sigue siendo una vista.
+    """
+
+    def __init__(self, num_estados, num_acciones, dtype='float64', tam_bloque=1024, ancho=None):
+        """
+        Inicializa la tabla
+
+        Args:
+            num_estados: Número total de estados
+            num_acciones: Número de acciones
+            dtype: Tipo de los valores Q
+            tam_bloque: Estados por bloque (con `ancho`, se redondea a un cuadrado)
+            ancho: Ancho del grid para agrupar en cuadrados, o None
+        """
+        super().__init__(num_estados, num_acciones, dtype)
+        self.ancho = ancho
+
+        if ancho is None:
+            self.tam_bloque = tam_bloque
+            num_bloques = -(-num_estados // tam_bloque)
+        else:
+            self.lado = max(1, int(tam_bloque ** 0.5))
+            self.tam_bloque = self.lado * self.lado
+            self.bloques_por_fila = -(-ancho // self.lado)
+            alto = -(-num_estados // ancho)
+            num_bloques = self.bloques_por_fila * -(-alto // self.lado)
+        self.bloques = [None] * num_bloques
+
+    def _vacia(self):
+        return TablaQBloques(self.num_estados, self.num_acciones, self.dtype, self.tam_bloque, self.ancho)
+
+    def _ubicar(self, estado):
+        """Retorna (bloque, fila dentro del bloque) de un estado; acepta arrays"""
+        if self.ancho is None:
+            return divmod(estado, self.tam_bloque)
+        lado = self.lado
+        fila, columna = divmod(estado, self.ancho)
+        return (fila // lado * self.bloques_por_fila + columna // lado,
+                fila % lado * lado + columna % lado)
+
+    def _bloque(self, numero):
+        bloque = self.bloques[numero]
+        if bloque is None:
+            bloque = np.zeros((self.tam_bloque, self.num_acciones), dtype=self.dtype)
+            self.bloques[numero] = bloque
+        return bloque
+
+    def _fila(self, estado):
+        numero, fila = self._ubicar(estado)
+        bloque = self.bloques[numero]
+        if bloque is None:
+            return self._ceros
+        return bloque[fila]
+
+    def _valor(self, estado, accion):
+        numero, fila = self._ubicar(estado)
+        bloque = self.bloques[numero]
+        if bloque is None:
+            return self._ceros[accion]
+        return bloque[fila, accion]
+
+    def _asignar(self, estado, accion, valor):
+        numero, fila = self._ubicar(estado)
+        self._bloque(numero)[fila, accion] = valor
+
+    def _leer_filas(self, estados):
+        salida = np.zeros((len(estados), self.num_acciones), dtype=self.dtype)
+        numeros, filas = self._ubicar(np.asarray(estados))
+        for numero in np.unique(numeros):
+            bloque = self.bloques[numero]
+            if bloque is not None:
+                en_bloque = numeros == numero
+                salida[en_bloque] = bloque[filas[en_bloque]]
+        return salida
+
+    def _escribir(self, estados, acciones, valores):
+        numeros, filas = self._ubicar(np.asarray(estados))
+        for numero in np.unique(numeros):
+            en_bloque = numeros == numero
+            self._bloque(numero)[filas[en_bloque], acciones[en_bloque]] = valores[en_bloque]
+
+    def estados_materializados(self):
+        """Índices de los estados con memoria reservada"""
+        numeros = np.array([n for n, bloque in enumerate(self.bloques) if bloque is not None], dtype=np.int64)
+        if not len(numeros):
+            return numeros
+
+        if self.ancho is None:
+            estados = (numeros[:, None] * self.tam_bloque + np.arange(self.tam_bloque)).ravel()
+            return estados[estados < self.num_estados]
+
+        bloque_fila, bloque_columna = np.divmod(numeros, self.bloques_por_fila)
+        fila, columna = np.divmod(np.arange(self.tam_bloque), self.lado)
+        filas = (bloque_fila[:, None] * self.lado + fila).ravel()
+        columnas = (bloque_columna[:, None] * self.lado + columna).ravel()
+        estados = filas * self.ancho + columnas
+        return estados[(columnas < self.ancho) & (estados < self.num_estados)]
+
+    @property
+    def nbytes(self):
+        return sum(bloque.nbytes for bloque in self.bloques if bloque is not None)
+
+
+class TablaQHash(TablaQDispersa):
+    """
+    Tabla Q dispersa con un índice hash de estado a fila
+
+    Las filas de los estados visitados se guardan contiguas en un array que
+    crece por duplicación, y un diccionario traduce el índice de estado a su
+    fila. Ocupa memoria proporcional a los estados visitados, sin importar
+    dónde estén, a cambio de una búsqueda en el diccionario por acceso.
+    """
+
+    def __init__(self, num_estados, num_acciones, dtype='float64', capacidad=1024):
+        """
+        Inicializa la tabla
+
+        Args:
+            num_estados: Número total de estados
+            num_acciones: Número de acciones
+            dtype: Tipo de los valores Q
+            capacidad: Filas reservadas inicialmente
+        """
+        super().__init__(num_estados, num_acciones, dtype)
+        self.indice = {}
+        self.filas = np.zeros((capacidad, num_acciones), dtype=self.dtype)
+
+    def _vacia(self):
+        return TablaQHash(self.num_estados, self.num_acciones, self.dtype, max(len(self.indice), 1))
+
+    def _posicion(self, estado):
+        posicion = self.indice.get(estado)
+        if posicion is None:
+            posicion = len(self.indice)
+            if posicion == len(self.filas):
+                filas = np.zeros((2 * len(self.filas), self.num_acciones), dtype=self.dtype)
+                filas[:posicion] = self.filas
+                self.filas = filas
+            self.indice[estado] = posicion
+        return posicion
+
+    def _fila(self, estado):
+        posicion = self.indice.get(estado)
+        if posicion is None:
+            return self._ceros
+        return self.filas[posicion]
+
+    def _valor(self, estado, accion):
+        posicion = self.indice.get(estado)
+        if posicion is None:
+            return self._ceros[accion]
+        return self.filas[posicion, accion]
+
+    def _asignar(self, estado, accion, valor):
+        # La posición se calcula antes de indexar porque puede reemplazar self.filas
+        posicion = self._posicion(estado)
+        self.filas[posicion, accion] = valor
+
+    def _leer_filas(self, estados):
+        obtener = self.indice.get
+        posiciones = np.fromiter((obtener(e, -1) for e in estados.tolist()), dtype=np.int64, count=len(estados))
+        salida = np.zeros((len(estados), self.num_acciones), dtype=self.dtype)
+        presentes = posiciones >= 0
+        salida[presentes] = self.filas[posiciones[presentes]]
+        return salida
+
+    def _escribir(self, estados, acciones, valores):
+        posiciones = np.fromiter((self._posicion(e) for e in estados.tolist()), dtype=np.int64, count=len(estados))
+        self.filas[posiciones, acciones] = valores
+
+    def estados_materializados(self):
+        """Índices de los estados con memoria reservada"""
+        return np.fromiter(self.indice.keys(), dtype=np.int64, count=len(self.indice))
+
+    @property
+    def nbytes(self):
+        return self.filas.nbytes
+
+
+def crear_tabla(num_estados, num_acciones, almacenamiento='densa', dtype='float64', **opciones):
+    """
+    Crea una tabla Q inicializada a cero
+
+    Args:
+        num_estados: Número total de estados
+        num_acciones: Número de acciones
+        almacenamiento: 'densa' (array NumPy), 'bloques' (bloques reservados
+                        al primer uso) o 'dispersa' (índice hash)
+        dtype: 'float64', 'float32' o 'float16'
+        opciones: tam_bloque y ancho para 'bloques' (si no se indica el ancho
+                  y num_estados es un cuadrado perfecto se asume un grid
+                  cuadrado), capacidad para 'dispersa'
+
+    Returns:
+        Array NumPy o tabla dispersa con la misma indexación
+    """
+    if almacenamiento not in ALMACENAMIENTOS:
+        raise ValueError(f"Almacenamiento desconocido: {almacenamiento}")
+    if np.dtype(dtype).name not in TIPOS:
+        raise ValueError(f"Tipo de tabla no soportado: {dtype}")
+
+    if almacenamiento == 'bloques':
+        lado = math.isqrt(num_estados)
+        if lado * lado == num_estados:
+            opciones.setdefault('ancho', lado)
+        return TablaQBloques(num_estados, num_acciones, dtype, **opciones)
+    if almacenamiento == 'dispersa':
+        return TablaQHash(num_estados, num_acciones, dtype, **opciones)
+    return np.zeros((num_estados, num_acciones), dtype=dtype)
+
+
+def describir_tabla(tabla_q):
+    """Retorna (almacenamiento, dtype) de una tabla Q"""
+    if isinstance(tabla_q, TablaQBloques):
+        almacenamiento = 'bloques'
+    elif isinstance(tabla_q, TablaQHash):
+        almacenamiento = 'dispersa'
+    else:
+        almacenamiento = 'densa'
+    return almacenamiento, np.dtype(tabla_q.dtype).name
+
+
+def convertir_tabla(tabla_q, almacenamiento='densa', dtype=None):
+    """Copia una tabla Q (densa o dispersa) al almacenamiento y tipo indicados"""
+    dtype = np.dtype(tabla_q.dtype if dtype is None else dtype)
+    if almacenamiento == 'densa':
+        return np.array(tabla_q, dtype=dtype)
+
+    num_estados, num_acciones = tabla_q.shape
+    tabla = crear_tabla(num_estados, num_acciones, almacenamiento, dtype)
+    # Solo se reservan las filas no nulas
+    tabla[:] = np.asarray(tabla_q)
+    return tabla
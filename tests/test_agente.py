@@ -0,0 +1,159 @@
+import random
+
+import numpy as np
+import pytest
+
+from agente import AgenteQLearning, AgenteQLambda
+from entorno import GridWorld
+
+
+def lote_secuencial(agente, estados, acciones, recompensas, siguientes, terminados):
+    """Referencia: objetivos con la tabla previa y actualizaciones una a una en orden"""
+    previa = np.array(agente.tabla_q[:], dtype=np.float64)
+    tabla = previa.copy()
+    for s, a, r, s2, t in zip(estados, acciones, recompensas, siguientes, terminados):
+        objetivo = r if t else r + agente.gamma * previa[s2].max()
+        tabla[s, a] += agente.alpha * (objetivo - tabla[s, a])
+    return tabla
+
+
+def agente_aleatorio(semilla, num_estados=6, num_acciones=3, alpha=0.3, **parametros):
+    agente = AgenteQLearning(num_estados, num_acciones, alpha=alpha, gamma=0.9, **parametros)
+    agente.tabla_q[:] = np.random.default_rng(semilla).normal(size=(num_estados, num_acciones))
+    return agente
+
+
+def test_lote_sin_repeticiones_es_una_actualizacion_por_par():
+    agente = agente_aleatorio(0)
+    estados, acciones = np.array([0, 1, 2]), np.array([2, 0, 1])
+    recompensas, siguientes = np.array([1.0, -1.0, 5.0]), np.array([1, 2, 5])
+    terminados = np.array([False, False, True])
+    esperado = lote_secuencial(agente, estados, acciones, recompensas, siguientes, terminados)
+    agente.actualizar_q_lote(estados, acciones, recompensas, siguientes, terminados)
+    assert np.allclose(agente.tabla_q[:], esperado)
+
+
+def test_pares_repetidos_equivalen_a_k_actualizaciones_secuenciales():
+    agente = agente_aleatorio(1)
+    # (0, 1) aparece tres veces con recompensas, estados siguientes y finales distintos
+    estados = np.array([0, 3, 0, 0, 3, 4])
+    acciones = np.array([1, 2, 1, 1, 2, 0])
+    recompensas = np.array([1.0, 2.0, -3.0, 10.0, 0.5, -1.0])
+    siguientes = np.array([1, 4, 5, 2, 0, 0])
+    terminados = np.array([False, False, True, False, False, True])
+    esperado = lote_secuencial(agente, estados, acciones, recompensas, siguientes, terminados)
+    agente.actualizar_q_lote(estados, acciones, recompensas, siguientes, terminados)
+    assert np.allclose(agente.tabla_q[:], esperado)
+
+
+def test_factor_un_menos_alpha_a_la_k():
+    agente = AgenteQLearning(2, 2, alpha=0.25, gamma=0.0)
+    agente.tabla_q[0, 0] = 8.0
+    k = 5
+    agente.actualizar_q_lote(np.zeros(k, dtype=int), np.zeros(k, dtype=int), np.zeros(k),
+                             np.ones(k, dtype=int), np.ones(k, dtype=bool))
+    assert agente.tabla_q[0, 0] == pytest.approx(8.0 * 0.75 ** k)
+
+
+@pytest.mark.parametrize('almacenamiento', ['densa', 'bloques', 'dispersa'])
+def test_lote_aleatorio_con_cualquier_almacenamiento(almacenamiento):
+    agente = agente_aleatorio(2, num_estados=5, num_acciones=2, almacenamiento=almacenamiento)
+    aleatorio = np.random.default_rng(3)
+    n = 200
+    estados = aleatorio.integers(5, size=n)
+    acciones = aleatorio.integers(2, size=n)
+    recompensas = aleatorio.normal(size=n)
+    siguientes = aleatorio.integers(5, size=n)
+    terminados = aleatorio.random(n) < 0.2
+    esperado = lote_secuencial(agente, estados, acciones, recompensas, siguientes, terminados)
+    agente.actualizar_q_lote(estados, acciones, recompensas, siguientes, terminados)
+    assert np.allclose(agente.tabla_q[:], esperado)
+
+
+def test_lote_invalida_la_politica_de_los_estados_tocados():
+    agente = AgenteQLearning(3, 2, alpha=1.0, gamma=0.0)
+    assert agente.politica.accion(1) == 0
+    agente.actualizar_q_lote(np.array([1]), np.array([1]), np.array([5.0]),
+                             np.array([2]), np.array([True]))
+    assert agente.politica.accion(1) == 1
+
+
+def test_elegir_acciones_greedy_sin_exploracion():
+    agente = agente_aleatorio(4)
+    estados = np.arange(6)
+    assert np.array_equal(agente.elegir_acciones(estados, entrenar=False),
+                          np.argmax(agente.tabla_q[:], axis=1))
+
+
+def agente_lambda(**parametros):
+    parametros = dict(dict(alpha=0.5, gamma=0.9, epsilon=0.0, lambda_=0.8), **parametros)
+    return AgenteQLambda(4, 2, **parametros)
+
+
+def test_qlambda_reparte_el_error_por_las_trazas():
+    agente = agente_lambda()
+    agente.actualizar_q(0, 0, 0.0, 1, False)
+    agente.actualizar_q(1, 0, 10.0, 2, False)
+    # La pareja anterior recibe el error con su traza decaída γλ
+    assert agente.tabla_q[1, 0] == pytest.approx(5.0)
+    assert agente.tabla_q[0, 0] == pytest.approx(0.5 * 10.0 * 0.9 * 0.8)
+    assert agente.trazas == {(0, 0): pytest.approx(0.72 ** 2), (1, 0): pytest.approx(0.72)}
+
+
+def test_qlambda_corta_las_trazas_tras_una_accion_exploratoria():
+    agente = agente_lambda()
+    agente.tabla_q[1] = [1.0, 0.0]
+    agente.actualizar_q(0, 0, 0.0, 1, False)
+    assert (0, 0) in agente.trazas
+    anterior = float(agente.tabla_q[0, 0])
+
+    # La acción 1 no es la greedy del estado 1: el error no llega a (0, 0)
+    agente.actualizar_q(1, 1, 10.0, 2, False)
+    assert agente.tabla_q[0, 0] == anterior
+    assert agente.tabla_q[1, 1] == pytest.approx(5.0)
+    assert set(agente.trazas) == {(1, 1)}
+
+
+def test_qlambda_descarta_trazas_bajo_el_umbral_y_al_terminar():
+    agente = agente_lambda(lambda_=0.1, umbral_traza=0.05)
+    agente.actualizar_q(0, 0, 0.0, 1, False)
+    agente.actualizar_q(1, 0, 0.0, 2, False)
+    # 0.09 ** 2 < 0.05: solo sobrevive la traza de la última pareja
+    assert set(agente.trazas) == {(1, 0)}
+    agente.actualizar_q(2, 0, 1.0, 3, True)
+    assert agente.trazas == {}
+
+
+def test_qlambda_con_lambda_cero_es_qlearning():
+    entorno = GridWorld(size=5, num_trampas=3, semilla=0)
+    agentes = (AgenteQLambda(25, 4, alpha=0.5, gamma=0.9, epsilon=0.2, lambda_=0.0),
+               AgenteQLearning(25, 4, alpha=0.5, gamma=0.9, epsilon=0.2))
+    for agente in agentes:
+        random.seed(7)
+        for _ in range(20):
+            agente.entrenar_episodio(entorno)
+    assert np.allclose(agentes[0].tabla_q, agentes[1].tabla_q)
+
+
+def test_qlambda_fusionado_equivale_al_paso_a_paso():
+    entorno = GridWorld(size=6, num_trampas=4, semilla=1)
+    fusionado = AgenteQLambda(36, 4, alpha=0.3, gamma=0.95, epsilon=0.3, lambda_=0.9)
+    paso_a_paso = AgenteQLambda(36, 4, alpha=0.3, gamma=0.95, epsilon=0.3, lambda_=0.9)
+    random.seed(3)
+    for _ in range(30):
+        fusionado.entrenar_episodio(entorno)
+    random.seed(3)
+    for _ in range(30):
+        paso_a_paso._entrenar_episodio_generico(entorno)
+    assert np.allclose(fusionado.tabla_q, paso_a_paso.tabla_q)
+
+
+@pytest.mark.parametrize('dtype', ['float64', 'float32', 'float16'])
+def test_qlambda_con_cualquier_tipo_de_tabla(dtype):
+    entorno = GridWorld(size=5, num_trampas=2, semilla=0)
+    agente = AgenteQLambda(25, 4, alpha=0.5, epsilon=0.2, dtype=dtype)
+    for _ in range(5):
+        agente.entrenar_episodio(entorno)
+    agente.actualizar_q(0, 1, 1.0, 5, False)
+    assert agente.tabla_q.dtype == dtype
+    assert np.abs(agente.tabla_q).sum() > 0
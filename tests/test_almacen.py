@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from agente import crear_agente
+from almacen import AlmacenModelos
+from entorno import GridWorld
+
+
+def agente_entrenado(modo='q', episodios=10, **parametros):
+    entorno = GridWorld(size=6, num_trampas=4, semilla=3)
+    agente = crear_agente(modo, 36, 4, **parametros)
+    for _ in range(episodios):
+        agente.entrenar_episodio(entorno)
+    return agente, entorno
+
+
+def test_guardar_y_cargar(tmp_path):
+    almacen = AlmacenModelos(str(tmp_path))
+    agente, entorno = agente_entrenado('qlambda', alpha=0.3, gamma=0.8, lambda_=0.7)
+    id_modelo = almacen.guardar(agente, entorno, metricas={'tasa_exito': 50.0}, ejecucion='abc')
+
+    cargado = almacen.cargar(id_modelo)
+    assert cargado.modo == 'qlambda'
+    assert (cargado.alpha, cargado.gamma, cargado.lambda_) == (0.3, 0.8, 0.7)
+    assert np.array_equal(cargado.tabla_q, agente.tabla_q)
+    assert almacen.cargar_entorno(id_modelo).trampas == entorno.trampas
+    assert almacen.obtener(id_modelo)['metricas'] == {'tasa_exito': 50.0}
+    assert [e['id'] for e in almacen.listar(ejecucion='abc')] == [id_modelo]
+    assert almacen.listar(ejecucion='otra') == []
+
+
+def test_tablas_mapeadas_en_memoria(tmp_path):
+    almacen = AlmacenModelos(str(tmp_path))
+    agente, _ = agente_entrenado()
+    id_modelo = almacen.guardar(agente)
+
+    tabla = almacen.cargar_tabla(id_modelo)
+    assert isinstance(tabla, np.memmap)
+    with pytest.raises(ValueError):
+        tabla[0, 0] = 1.0
+
+    # En copia-en-escritura los cambios no llegan al archivo
+    copia = almacen.cargar_tabla(id_modelo, solo_lectura=False)
+    copia[0, 0] = 12345.0
+    assert almacen.cargar_tabla(id_modelo)[0, 0] == agente.tabla_q[0, 0]
+
+
+def test_agente_cargado_en_solo_lectura_responde_y_no_entrena(tmp_path):
+    almacen = AlmacenModelos(str(tmp_path))
+    agente, entorno = agente_entrenado(episodios=50)
+    id_modelo = almacen.guardar(agente, entorno)
+
+    cargado = almacen.cargar(id_modelo)
+    acciones, _ = cargado.politica.politica()
+    assert np.array_equal(acciones, np.argmax(agente.tabla_q, axis=1))
+    with pytest.raises(ValueError):
+        cargado.entrenar_episodio(entorno)
+
+
+@pytest.mark.parametrize('almacenamiento', ['bloques', 'dispersa'])
+def test_tabla_dispersa_vuelve_a_su_almacenamiento_para_entrenar(tmp_path, almacenamiento):
+    almacen = AlmacenModelos(str(tmp_path))
+    agente, entorno = agente_entrenado(almacenamiento=almacenamiento, dtype='float32')
+    id_modelo = almacen.guardar(agente, entorno)
+
+    cargado = almacen.cargar(id_modelo, solo_lectura=False)
+    assert cargado.almacenamiento == (almacenamiento, 'float32')
+    assert np.array_equal(np.asarray(cargado.tabla_q), np.asarray(agente.tabla_q))
+    cargado.entrenar_episodio(entorno)
+
+
+def test_manifiesto_reconstruye_el_indice(tmp_path):
+    almacen = AlmacenModelos(str(tmp_path))
+    agente, _ = agente_entrenado(episodios=1)
+    ids = [almacen.guardar(agente) for _ in range(3)]
+    assert ids == [1, 2, 3]
+    assert almacen.borrar(3)
+    assert not almacen.borrar(3)
+    assert almacen.borrar(2)
+    assert not (tmp_path / 'q_00000002.npy').exists()
+
+    # Una escritura interrumpida deja una línea truncada al final
+    with open(almacen.ruta_manifiesto, 'a', encoding='utf-8') as f:
+        f.write('{"id": 9, "archi')
+
+    reabierto = AlmacenModelos(str(tmp_path))
+    assert [e['id'] for e in reabierto.listar()] == [1]
+    # Los identificadores borrados no se reutilizan
+    assert reabierto.guardar(agente) == 4
+    with pytest.raises(KeyError):
+        reabierto.cargar_tabla(2)
+    # La entrada escrita tras la línea truncada no se pierde al reabrir
+    assert [e['id'] for e in AlmacenModelos(str(tmp_path)).listar()] == [1, 4]
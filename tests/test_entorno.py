@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from entorno import (GridWorld, VectorGridWorld, EVENTOS, EVENTO_PASO, EVENTO_MAX_PASOS,
+                     alcanzable, generar_trampas)
+
+
+def paso_referencia(entorno, posicion, accion, pasos):
+    """Transición escrita a mano, igual que el step original sin tablas"""
+    x, y = posicion
+    nueva_x = x + (-1, 1, 0, 0)[accion]
+    nueva_y = y + (0, 0, -1, 1)[accion]
+    if not (0 <= nueva_x < entorno.size and 0 <= nueva_y < entorno.size):
+        return posicion, -10, False, 'pared'
+    posicion = (nueva_x, nueva_y)
+    if posicion == entorno.tesoro:
+        return posicion, 100, True, 'tesoro'
+    if posicion in entorno.trampas:
+        return posicion, -100, False, 'trampa'
+    if pasos >= entorno.max_pasos:
+        return posicion, -1, True, 'max_pasos'
+    return posicion, -1, False, 'paso'
+
+
+@pytest.mark.parametrize('size, num_trampas', [(2, 0), (5, 4), (10, 10)])
+def test_tablas_coinciden_con_la_referencia(size, num_trampas):
+    entorno = GridWorld(size=size, num_trampas=num_trampas, semilla=3)
+    for estado in range(entorno.get_num_estados()):
+        posicion = divmod(estado, size)
+        for accion in range(entorno.get_num_acciones()):
+            siguiente, recompensa, terminado, evento = paso_referencia(entorno, posicion, accion, 1)
+            assert entorno.siguiente[estado, accion] == entorno.estado_a_indice(siguiente)
+            assert entorno.recompensa[estado, accion] == recompensa
+            assert entorno.terminal[estado, accion] == terminado
+            assert EVENTOS[entorno.evento[estado, accion]] == evento
+
+
+def test_step_sigue_la_referencia_hasta_max_pasos():
+    entorno = GridWorld(size=6, num_trampas=5, max_pasos=40, semilla=1)
+    aleatorio = np.random.default_rng(0)
+    for _ in range(20):
+        entorno.reset()
+        posicion, pasos, terminado = entorno.inicio, 0, False
+        while not terminado:
+            accion = int(aleatorio.integers(4))
+            pasos += 1
+            posicion, recompensa, terminado, evento = paso_referencia(entorno, posicion, accion, pasos)
+            resultado = entorno.step(accion)
+            assert resultado[:3] == (posicion, recompensa, terminado)
+            assert resultado[3]['evento'] == evento
+
+
+def test_max_pasos_solo_en_movimientos_normales():
+    entorno = GridWorld(size=4, num_trampas=0, max_pasos=1)
+    # Chocar con la pared en el último paso no termina el episodio
+    _, _, terminado, evento = entorno.step_idx(entorno.indice_inicio, 0)
+    assert not terminado and EVENTOS[evento] == 'pared'
+
+    entorno.reset()
+    _, recompensa, terminado, evento = entorno.step_idx(entorno.indice_inicio, 1)
+    assert terminado and evento == EVENTO_MAX_PASOS and recompensa == -1
+
+
+def test_trampas_predefinidas():
+    entorno = GridWorld(size=4, trampas=[(1, 1), [2, 3]])
+    assert entorno.trampas == {(1, 1), (2, 3)}
+    assert entorno.num_trampas == 2
+    assert entorno.es_trampa.sum() == 2
+    assert entorno.es_trampa[entorno.estado_a_indice((2, 3))]
+
+
+def test_generar_trampas_es_reproducible_y_libre():
+    trampas = generar_trampas(8, 12, semilla=5)
+    assert np.array_equal(trampas, generar_trampas(8, 12, semilla=5))
+    assert len(set(np.asarray(trampas).tolist())) == 12
+    assert 0 not in trampas and 63 not in trampas
+
+
+def test_resoluble_garantiza_un_camino():
+    for semilla in range(20):
+        trampas = generar_trampas(6, 20, semilla=semilla, resoluble=True)
+        bloqueado = np.zeros(36, dtype=bool)
+        bloqueado[np.asarray(trampas)] = True
+        assert alcanzable(6, bloqueado, 0, 35)
+
+
+def test_vector_coincide_con_entornos_escalares():
+    base = GridWorld(size=5, num_trampas=3, max_pasos=30, semilla=2)
+    vector = VectorGridWorld(4, entorno=base)
+    escalares = [GridWorld(size=5, trampas=base.trampas, max_pasos=30) for _ in range(4)]
+    vector.reset()
+    aleatorio = np.random.default_rng(1)
+    for _ in range(25):
+        acciones = aleatorio.integers(4, size=4)
+        resultado = vector.step(acciones)
+        for i, entorno in enumerate(escalares):
+            _, recompensa, terminado, _ = entorno.step(int(acciones[i]))
+            assert resultado[1][i] == recompensa
+            assert resultado[2][i] == terminado
+            if terminado:
+                entorno.reset()
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+from entorno import GridWorld, EVENTO_MAX_PASOS
+from grabacion import (GrabadorEpisodios, LectorEpisodios, _varint, _leer_varint,
+                       empaquetar_acciones, desempaquetar_acciones)
+
+
+@pytest.mark.parametrize('valor', [0, 1, 127, 128, 300, 2 ** 14, 2 ** 35 + 5])
+def test_varint_ida_y_vuelta(valor):
+    salida = bytearray(b'\xff')
+    _varint(valor, salida)
+    assert len(salida) == 1 + max(1, -(-valor.bit_length() // 7))
+    assert _leer_varint(salida, 1) == (valor, len(salida))
+
+
+def test_acciones_a_dos_bits_ida_y_vuelta():
+    aleatorio = np.random.default_rng(0)
+    longitudes = [0, 1, 3, 4, 5, 17, 0, 8]
+    acciones = aleatorio.integers(4, size=sum(longitudes)).astype(np.uint8)
+    empaquetadas, bytes_episodio = empaquetar_acciones(acciones, longitudes)
+    assert bytes_episodio.tolist() == [(n + 3) // 4 for n in longitudes]
+
+    datos = empaquetadas.tobytes()
+    desde = leido = 0
+    for n, tam in zip(longitudes, bytes_episodio.tolist()):
+        episodio = desempaquetar_acciones(datos[desde:desde + tam], n)
+        assert np.array_equal(episodio, acciones[leido:leido + n])
+        desde += tam
+        leido += n
+
+
+def jugar(grabador, entorno, aleatorio, episodios):
+    """Juega episodios con acciones aleatorias y retorna lo que pasó en cada uno"""
+    jugados = []
+    for _ in range(episodios):
+        vista = grabador.envolver(entorno)
+        vista.reset()
+        estado = vista.indice_agente
+        estados, recompensas, eventos = [estado], [], []
+        terminado = False
+        while not terminado:
+            estado, recompensa, terminado, evento = vista.step_idx(estado, int(aleatorio.integers(4)))
+            estados.append(estado)
+            recompensas.append(recompensa)
+            eventos.append(evento)
+        grabador.terminar_episodio(vista)
+        jugados.append((estados, recompensas, eventos))
+    return jugados
+
+
+def comprobar(lector, episodio, jugado):
+    estados, recompensas, eventos = jugado
+    decodificado = lector.decodificar(episodio)
+    assert decodificado['episodio'] == episodio
+    assert decodificado['estados'] == estados
+    assert decodificado['recompensas'].tolist() == recompensas
+    assert decodificado['eventos'].tolist() == eventos
+
+
+@pytest.fixture
+def entorno():
+    return GridWorld(size=5, num_trampas=3, max_pasos=30, semilla=4)
+
+
+def test_registro_ida_y_vuelta(tmp_path, entorno):
+    ruta = str(tmp_path / 'sub' / 'registro')
+    grabador = GrabadorEpisodios(ruta, entorno, primer_episodio=11, lote=4)
+    jugados = jugar(grabador, entorno, np.random.default_rng(1), 10)
+    grabador.cerrar()
+
+    lector = LectorEpisodios(ruta)
+    assert lector.num_episodios == 10
+    assert lector.entorno.trampas == entorno.trampas
+    for episodio, jugado in enumerate(jugados, start=11):
+        comprobar(lector, episodio, jugado)
+    assert [e['episodio'] for e in lector.episodios(desde=15, hasta=100)] == list(range(15, 21))
+    assert any(eventos[-1] == EVENTO_MAX_PASOS for _, _, eventos in jugados)
+    with pytest.raises(IndexError):
+        lector.leer(10)
+
+
+def test_el_lector_solo_ve_lotes_escritos(tmp_path, entorno):
+    ruta = str(tmp_path / 'registro')
+    grabador = GrabadorEpisodios(ruta, entorno, lote=3)
+    jugar(grabador, entorno, np.random.default_rng(2), 4)
+    lector = LectorEpisodios(ruta)
+    assert lector.num_episodios == 3
+
+    grabador.vaciar()
+    lector.refrescar()
+    assert lector.num_episodios == 4
+
+
+def test_reanudar_recorta_los_episodios_posteriores(tmp_path, entorno):
+    ruta = str(tmp_path / 'registro')
+    aleatorio = np.random.default_rng(3)
+    grabador = GrabadorEpisodios(ruta, entorno)
+    jugados = jugar(grabador, entorno, aleatorio, 8)
+    grabador.cerrar()
+
+    # Reanudar desde un punto de control del episodio 5
+    grabador = GrabadorEpisodios(ruta, entorno, primer_episodio=6)
+    jugados[5:] = jugar(grabador, entorno, aleatorio, 4)
+    grabador.cerrar()
+
+    lector = LectorEpisodios(ruta)
+    assert lector.primer_episodio == 1
+    assert lector.num_episodios == 9
+    for episodio, jugado in enumerate(jugados, start=1):
+        comprobar(lector, episodio, jugado)
+
+
+def test_reanudar_fuera_del_registro_lo_crea_de_nuevo(tmp_path, entorno):
+    ruta = str(tmp_path / 'registro')
+    aleatorio = np.random.default_rng(4)
+    grabador = GrabadorEpisodios(ruta, entorno, primer_episodio=10)
+    jugar(grabador, entorno, aleatorio, 3)
+    grabador.cerrar()
+
+    grabador = GrabadorEpisodios(ruta, entorno, primer_episodio=5)
+    jugados = jugar(grabador, entorno, aleatorio, 2)
+    grabador.cerrar()
+
+    lector = LectorEpisodios(ruta)
+    assert (lector.primer_episodio, lector.num_episodios) == (5, 2)
+    comprobar(lector, 6, jugados[1])
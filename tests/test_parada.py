@@ -0,0 +1,97 @@
+import random
+from types import SimpleNamespace
+
+from agente import crear_agente
+from entorno import GridWorld
+from entrenar import Entrenador
+from parada import (CriterioDeltaQ, CriterioPoliticaEstable, CriterioMeseta, _cierra_ventana,
+                    crear_criterios)
+
+
+def entrenador_falso(num_estados=4, num_acciones=2):
+    agente = crear_agente('q', num_estados, num_acciones)
+    return SimpleNamespace(agente=agente, estadisticas={'exitos': []})
+
+
+def test_ventanas_se_cierran_al_cruzar_su_final():
+    criterio = CriterioDeltaQ(ventana=10)
+    assert [_cierra_ventana(criterio, 1) for _ in range(10)] == [False] * 9 + [True]
+    # Un lote que cruza varias ventanas cierra una sola comprobación
+    assert _cierra_ventana(criterio, 25)
+    assert not _cierra_ventana(criterio, 4)
+    assert _cierra_ventana(criterio, 1)
+
+
+def test_delta_q_compara_con_la_ventana_anterior():
+    entrenador = entrenador_falso()
+    criterio = CriterioDeltaQ(tolerancia=0.5, ventana=2)
+    assert not criterio.comprobar(entrenador, 2)
+    entrenador.agente.tabla_q[0, 0] = 1.0
+    assert not criterio.comprobar(entrenador, 2)
+    assert criterio.ultimo_delta == 1.0
+
+    entrenador.agente.tabla_q[0, 0] = 1.25
+    assert not criterio.comprobar(entrenador, 1)
+    assert criterio.comprobar(entrenador, 1)
+    assert criterio.ultimo_delta == 0.25
+
+    criterio.reiniciar()
+    assert not criterio.comprobar(entrenador, 2)
+
+
+def test_politica_estable_necesita_ventanas_seguidas():
+    entrenador = entrenador_falso()
+    criterio = CriterioPoliticaEstable(ventana=1, ventanas=2)
+    assert not criterio.comprobar(entrenador)
+    assert not criterio.comprobar(entrenador)
+    # Un cambio de política reinicia la cuenta
+    entrenador.agente.tabla_q[2, 1] = 1.0
+    entrenador.agente.politica.marcar(2)
+    assert not criterio.comprobar(entrenador)
+    assert not criterio.comprobar(entrenador)
+    assert criterio.comprobar(entrenador)
+
+
+def test_meseta_respeta_la_tasa_minima():
+    entrenador = entrenador_falso()
+    criterio = CriterioMeseta(tolerancia=5.0, ventana=10, tasa_minima=50.0)
+    exitos = entrenador.estadisticas['exitos']
+
+    exitos.extend([0] * 10)
+    assert not criterio.comprobar(entrenador, 10)
+    exitos.extend([0] * 10)
+    # Meseta en el 0 %: por debajo de la tasa mínima no se para
+    assert not criterio.comprobar(entrenador, 10)
+    exitos.extend([1] * 9 + [0])
+    assert not criterio.comprobar(entrenador, 10)
+    exitos.extend([1] * 10)
+    assert not criterio.comprobar(entrenador, 10)
+    exitos.extend([1] * 10)
+    assert criterio.comprobar(entrenador, 10)
+
+
+def test_crear_criterios():
+    assert crear_criterios() == []
+    criterios = crear_criterios(delta_q=1e-4, politica_estable=True, meseta=2.0, ventana=25)
+    assert [criterio.nombre for criterio in criterios] == ['delta_q', 'politica_estable', 'meseta']
+    assert all(criterio.ventana == 25 for criterio in criterios)
+
+
+def test_entrenador_para_al_converger():
+    entorno = GridWorld(size=5, num_trampas=2, semilla=0)
+    # Con alpha = 0 la tabla no cambia: converge al cerrar la segunda ventana
+    agente = crear_agente('q', 25, 4, alpha=0.0)
+    entrenador = Entrenador(entorno, agente, criterios=[CriterioDeltaQ(ventana=20)])
+    entrenador.entrenar(500)
+    assert entrenador.motivo_parada == 'delta_q'
+    assert entrenador.episodios_completados == 40
+
+
+def test_entrenador_sin_convergencia_completa_los_episodios():
+    random.seed(0)
+    entorno = GridWorld(size=6, num_trampas=3, semilla=0)
+    agente = crear_agente('q', 36, 4, alpha=0.5)
+    entrenador = Entrenador(entorno, agente, criterios=[CriterioDeltaQ(tolerancia=0.0, ventana=10)])
+    entrenador.entrenar(50)
+    assert entrenador.motivo_parada is None
+    assert entrenador.episodios_completados == 50
@@ -0,0 +1,64 @@
+import numpy as np
+
+from agente import crear_agente
+from entorno import GridWorld
+from paralelo import EntrenadorParalelo
+from parada import CriterioDeltaQ
+
+
+def entrenador(criterios, alpha=0.5, **opciones):
+    entorno = GridWorld(size=5, num_trampas=2, semilla=0)
+    agente = crear_agente('q', 25, 4, alpha=alpha)
+    return EntrenadorParalelo(entorno, agente, criterios=criterios, **opciones)
+
+
+def test_solo_cuentan_los_episodios_posteriores_a_la_instantanea():
+    criterio = CriterioDeltaQ(ventana=10)
+    paralelo = entrenador([criterio])
+    paralelo._instantanea = 100.0
+
+    # Un lote atrasado ya está reflejado en la tabla: no avanza la ventana
+    paralelo._comprobar_criterios([90.0] * 10)
+    assert criterio.episodios == 0
+
+    paralelo._comprobar_criterios([95.0] * 5 + [101.0] * 5)
+    assert criterio.episodios == 5
+    assert paralelo._instantanea == 100.0
+
+    # Al cerrar la ventana se lee la tabla y se toma una instantánea nueva
+    paralelo._comprobar_criterios([102.0] * 5)
+    assert criterio.episodios == 10
+    assert criterio.anterior is not None
+    assert paralelo._instantanea != 100.0
+
+
+def test_lotes_atrasados_no_fingen_convergencia():
+    criterio = CriterioDeltaQ(ventana=10)
+    paralelo = entrenador([criterio])
+    paralelo._instantanea = 100.0
+    paralelo._comprobar_criterios([101.0] * 10)
+    instantanea = paralelo._instantanea
+
+    # Otra ventana entera de episodios acabados antes de la instantánea vería
+    # la misma tabla (ΔQ = 0) y pararía el entrenamiento
+    paralelo._comprobar_criterios([instantanea - 1.0] * 10)
+    assert criterio.episodios == 10
+    assert paralelo.motivo_parada is None
+
+
+def test_hogwild_entrena_la_tabla_compartida():
+    paralelo = entrenador([], procesos=2, semilla=0, lote=10)
+    paralelo.entrenar(60)
+    assert paralelo.episodios_completados == 60
+    assert len(paralelo.estadisticas['exitos']) == 60
+    assert isinstance(paralelo.agente.tabla_q, np.ndarray)
+    assert np.abs(paralelo.agente.tabla_q).sum() > 0
+
+
+def test_hogwild_para_con_los_criterios():
+    # Con alpha = 0 la tabla no cambia y delta_q converge en cuanto dos
+    # ventanas de episodios nuevos ven la tabla
+    paralelo = entrenador([CriterioDeltaQ(ventana=20)], alpha=0.0, procesos=2, semilla=0, lote=5)
+    paralelo.entrenar(100000)
+    assert paralelo.motivo_parada == 'delta_q'
+    assert paralelo.episodios_completados < 100000
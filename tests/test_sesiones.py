@@ -0,0 +1,149 @@
+import numpy as np
+import pytest
+
+from agente import crear_agente
+from entorno import GridWorld
+from sesiones import RegistroSesiones, estimar_bytes, medir_bytes
+
+
+class TrabajoFalso:
+    """Lo mínimo de un Trabajo que consulta el registro"""
+
+    def __init__(self, estado='ejecutando'):
+        self.id = 'falso'
+        self.estado = estado
+        self.liberaciones = 0
+
+    def liberar(self):
+        self.liberaciones += 1
+
+
+BYTES_SESION = estimar_bytes(100, 4)
+
+
+def registro(tmp_path, sesiones=2.5, **opciones):
+    return RegistroSesiones(carpeta=str(tmp_path), presupuesto_bytes=int(BYTES_SESION * sesiones), **opciones)
+
+
+def comprobar_cuentas(registro_sesiones):
+    residentes = [sesion for sesion in registro_sesiones.sesiones.values() if sesion.residente]
+    assert registro_sesiones.bytes_residentes == sum(sesion.bytes for sesion in residentes)
+    for sesion in residentes:
+        assert sesion.bytes == medir_bytes(sesion.entorno, sesion.agente)
+    assert registro_sesiones._ocupados() <= registro_sesiones.presupuesto_bytes
+
+
+def test_estimacion_de_una_sesion_nueva_es_exacta(tmp_path):
+    sesion = registro(tmp_path).obtener()
+    assert sesion.bytes == BYTES_SESION
+
+
+def test_vuelca_la_menos_usada_para_no_pasar_del_presupuesto(tmp_path):
+    registro_sesiones = registro(tmp_path)
+    primera = registro_sesiones.obtener()
+    segunda = registro_sesiones.obtener()
+    registro_sesiones.obtener(primera.id)
+    tercera = registro_sesiones.obtener()
+
+    assert primera.residente and tercera.residente
+    assert not segunda.residente
+    assert registro_sesiones.resumen()['volcadas'] == 1
+    comprobar_cuentas(registro_sesiones)
+
+
+def test_no_vuelca_sesiones_entrenando(tmp_path):
+    registro_sesiones = registro(tmp_path)
+    for _ in range(2):
+        registro_sesiones.obtener().trabajos.append(TrabajoFalso())
+    with pytest.raises(MemoryError):
+        registro_sesiones.obtener()
+    assert registro_sesiones.bytes_reservados == 0
+    comprobar_cuentas(registro_sesiones)
+
+
+def test_reservas_cuentan_hasta_consumirlas(tmp_path):
+    registro_sesiones = registro(tmp_path)
+    sesion = registro_sesiones.obtener()
+    with pytest.raises(MemoryError):
+        registro_sesiones.reservar(registro_sesiones.presupuesto_bytes + 1)
+
+    reserva = registro_sesiones.reservar(BYTES_SESION)
+    assert registro_sesiones.bytes_reservados == BYTES_SESION
+    # La sesión que pide la memoria no se vuelca para hacerle sitio
+    with pytest.raises(MemoryError):
+        registro_sesiones.reservar(BYTES_SESION, excepto=sesion)
+    registro_sesiones.liberar_reserva(reserva)
+    assert registro_sesiones.bytes_reservados == 0
+
+
+def test_reemplazar_consume_la_reserva_y_libera_los_trabajos(tmp_path):
+    registro_sesiones = registro(tmp_path, sesiones=10)
+    sesion = registro_sesiones.obtener()
+    terminado = TrabajoFalso('completado')
+    sesion.trabajos.append(terminado)
+
+    entorno = GridWorld(size=15)
+    estimado = estimar_bytes(225, 4, 'dyna')
+    reserva = registro_sesiones.reservar(registro_sesiones.estimar_reemplazo(sesion, estimado))
+    agente = crear_agente('dyna', 225, 4)
+    registro_sesiones.reemplazar(sesion, entorno, agente, reserva)
+
+    assert registro_sesiones.bytes_reservados == 0
+    assert sesion.bytes == estimado
+    assert terminado.liberaciones == 1
+    comprobar_cuentas(registro_sesiones)
+
+
+@pytest.mark.parametrize('almacenamiento, dtype', [('densa', 'float64'), ('densa', 'float16'),
+                                                   ('dispersa', 'float32'), ('bloques', 'float64')])
+def test_volcar_y_restaurar_conserva_la_tabla(tmp_path, almacenamiento, dtype):
+    registro_sesiones = registro(tmp_path, sesiones=10)
+    sesion = registro_sesiones.obtener()
+    entorno = GridWorld(size=10, semilla=1)
+    agente = crear_agente('qlambda', 100, 4, alpha=0.3, lambda_=0.5,
+                          almacenamiento=almacenamiento, dtype=dtype)
+    for _ in range(10):
+        agente.entrenar_episodio(entorno)
+    tabla = np.asarray(agente.tabla_q).copy()
+    registro_sesiones.reemplazar(sesion, entorno, agente)
+
+    with registro_sesiones._lock:
+        registro_sesiones._volcar(sesion)
+    assert not sesion.residente
+    comprobar_cuentas(registro_sesiones)
+
+    registro_sesiones.obtener(sesion.id)
+    restaurado = sesion.agente
+    assert restaurado is not agente
+    assert (restaurado.modo, restaurado.lambda_, restaurado.alpha) == ('qlambda', 0.5, 0.3)
+    assert restaurado.almacenamiento == (almacenamiento, dtype)
+    assert np.array_equal(np.asarray(restaurado.tabla_q), tabla)
+    assert sesion.entorno.trampas == entorno.trampas
+    assert sesion.volcado is None
+    comprobar_cuentas(registro_sesiones)
+
+
+def test_sesiones_inactivas_se_vuelcan_y_expiran(tmp_path):
+    registro_sesiones = registro(tmp_path, inactividad=0.0, expiracion=0.0)
+    sesion = registro_sesiones.obtener()
+    with registro_sesiones._lock:
+        registro_sesiones._mantener()
+    assert not sesion.residente
+    ruta = sesion.volcado['ruta']
+    with registro_sesiones._lock:
+        registro_sesiones._mantener()
+    assert sesion.id not in registro_sesiones.sesiones
+    assert not (tmp_path / ruta).exists()
+    comprobar_cuentas(registro_sesiones)
+
+
+def test_max_sesiones_elimina_las_menos_usadas(tmp_path):
+    registro_sesiones = registro(tmp_path, sesiones=10, max_sesiones=2)
+    primera = registro_sesiones.obtener()
+    primera.trabajos.append(TrabajoFalso())
+    segunda = registro_sesiones.obtener()
+    registro_sesiones.obtener()
+    # La primera sigue entrenando, así que sale la segunda
+    assert primera.id in registro_sesiones.sesiones
+    assert segunda.id not in registro_sesiones.sesiones
+    comprobar_cuentas(registro_sesiones)
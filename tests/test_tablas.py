@@ -0,0 +1,123 @@
+import random
+
+import numpy as np
+import pytest
+
+from agente import crear_agente
+from entorno import GridWorld
+from tablas import (TablaQBloques, TablaQHash, ALMACENAMIENTOS, crear_tabla, describir_tabla,
+                    convertir_tabla)
+
+NUM_ESTADOS, NUM_ACCIONES = 50, 4
+
+DISPERSAS = {
+    'bloques': lambda: TablaQBloques(NUM_ESTADOS, NUM_ACCIONES, tam_bloque=8),
+    'bloques_cuadrados': lambda: TablaQBloques(NUM_ESTADOS, NUM_ACCIONES, tam_bloque=9, ancho=7),
+    'dispersa': lambda: TablaQHash(NUM_ESTADOS, NUM_ACCIONES, capacidad=2),
+}
+
+
+@pytest.fixture(params=sorted(DISPERSAS))
+def dispersa(request):
+    return DISPERSAS[request.param]()
+
+
+def test_operaciones_equivalen_a_la_tabla_densa(dispersa):
+    densa = np.zeros((NUM_ESTADOS, NUM_ACCIONES))
+    aleatorio = np.random.default_rng(0)
+    for _ in range(300):
+        estado = int(aleatorio.integers(NUM_ESTADOS))
+        accion = int(aleatorio.integers(NUM_ACCIONES))
+        operacion = aleatorio.integers(4)
+        if operacion == 0:
+            valor = float(aleatorio.normal())
+            densa[estado, accion] = valor
+            dispersa[estado, accion] = valor
+        elif operacion == 1:
+            fila = aleatorio.normal(size=NUM_ACCIONES)
+            densa[np.int64(estado)] = fila
+            dispersa[np.int64(estado)] = fila
+        elif operacion == 2:
+            estados = aleatorio.integers(NUM_ESTADOS, size=5)
+            acciones = aleatorio.integers(NUM_ACCIONES, size=5)
+            valores = aleatorio.normal(size=5)
+            # Sin pares repetidos, el orden de escritura no importa
+            _, unicos = np.unique(estados * NUM_ACCIONES + acciones, return_index=True)
+            densa[estados[unicos], acciones[unicos]] = valores[unicos]
+            dispersa[estados[unicos], acciones[unicos]] = valores[unicos]
+        else:
+            estados = aleatorio.integers(NUM_ESTADOS, size=6)
+            assert np.array_equal(dispersa[estados], densa[estados])
+            assert np.array_equal(dispersa[estados, 1], densa[estados, 1])
+
+        assert np.array_equal(dispersa[estado], densa[estado])
+        assert dispersa[estado, accion] == densa[estado, accion]
+
+    assert np.array_equal(np.asarray(dispersa), densa)
+    assert np.array_equal(dispersa[:], densa)
+    assert np.array_equal(dispersa.max(axis=1), densa.max(axis=1))
+    assert np.array_equal(dispersa.argmax(axis=1), densa.argmax(axis=1))
+
+
+def test_solo_se_reservan_los_estados_escritos(dispersa):
+    assert not len(dispersa.estados_materializados())
+    assert not dispersa[17].any()
+
+    dispersa[17, 2] = 1.5
+    assert 17 in dispersa.estados_materializados()
+    assert dispersa.nbytes < NUM_ESTADOS * NUM_ACCIONES * 8
+
+    # Asignar filas nulas a toda la tabla no reserva memoria nueva
+    nbytes = dispersa.nbytes
+    matriz = np.zeros((NUM_ESTADOS, NUM_ACCIONES))
+    matriz[17, 2] = 1.5
+    dispersa[:] = matriz
+    assert dispersa.nbytes == nbytes
+
+
+def test_fila_sin_reservar_es_de_solo_lectura(dispersa):
+    with pytest.raises(ValueError):
+        dispersa[3][0] = 1.0
+
+
+def test_copia_independiente(dispersa):
+    dispersa[4, 1] = 2.0
+    copia = dispersa.copy()
+    copia[4, 1] = 3.0
+    copia[5, 0] = 1.0
+    assert dispersa[4, 1] == 2.0
+    assert dispersa[5, 0] == 0.0
+    assert type(copia) is type(dispersa)
+
+
+@pytest.mark.parametrize('almacenamiento', ALMACENAMIENTOS)
+@pytest.mark.parametrize('dtype', ['float64', 'float32', 'float16'])
+def test_convertir_ida_y_vuelta(almacenamiento, dtype):
+    matriz = np.zeros((NUM_ESTADOS, NUM_ACCIONES))
+    matriz[[1, 20, 49]] = np.random.default_rng(1).normal(size=(3, NUM_ACCIONES))
+    tabla = convertir_tabla(matriz, almacenamiento, dtype)
+    assert describir_tabla(tabla) == (almacenamiento, dtype)
+    assert np.array_equal(convertir_tabla(tabla, 'densa', 'float64'), matriz.astype(dtype).astype('float64'))
+
+
+def test_crear_tabla_valida_sus_argumentos():
+    with pytest.raises(ValueError):
+        crear_tabla(4, 2, 'comprimida')
+    with pytest.raises(ValueError):
+        crear_tabla(4, 2, 'densa', 'int32')
+
+
+@pytest.mark.parametrize('modo', ['q', 'qlambda', 'npasos', 'dyna'])
+def test_entrenar_con_cualquier_almacenamiento_da_la_misma_tabla(modo):
+    entorno = GridWorld(size=8, num_trampas=6, semilla=2)
+    tablas = []
+    for almacenamiento in ALMACENAMIENTOS:
+        agente = crear_agente(modo, entorno.get_num_estados(), entorno.get_num_acciones(),
+                              epsilon=0.2, almacenamiento=almacenamiento)
+        random.seed(5)
+        np.random.seed(5)
+        for _ in range(15):
+            agente.entrenar_episodio(entorno)
+        tablas.append(np.asarray(agente.tabla_q))
+    for tabla in tablas[1:]:
+        assert np.array_equal(tabla, tablas[0])
@@ -0,0 +1,421 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+from entrenar import Entrenador
+from grabacion import GrabadorEpisodios
+from programas import crear_programa
+from parada import crear_criterios
+from metricas import metricas
+from planificacion import recorrido_greedy
+from puntos_control import PuntosControl
+from transmision import Transmisor
+
+class Suscripcion:
+    """
+    Cola acotada de mensajes para un cliente suscrito a un trabajo
+
+    Si el cliente es lento y la cola se llena, los frames nuevos se descartan
+    en lugar de frenar el entrenamiento. Los mensajes críticos (fin del
+    trabajo, errores) desplazan al más antiguo para no perderse nunca.
+    """
+
+    def __init__(self, max_mensajes=100):
+        self.cola = queue.Queue(maxsize=max_mensajes)
+        self.descartados = 0
+
+    def publicar(self, mensaje, critico=False):
+        """Encola un mensaje sin bloquear"""
+        while True:
+            try:
+                self.cola.put_nowait(mensaje)
+                return
+            except queue.Full:
+                if not critico:
+                    self._descartar()
+                    return
+            try:
+                self.cola.get_nowait()
+                self._descartar()
+            except queue.Empty:
+                pass
+
+    def _descartar(self):
+        self.descartados += 1
+        if metricas.activo:
+            metricas.sumar('mensajes_descartados')
+
+    def recibir(self, timeout=None):
+        """Retorna el siguiente mensaje; None indica que el trabajo terminó"""
+        return self.cola.get(timeout=timeout)
+
+    def pendientes(self):
+        """Número de mensajes encolados sin enviar"""
+        return self.cola.qsize()
+
+
+class Trabajo:
+    """
+    Entrenamiento que se ejecuta en un hilo propio, independiente de las
+    conexiones que lo observan
+    """
+
+    def __init__(self, id_trabajo, entorno, agente, num_episodios, velocidad=0.0, fps=30, almacen=None,
+                 puntos_control=None, grabador=None, programa_epsilon=None, programa_alpha=None,
+                 criterios=None):
+        """
+        Inicializa el trabajo
+
+        Args:
+            id_trabajo: Identificador único
+            entorno: Objeto GridWorld
+            agente: Objeto AgenteQLearning
+            num_episodios: Número de episodios a entrenar
+            velocidad: Segundos de espera entre pasos (0 = máxima velocidad)
+            fps: Máximo de frames por segundo enviados a los suscriptores
+            almacen: AlmacenModelos opcional donde guardar el modelo final
+            puntos_control: PuntosControl opcional para guardar periódicamente
+            grabador: GrabadorEpisodios opcional donde registrar cada episodio
+            programa_epsilon: Programa opcional para ε
+            programa_alpha: Programa opcional para α
+            criterios: Criterios de parada temprana
+        """
+        self.id = id_trabajo
+        self.entrenador = Entrenador(entorno, agente, puntos_control=puntos_control, grabador=grabador,
+                                     programa_epsilon=programa_epsilon, programa_alpha=programa_alpha,
+                                     criterios=criterios)
+        self.puntos_control = puntos_control
+        self.grabador = grabador
+        self.num_episodios = num_episodios
+        self.velocidad = velocidad
+        self.fps = fps
+        self.almacen = almacen
+
+        self.estado = 'pendiente'
+        self.mensaje_final = None
+        self.id_modelo = None
+        # Lo que queda del entorno y del agente tras liberar()
+        self.grid = None
+        self.cuadricula = None
+        self.trayectoria = None
+
+        self._suscripciones = set()
+        self._lock = threading.Lock()
+        self._hilo = threading.Thread(target=self._ejecutar, name=f"trabajo-{id_trabajo}", daemon=True)
+
+    def iniciar(self):
+        """Arranca el hilo de entrenamiento"""
+        self.estado = 'ejecutando'
+        self._hilo.start()
+
+    def detener(self):
+        """Solicita detener el entrenamiento"""
+        self.entrenador.detener()
+
+    @property
+    def id_hilo(self):
+        """Identificador del hilo de entrenamiento, para perfilarlo"""
+        return self._hilo.ident
+
+    def esperar(self, timeout=None):
+        """Espera a que el trabajo termine"""
+        self._hilo.join(timeout)
+
+    def mensaje_inicio(self):
+        """Instantánea completa del grid con la que empieza cada suscripción"""
+        entorno = self.entrenador.entorno
+        grid = entorno.get_estado_grid() if entorno is not None else self.grid
+        return json.dumps({'tipo': 'inicio', 'grid': grid})
+
+    def suscribir(self, max_mensajes=100, suscripcion=None):
+        """
+        Crea una suscripción al progreso del trabajo
+
+        La suscripción recibe primero una instantánea completa del grid y,
+        si el trabajo ya terminó, el mensaje final.
+
+        Args:
+            max_mensajes: Tamaño de la cola de la suscripción
+            suscripcion: Objeto con publicar(mensaje, critico) y pendientes()
+                         que sustituye a la cola propia; no recibe la
+                         instantánea, que se pide con mensaje_inicio()
+        """
+        if suscripcion is None:
+            suscripcion = Suscripcion(max_mensajes)
+            suscripcion.publicar(self.mensaje_inicio(), critico=True)
+
+        with self._lock:
+            if self.mensaje_final is not None:
+                suscripcion.publicar(self.mensaje_final, critico=True)
+                suscripcion.publicar(None, critico=True)
+            else:
+                self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion):
+        """Elimina una suscripción"""
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    def profundidad_colas(self):
+        """Retorna el número de mensajes pendientes en cada suscripción"""
+        with self._lock:
+            return [suscripcion.pendientes() for suscripcion in self._suscripciones]
+
+    def _publicar(self, mensaje, critico=False):
+        with self._lock:
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            suscripcion.publicar(mensaje, critico)
+
+    def _finalizar(self, mensaje):
+        with self._lock:
+            self.mensaje_final = mensaje
+            suscripciones = list(self._suscripciones)
+            self._suscripciones.clear()
+        for suscripcion in suscripciones:
+            suscripcion.publicar(mensaje, critico=True)
+            suscripcion.publicar(None, critico=True)
+
+    def _ejecutar(self):
+        entrenador = self.entrenador
+        try:
+            transmisor = Transmisor(self._publicar, fps=self.fps)
+            transmisor.inicio(entrenador.entorno)
+
+            def al_paso(episodio, pasos):
+                transmisor.paso(episodio, pasos, entrenador.entorno.indice_agente)
+                if self.velocidad > 0:
+                    time.sleep(self.velocidad)
+
+            entrenador.entrenar(self.num_episodios, al_progreso=transmisor.episodio, al_paso=al_paso)
+            transmisor.vaciar()
+
+            if self.almacen is not None:
+                progreso = entrenador.progreso()
+                self.id_modelo = self.almacen.guardar(
+                    entrenador.agente, entrenador.entorno,
+                    metricas={
+                        'episodios': progreso['episodio'],
+                        'victorias': progreso['victorias'],
+                        'tasa_exito': progreso['tasa_exito']
+                    },
+                    trabajo=self.id
+                )
+
+            if entrenador.motivo_parada is not None:
+                self.estado = 'convergido'
+            elif entrenador.episodios_completados < self.num_episodios:
+                self.estado = 'detenido'
+            else:
+                self.estado = 'completado'
+            self._finalizar(json.dumps({
+                'tipo': 'entrenamiento_completo',
+                'episodios_totales': self.num_episodios,
+                'episodios_entrenados': entrenador.episodios_completados,
+                'convergido': entrenador.motivo_parada,
+                'victorias': entrenador.victorias,
+                'tasa_exito_final': entrenador.progreso()['tasa_exito'],
+                'modelo': self.id_modelo
+            }))
+        except Exception as e:
+            self.estado = 'error'
+            self._finalizar(json.dumps({
+                'tipo': 'error',
+                'mensaje': str(e)
+            }))
+        finally:
+            if self.puntos_control is not None:
+                self.puntos_control.cerrar()
+            if self.grabador is not None:
+                self.grabador.cerrar()
+
+    @property
+    def liberado(self):
+        """Si el trabajo ya soltó su entorno y su agente"""
+        return self.entrenador.agente is None
+
+    def datos_graficas(self):
+        """Estadísticas, cuadrícula y trayectoria greedy del trabajo"""
+        entrenador = self.entrenador
+        if self.liberado:
+            return entrenador.estadisticas, self.cuadricula, self.trayectoria
+
+        entorno = entrenador.entorno
+        acciones, _ = entrenador.agente.politica.politica()
+        estados, _ = recorrido_greedy(entorno, acciones)
+        trayectoria = [divmod(estado, entorno.size) for estado in estados]
+        return entrenador.estadisticas, entorno, trayectoria
+
+    def liberar(self):
+        """
+        Suelta el entorno y el agente de un trabajo terminado
+
+        Conserva el grid, la cuadrícula y la trayectoria greedy final, que es
+        lo que siguen usando las suscripciones y las gráficas, para que la
+        sesión a la que pertenecen pueda volcarse a disco.
+        """
+        if self.estado in ('pendiente', 'ejecutando') or self.liberado:
+            return
+        _, entorno, self.trayectoria = self.datos_graficas()
+        self.grid = entorno.get_estado_grid()
+        self.cuadricula = SimpleNamespace(size=entorno.size, inicio=entorno.inicio,
+                                          tesoro=entorno.tesoro, trampas=set(entorno.trampas))
+        entrenador = self.entrenador
+        entrenador.entorno = entrenador.agente = entrenador._entorno_episodio = None
+
+    def resumen(self):
+        """Retorna el estado del trabajo como diccionario serializable"""
+        progreso = self.entrenador.progreso()
+        with self._lock:
+            suscriptores = len(self._suscripciones)
+        return {
+            'id': self.id,
+            'estado': self.estado,
+            'num_episodios': self.num_episodios,
+            'episodio': progreso['episodio'],
+            'victorias': progreso['victorias'],
+            'tasa_exito': progreso['tasa_exito'],
+            'suscriptores': suscriptores,
+            'modelo': self.id_modelo,
+            'ejecucion': self.puntos_control.ejecucion if self.puntos_control is not None else None,
+            'grabado': self.grabador is not None,
+            'convergido': self.entrenador.motivo_parada,
+            'liberado': self.liberado
+        }
+
+
+class GestorTrabajos:
+    """
+    Registro de los trabajos de entrenamiento en curso y terminados
+
+    Solo se conservan los `max_terminados` trabajos terminados más recientes;
+    los anteriores se liberan y se olvidan al crear uno nuevo.
+    """
+
+    def __init__(self, almacen=None, carpeta_grabaciones='resultados/grabaciones', max_terminados=100):
+        """
+        Inicializa el gestor
+
+        Args:
+            almacen: AlmacenModelos donde los trabajos guardan su modelo final
+            carpeta_grabaciones: Carpeta de los registros de episodios
+            max_terminados: Trabajos terminados que se conservan
+        """
+        self.almacen = almacen
+        self.carpeta_grabaciones = carpeta_grabaciones
+        self.max_terminados = max_terminados
+        self.trabajos = {}
+        self._lock = threading.Lock()
+
+    def crear(self, entorno, agente, num_episodios, velocidad=0.0, fps=30,
+              punto_control_cada=None, punto_control_segundos=None, ejecucion=None,
+              episodios_previos=0, victorias_previas=0, grabar=False,
+              programa_epsilon=None, programa_alpha=None, parada=None):
+        """
+        Crea y arranca un trabajo nuevo
+
+        Args:
+            entorno: Objeto GridWorld
+            agente: Objeto AgenteQLearning
+            num_episodios: Número de episodios a entrenar
+            velocidad: Segundos de espera entre pasos
+            fps: Máximo de frames por segundo enviados a los suscriptores
+            punto_control_cada: Guardar un punto de control cada N episodios
+            punto_control_segundos: Guardar un punto de control cada T segundos
+            ejecucion: Ejecución a continuar (por defecto, el id del trabajo)
+            episodios_previos: Episodios ya entrenados al reanudar
+            victorias_previas: Victorias ya obtenidas al reanudar
+            grabar: Registrar la trayectoria de cada episodio para reproducirla
+            programa_epsilon: Programa de ε como {'tipo', 'final', 'duracion'},
+                              partiendo del ε actual del agente (ver crear_programa)
+            programa_alpha: Programa de α, con el mismo formato
+            parada: Argumentos de parada.crear_criterios para parar al converger
+        """
+        id_trabajo = uuid.uuid4().hex[:12]
+
+        puntos_control = None
+        if self.almacen is not None and (punto_control_cada or punto_control_segundos or ejecucion):
+            puntos_control = PuntosControl(self.almacen, ejecucion=ejecucion or id_trabajo,
+                                           cada_episodios=punto_control_cada,
+                                           cada_segundos=punto_control_segundos)
+
+        grabador = None
+        if grabar:
+            grabador = GrabadorEpisodios(self.ruta_grabacion(id_trabajo), entorno,
+                                         primer_episodio=episodios_previos + 1)
+
+        if programa_epsilon is not None:
+            programa_epsilon = crear_programa(inicial=agente.epsilon, **programa_epsilon)
+        if programa_alpha is not None:
+            programa_alpha = crear_programa(inicial=agente.alpha, **programa_alpha)
+        criterios = crear_criterios(**parada) if parada else None
+
+        trabajo = Trabajo(id_trabajo, entorno, agente, num_episodios,
+                          velocidad=velocidad, fps=fps, almacen=self.almacen,
+                          puntos_control=puntos_control, grabador=grabador,
+                          programa_epsilon=programa_epsilon, programa_alpha=programa_alpha,
+                          criterios=criterios)
+        trabajo.entrenador.episodios_completados = episodios_previos
+        trabajo.entrenador.victorias = victorias_previas
+        with self._lock:
+            self.trabajos[trabajo.id] = trabajo
+            olvidados = self._podar()
+        for olvidado in olvidados:
+            olvidado.liberar()
+        trabajo.iniciar()
+        return trabajo
+
+    def _podar(self):
+        """Quita los trabajos terminados más antiguos que sobran de max_terminados; retorna los quitados"""
+        terminados = [t for t in self.trabajos.values() if t.estado not in ('pendiente', 'ejecutando')]
+        sobran = terminados[:max(len(terminados) - self.max_terminados, 0)]
+        for trabajo in sobran:
+            del self.trabajos[trabajo.id]
+        return sobran
+
+    def ruta_grabacion(self, id_trabajo):
+        """Ruta base del registro de episodios de un trabajo"""
+        return os.path.join(self.carpeta_grabaciones, id_trabajo)
+
+    def obtener(self, id_trabajo):
+        """Retorna el trabajo con ese identificador, o None"""
+        with self._lock:
+            return self.trabajos.get(id_trabajo)
+
+    def listar(self):
+        """Retorna todos los trabajos"""
+        with self._lock:
+            return list(self.trabajos.values())
+
+    def colas_envio(self):
+        """Retorna la profundidad de las colas de envío de los trabajos en curso"""
+        profundidades = []
+        for trabajo in self.listar():
+            if trabajo.estado == 'ejecutando':
+                profundidades.extend(trabajo.profundidad_colas())
+        return profundidades
+
+    def detener(self, id_trabajo=None, trabajos=None):
+        """
+        Detiene un trabajo concreto, o todos los activos si no se indica
+
+        Args:
+            id_trabajo: Identificador del trabajo, o None para todos los activos
+            trabajos: Trabajos entre los que buscar (por defecto, todos los del gestor)
+
+        Returns:
+            Lista de trabajos detenidos
+        """
+        candidatos = self.listar() if trabajos is None else list(trabajos)
+        if id_trabajo is not None:
+            trabajos = [t for t in candidatos if t.id == id_trabajo]
+        else:
+            trabajos = [t for t in candidatos if t.estado == 'ejecutando']
+
+        for trabajo in trabajos:
+            trabajo.detener()
+        return trabajos
@@ -0,0 +1,91 @@
+import json
+import time
+from collections import deque
+from metricas import metricas
+
+class Transmisor:
+    """
+    Codifica el progreso del entrenamiento para el navegador con un protocolo
+    compacto y limitado en frecuencia:
+
+        inicio: una instantánea completa del grid al empezar
+        frame: deltas con el índice del agente y los episodios terminados
+               desde el frame anterior, como mucho `fps` veces por segundo
+
+    Los pasos que ocurren entre dos frames se agrupan, de modo que el ancho de
+    banda y el trabajo del cliente quedan acotados sin importar la velocidad
+    del entrenamiento.
+    """
+
+    def __init__(self, enviar, fps=30, max_episodios_frame=50):
+        """
+        Inicializa el transmisor
+
+        Args:
+            enviar: Función que recibe cada mensaje ya serializado
+            fps: Máximo de frames por segundo
+            max_episodios_frame: Máximo de resúmenes de episodio por frame
+        """
+        self.enviar = enviar
+        self.intervalo = 1.0 / fps if fps > 0 else 0.0
+        self.ultimo_envio = 0.0
+
+        self.delta = {}
+        self.episodios = deque(maxlen=max_episodios_frame)
+
+    def _enviar(self, mensaje):
+        if not metricas.activo:
+            self.enviar(json.dumps(mensaje, separators=(',', ':')))
+            return
+
+        inicio = time.perf_counter()
+        texto = json.dumps(mensaje, separators=(',', ':'))
+        metricas.medir('serializacion', time.perf_counter() - inicio)
+        metricas.sumar('mensajes_publicados')
+        metricas.sumar('bytes_publicados', len(texto))
+        self.enviar(texto)
+
+    def inicio(self, entorno):
+        """Envía la instantánea completa del grid"""
+        self._enviar({'tipo': 'inicio', 'grid': entorno.get_estado_grid()})
+        self.ultimo_envio = time.perf_counter()
+
+    def paso(self, episodio, pasos, agente):
+        """
+        Registra la posición del agente tras un paso
+
+        Args:
+            episodio: Número de episodio en curso
+            pasos: Pasos dados en el episodio
+            agente: Índice de estado del agente
+        """
+        self.delta['episodio'] = episodio
+        self.delta['pasos'] = pasos
+        self.delta['agente'] = agente
+        self._tal_vez_enviar()
+
+    def episodio(self, progreso):
+        """Registra el resumen de un episodio terminado"""
+        self.episodios.append([progreso['episodio'], progreso['pasos'], 1 if progreso['exito'] else 0])
+        self.delta['victorias'] = progreso['victorias']
+        self.delta['tasa_exito'] = progreso['tasa_exito']
+        self._tal_vez_enviar()
+
+    def _tal_vez_enviar(self):
+        if time.perf_counter() - self.ultimo_envio >= self.intervalo:
+            self.vaciar()
+
+    def vaciar(self):
+        """Envía el frame pendiente, si lo hay"""
+        if not self.delta and not self.episodios:
+            return
+
+        frame = {'tipo': 'frame'}
+        frame.update(self.delta)
+        if self.episodios:
+            frame['episodios'] = list(self.episodios)
+
+        self.delta = {}
+        self.episodios.clear()
+        self._enviar(frame)
+        self.ultimo_envio = time.perf_counter()
@@ -2,7 +2,110 @@ import matplotlib.pyplot as plt
 import numpy as np
 import matplotlib.patches as patches
 from matplotlib.animation import FuncAnimation
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PatchCollection
+from matplotlib.figure import Figure
+from matplotlib.image import imsave
 import os
+import shutil
+from graficas import ARCHIVOS, GRAFICAS, CacheGraficas, Renderizador
+
+def promedio_movil(valores, ventana):
+    """
+    Promedio móvil con sumas acumuladas, en O(n) sin importar la ventana
+
+    Returns:
+        Array con el promedio de cada ventana completa (len(valores) - ventana + 1 valores)
+    """
+    acumulado = np.concatenate(([0.0], np.cumsum(valores, dtype=np.float64)))
+    return (acumulado[ventana:] - acumulado[:-ventana]) / ventana
+
+
+def _dibujar_cuadricula(ax, entorno, grosor=2, alpha=0.3):
+    """Dibuja líneas, trampas, tesoro e inicio con una colección por tipo en lugar de un artista por celda"""
+    size = entorno.size
+    lineas = np.arange(size + 1)
+    ax.hlines(lineas, 0, size, colors='k', linewidth=0.5)
+    ax.vlines(lineas, 0, size, colors='k', linewidth=0.5)
+
+    def celdas(posiciones, borde, relleno):
+        rectangulos = [patches.Rectangle((y, size - x - 1), 1, 1) for x, y in posiciones]
+        ax.add_collection(PatchCollection(rectangulos, linewidth=grosor, edgecolor=borde,
+                                          facecolor=relleno, alpha=alpha))
+
+    celdas(entorno.trampas, 'red', 'red')
+    celdas([entorno.tesoro], 'gold', 'yellow')
+    celdas([entorno.inicio], 'blue', 'lightblue')
+
+
+class SerieMovil:
+    """
+    Serie por episodio que mantiene su suma acumulada al crecer
+
+    Los promedios móviles, las medias de los últimos episodios y las medias
+    por tramo salen de restas de la suma acumulada, así que cuestan lo mismo
+    con mil episodios que con un millón, y se pueden muestrear en como mucho
+    `max_puntos` puntos para dibujarlos.
+    """
+
+    def __init__(self, valores=(), capacidad=1024):
+        self.n = 0
+        self._acumulado = np.zeros(capacidad + 1)
+        self.agregar(valores)
+
+    def __len__(self):
+        return self.n
+
+    def agregar(self, valores):
+        """Añade uno o varios valores al final de la serie"""
+        valores = np.asarray(valores, dtype=np.float64).ravel()
+        k = len(valores)
+        if k == 0:
+            return
+        if self.n + k >= len(self._acumulado):
+            capacidad = max(2 * (len(self._acumulado) - 1), self.n + k)
+            acumulado = np.zeros(capacidad + 1)
+            acumulado[:self.n + 1] = self._acumulado[:self.n + 1]
+            self._acumulado = acumulado
+        np.cumsum(valores, out=self._acumulado[self.n + 1:self.n + 1 + k])
+        self._acumulado[self.n + 1:self.n + 1 + k] += self._acumulado[self.n]
+        self.n += k
+
+    def media_ultimos(self, k):
+        """Media de los últimos k valores (o de todos si hay menos)"""
+        k = min(k, self.n)
+        if k == 0:
+            return 0.0
+        return (self._acumulado[self.n] - self._acumulado[self.n - k]) / k
+
+    def promedio_movil(self, ventana, max_puntos=None):
+        """
+        Promedio móvil de la serie
+
+        Returns:
+            episodios (final de cada ventana, empezando en 1), promedios; con
+            max_puntos solo se calculan ese número de ventanas equiespaciadas
+        """
+        if self.n < ventana:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        finales = np.arange(ventana, self.n + 1)
+        if max_puntos is not None and len(finales) > max_puntos:
+            finales = np.unique(np.linspace(ventana, self.n, max_puntos).astype(np.int64))
+        return finales, (self._acumulado[finales] - self._acumulado[finales - ventana]) / ventana
+
+    def medias_por_tramo(self, max_puntos):
+        """
+        La serie reducida a como mucho max_puntos tramos consecutivos
+
+        Returns:
+            episodios (final de cada tramo), media de cada tramo
+        """
+        if self.n <= max_puntos:
+            finales = np.arange(1, self.n + 1)
+            return finales, np.diff(self._acumulado[:self.n + 1])
+        bordes = np.unique(np.linspace(0, self.n, max_puntos + 1).astype(np.int64))
+        return bordes[1:], np.diff(self._acumulado[bordes]) / np.diff(bordes)
+
 
 class Visualizador:
     """
@@ -20,6 +123,56 @@ class Visualizador:
         
         # Crear carpeta si no existe
         os.makedirs(carpeta_salida, exist_ok=True)
+
+    def generar_reporte(self, estadisticas, entorno, trayectoria, formato='png', dpi=150,
+                        ventana=50, renderizador=None):
+        """
+        Genera todas las gráficas en paralelo reutilizando las que no cambiaron
+
+        Las gráficas se dibujan en un pool de procesos a través de una caché
+        por contenido y se copian a la carpeta de salida con los mismos
+        nombres que usan los métodos graficar_*.
+
+        Args:
+            estadisticas: Diccionario con recompensas, pasos y éxitos
+            entorno: Objeto GridWorld
+            trayectoria: Mejor trayectoria del agente
+            formato: 'png' o 'svg'
+            dpi: Resolución
+            ventana: Ventana de los promedios móviles
+            renderizador: Renderizador a reutilizar entre llamadas; si es None
+                          se crea uno temporal con la caché en la carpeta de salida
+
+        Returns:
+            Diccionario tipo de gráfica -> ruta en la carpeta de salida
+        """
+        propio = renderizador is None
+        if propio:
+            renderizador = Renderizador(CacheGraficas(os.path.join(self.carpeta_salida, 'cache')))
+
+        try:
+            resultados = renderizador.renderizar(estadisticas, entorno, trayectoria, GRAFICAS,
+                                                 formato=formato, dpi=dpi, ventana=ventana)
+        finally:
+            if propio:
+                renderizador.cerrar()
+
+        rutas = {}
+        for tipo, (_, ruta_cache) in resultados.items():
+            rutas[tipo] = os.path.join(self.carpeta_salida, f"{ARCHIVOS[tipo]}.{formato}")
+            shutil.copyfile(ruta_cache, rutas[tipo])
+        return rutas
+
+    def dashboard_vivo(self, entorno, ventana=50, max_puntos=1000):
+        """
+        Crea un DashboardVivo que se guarda en la carpeta de salida
+
+        A diferencia de crear_dashboard, la figura se crea una sola vez y se
+        actualiza con cada llamada a sincronizar()/guardar(), pensado para
+        regenerar la gráfica durante entrenamientos largos.
+        """
+        return DashboardVivo(entorno, ventana, max_puntos,
+                             ruta=os.path.join(self.carpeta_salida, 'dashboard_vivo.png'))
     
     def graficar_recompensas(self, recompensas, ventana=50, guardar=True, mostrar=False):
         """
@@ -41,11 +194,8 @@ class Visualizador:
         
         # Promedio móvil
         if len(recompensas) >= ventana:
-            promedio_movil = np.convolve(recompensas, 
-                                        np.ones(ventana)/ventana, 
-                                        mode='valid')
             episodios_promedio = range(ventana, len(recompensas) + 1)
-            ax.plot(episodios_promedio, promedio_movil, 
+            ax.plot(episodios_promedio, promedio_movil(recompensas, ventana), 
                    color='red', linewidth=2, 
                    label=f'Promedio móvil (ventana={ventana})')
         
@@ -103,11 +253,8 @@ class Visualizador:
         
         # Promedio móvil
         if len(pasos) >= ventana:
-            promedio_movil = np.convolve(pasos, 
-                                        np.ones(ventana)/ventana, 
-                                        mode='valid')
             episodios_promedio = range(ventana, len(pasos) + 1)
-            ax.plot(episodios_promedio, promedio_movil, 
+            ax.plot(episodios_promedio, promedio_movil(pasos, ventana), 
                    color='darkgreen', linewidth=2, 
                    label=f'Promedio móvil (ventana={ventana})')
         
@@ -155,13 +302,12 @@ class Visualizador:
         fig, ax = plt.subplots(figsize=(12, 6))
         
         # Calcular tasa de éxito móvil
-        tasas_exito = []
-        episodios_tasa = []
-        
-        for i in range(ventana, len(exitos) + 1):
-            tasa = np.mean(exitos[i-ventana:i]) * 100
-            tasas_exito.append(tasa)
-            episodios_tasa.append(i)
+        if len(exitos) >= ventana:
+            tasas_exito = promedio_movil(exitos, ventana) * 100
+            episodios_tasa = np.arange(ventana, len(exitos) + 1)
+        else:
+            tasas_exito = []
+            episodios_tasa = []
         
         # Gráfica
         ax.plot(episodios_tasa, tasas_exito, color='purple', linewidth=2)
@@ -217,36 +363,19 @@ class Visualizador:
         
         size = entorno.size
         
-        # Dibujar grid
-        for i in range(size + 1):
-            ax.plot([0, size], [i, i], 'k-', linewidth=0.5)
-            ax.plot([i, i], [0, size], 'k-', linewidth=0.5)
+        # Dibujar grid, trampas, tesoro e inicio
+        _dibujar_cuadricula(ax, entorno)
         
-        # Dibujar trampas
         for trampa in entorno.trampas:
             x, y = trampa
-            rect = patches.Rectangle((y, size - x - 1), 1, 1, 
-                                     linewidth=2, edgecolor='red', 
-                                     facecolor='red', alpha=0.3)
-            ax.add_patch(rect)
             ax.text(y + 0.5, size - x - 0.5, '💀', 
                    ha='center', va='center', fontsize=16)
         
-        # Dibujar tesoro
         x, y = entorno.tesoro
-        rect = patches.Rectangle((y, size - x - 1), 1, 1, 
-                                 linewidth=2, edgecolor='gold', 
-                                 facecolor='yellow', alpha=0.3)
-        ax.add_patch(rect)
         ax.text(y + 0.5, size - x - 0.5, '💎', 
                ha='center', va='center', fontsize=16)
         
-        # Dibujar inicio
         x, y = entorno.inicio
-        rect = patches.Rectangle((y, size - x - 1), 1, 1, 
-                                 linewidth=2, edgecolor='blue', 
-                                 facecolor='lightblue', alpha=0.3)
-        ax.add_patch(rect)
         ax.text(y + 0.5, size - x - 0.5, '🏁', 
                ha='center', va='center', fontsize=16)
         
@@ -320,8 +449,7 @@ class Visualizador:
         episodios = range(1, len(recompensas) + 1)
         ax1.plot(episodios, recompensas, alpha=0.3, color='blue', linewidth=0.5)
         if len(recompensas) >= 50:
-            promedio = np.convolve(recompensas, np.ones(50)/50, mode='valid')
-            ax1.plot(range(50, len(recompensas) + 1), promedio, 
+            ax1.plot(range(50, len(recompensas) + 1), promedio_movil(recompensas, 50), 
                     color='red', linewidth=2, label='Promedio móvil (50)')
         ax1.set_xlabel('Episodio', fontweight='bold')
         ax1.set_ylabel('Recompensa', fontweight='bold')
@@ -335,8 +463,7 @@ class Visualizador:
         episodios = range(1, len(pasos) + 1)
         ax2.plot(episodios, pasos, alpha=0.3, color='green', linewidth=0.5)
         if len(pasos) >= 50:
-            promedio = np.convolve(pasos, np.ones(50)/50, mode='valid')
-            ax2.plot(range(50, len(pasos) + 1), promedio, 
+            ax2.plot(range(50, len(pasos) + 1), promedio_movil(pasos, 50), 
                     color='darkgreen', linewidth=2, label='Promedio móvil (50)')
         ax2.set_xlabel('Episodio', fontweight='bold')
         ax2.set_ylabel('Pasos', fontweight='bold')
@@ -348,11 +475,8 @@ class Visualizador:
         ax3 = fig.add_subplot(gs[1, 1])
         exitos = estadisticas['exitos']
         if len(exitos) >= 50:
-            tasas = []
-            eps = []
-            for i in range(50, len(exitos) + 1):
-                tasas.append(np.mean(exitos[i-50:i]) * 100)
-                eps.append(i)
+            tasas = promedio_movil(exitos, 50) * 100
+            eps = np.arange(50, len(exitos) + 1)
             ax3.plot(eps, tasas, color='purple', linewidth=2)
             ax3.fill_between(eps, 0, tasas, alpha=0.3, color='purple')
         ax3.axhline(y=100, color='green', linestyle='--', alpha=0.5)
@@ -366,30 +490,8 @@ class Visualizador:
         ax4 = fig.add_subplot(gs[2, :])
         size = entorno.size
         
-        # Dibujar grid
-        for i in range(size + 1):
-            ax4.plot([0, size], [i, i], 'k-', linewidth=0.5)
-            ax4.plot([i, i], [0, size], 'k-', linewidth=0.5)
-        
-        # Trampas, tesoro, inicio
-        for trampa in entorno.trampas:
-            x, y = trampa
-            rect = patches.Rectangle((y, size - x - 1), 1, 1, 
-                                     linewidth=1, edgecolor='red', 
-                                     facecolor='red', alpha=0.3)
-            ax4.add_patch(rect)
-        
-        x, y = entorno.tesoro
-        rect = patches.Rectangle((y, size - x - 1), 1, 1, 
-                                 linewidth=1, edgecolor='gold', 
-                                 facecolor='yellow', alpha=0.3)
-        ax4.add_patch(rect)
-        
-        x, y = entorno.inicio
-        rect = patches.Rectangle((y, size - x - 1), 1, 1, 
-                                 linewidth=1, edgecolor='blue', 
-                                 facecolor='lightblue', alpha=0.3)
-        ax4.add_patch(rect)
+        # Grid, trampas, tesoro e inicio
+        _dibujar_cuadricula(ax4, entorno, grosor=1)
         
         # Trayectoria
         if len(trayectoria) > 1:
@@ -419,4 +521,222 @@ class Visualizador:
         else:
             plt.close()
         
-        return fig
\ No newline at end of file
+        return fig
+
+class DashboardVivo:
+    """
+    Dashboard que se crea una vez y se actualiza de forma incremental
+
+    Dibuja sobre una figura Agg propia (sin pyplot ni pantalla), crea las
+    líneas una sola vez y en cada actualización solo cambia sus datos con
+    set_data. La parte estática (ejes, leyendas, cuadrícula) se guarda como
+    fondo y se restaura por blitting; solo se vuelve a dibujar entera cuando
+    hay que ampliar los límites de los ejes, que crecen al doble para que
+    ocurra pocas veces. Las estadísticas se mantienen en SerieMovil y cada
+    serie se dibuja con como mucho `max_puntos` puntos, así que actualizar
+    no depende del número de episodios.
+    """
+
+    def __init__(self, entorno, ventana=50, max_puntos=1000, ruta=None, dpi=100):
+        """
+        Inicializa el dashboard
+
+        Args:
+            entorno: Objeto GridWorld
+            ventana: Tamaño de ventana de los promedios móviles
+            max_puntos: Máximo de puntos por serie dibujada
+            ruta: Archivo PNG donde guardar con guardar()
+            dpi: Resolución de la imagen
+        """
+        self.entorno = entorno
+        self.ventana = ventana
+        self.max_puntos = max_puntos
+        self.ruta = ruta
+
+        self.recompensas = SerieMovil()
+        self.pasos = SerieMovil()
+        self.exitos = SerieMovil()
+        self.trayectoria = None
+        self._trayectoria_dibujada = None
+
+        self.figura = Figure(figsize=(16, 12), dpi=dpi)
+        self.lienzo = FigureCanvasAgg(self.figura)
+        self._crear_artistas()
+        self._fondo = None
+
+    def _crear_artistas(self):
+        figura = self.figura
+        gs = figura.add_gridspec(3, 2, hspace=0.3, wspace=0.3)
+
+        def linea(ax, **estilo):
+            artista, = ax.plot([], [], animated=True, **estilo)
+            return artista
+
+        ax1 = figura.add_subplot(gs[0, :])
+        self.linea_recompensas = linea(ax1, alpha=0.3, color='blue', linewidth=0.5)
+        self.media_recompensas = linea(ax1, color='red', linewidth=2,
+                                       label=f'Promedio móvil ({self.ventana})')
+        ax1.set_xlabel('Episodio', fontweight='bold')
+        ax1.set_ylabel('Recompensa', fontweight='bold')
+        ax1.set_title('Evolución de Recompensas', fontweight='bold', fontsize=12)
+        ax1.legend(loc='lower right')
+        ax1.grid(True, alpha=0.3)
+
+        ax2 = figura.add_subplot(gs[1, 0])
+        self.linea_pasos = linea(ax2, alpha=0.3, color='green', linewidth=0.5)
+        self.media_pasos = linea(ax2, color='darkgreen', linewidth=2,
+                                 label=f'Promedio móvil ({self.ventana})')
+        ax2.set_xlabel('Episodio', fontweight='bold')
+        ax2.set_ylabel('Pasos', fontweight='bold')
+        ax2.set_title('Número de Pasos por Episodio', fontweight='bold', fontsize=12)
+        ax2.legend(loc='upper right')
+        ax2.grid(True, alpha=0.3)
+
+        ax3 = figura.add_subplot(gs[1, 1])
+        self.linea_tasa = linea(ax3, color='purple', linewidth=2)
+        self.relleno_tasa = None
+        ax3.axhline(y=100, color='green', linestyle='--', alpha=0.5)
+        ax3.set_xlabel('Episodio', fontweight='bold')
+        ax3.set_ylabel('Tasa de Éxito (%)', fontweight='bold')
+        ax3.set_title(f'Tasa de Éxito (ventana={self.ventana})', fontweight='bold', fontsize=12)
+        ax3.set_ylim(-5, 105)
+        ax3.grid(True, alpha=0.3)
+
+        ax4 = figura.add_subplot(gs[2, :])
+        size = self.entorno.size
+        _dibujar_cuadricula(ax4, self.entorno, grosor=1)
+        self.linea_trayectoria = linea(ax4, color='blue', linestyle='-', marker='o', markersize=6,
+                                       linewidth=3, alpha=0.6)
+        ax4.set_xlim(0, size)
+        ax4.set_ylim(0, size)
+        ax4.set_aspect('equal')
+        ax4.set_title('Trayectoria del Agente', fontweight='bold', fontsize=12)
+        ax4.grid(True, alpha=0.3)
+
+        self.texto = ax1.text(0.02, 0.95, '', transform=ax1.transAxes, fontsize=10,
+                              verticalalignment='top', animated=True,
+                              bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+
+        figura.suptitle('Dashboard de Entrenamiento del Agente Q-Learning',
+                        fontsize=16, fontweight='bold', y=0.995)
+
+        self.ejes_series = (ax1, ax2, ax3)
+        self.ax_trayectoria = ax4
+        self.ax_recompensas = ax1
+        self.ax_pasos = ax2
+        self.ax_tasa = ax3
+
+    def agregar_episodio(self, recompensa, pasos, exito):
+        """Añade el resultado de un episodio"""
+        self.recompensas.agregar(recompensa)
+        self.pasos.agregar(pasos)
+        self.exitos.agregar(1 if exito else 0)
+
+    def sincronizar(self, estadisticas):
+        """
+        Añade los episodios nuevos de un diccionario de estadísticas como el de
+        Entrenador (solo los que aún no se habían añadido)
+        """
+        desde = len(self.recompensas)
+        self.recompensas.agregar(estadisticas['recompensas'][desde:])
+        self.pasos.agregar(estadisticas['pasos'][desde:])
+        self.exitos.agregar(estadisticas['exitos'][desde:])
+
+    def actualizar_trayectoria(self, trayectoria):
+        """Cambia la trayectoria mostrada (lista de posiciones (x, y))"""
+        self.trayectoria = trayectoria
+
+    def _ampliar_limites(self):
+        """Amplía los límites de los ejes si los datos se salen; retorna True si cambió alguno"""
+        cambio = False
+        n = len(self.recompensas)
+        for ax in self.ejes_series:
+            _, maximo = ax.get_xlim()
+            if n > maximo or maximo <= 1:
+                ax.set_xlim(0, max(2 * n, 100))
+                cambio = True
+
+        primera = self._fondo is None
+        for ax, serie in ((self.ax_recompensas, self.recompensas), (self.ax_pasos, self.pasos)):
+            _, valores = serie.medias_por_tramo(self.max_puntos)
+            if not len(valores):
+                continue
+            bajo, alto = float(valores.min()), float(valores.max())
+            minimo, maximo = ax.get_ylim()
+            if primera or bajo < minimo or alto > maximo:
+                if not primera:
+                    bajo, alto = min(bajo, minimo), max(alto, maximo)
+                margen = max(alto - bajo, 1.0) * 0.25
+                ax.set_ylim(bajo - margen, alto + margen)
+                cambio = True
+        return cambio
+
+    def _actualizar_artistas(self):
+        self.linea_recompensas.set_data(*self.recompensas.medias_por_tramo(self.max_puntos))
+        self.media_recompensas.set_data(*self.recompensas.promedio_movil(self.ventana, self.max_puntos))
+        self.linea_pasos.set_data(*self.pasos.medias_por_tramo(self.max_puntos))
+        self.media_pasos.set_data(*self.pasos.promedio_movil(self.ventana, self.max_puntos))
+
+        episodios, tasas = self.exitos.promedio_movil(self.ventana, self.max_puntos)
+        tasas = tasas * 100
+        self.linea_tasa.set_data(episodios, tasas)
+        if self.relleno_tasa is not None:
+            self.relleno_tasa.remove()
+        self.relleno_tasa = self.ax_tasa.fill_between(episodios, 0, tasas, alpha=0.3,
+                                                      color='purple', animated=True)
+
+        if self.trayectoria is not None and len(self.trayectoria) > 1:
+            size = self.entorno.size
+            self.linea_trayectoria.set_data([estado[1] + 0.5 for estado in self.trayectoria],
+                                            [size - estado[0] - 0.5 for estado in self.trayectoria])
+            self.ax_trayectoria.set_title(f'Trayectoria del Agente (Pasos: {len(self.trayectoria) - 1})',
+                                          fontweight='bold', fontsize=12)
+
+        self.texto.set_text(
+            f'Episodios: {len(self.recompensas)} | '
+            f'recompensa (últimos 100): {self.recompensas.media_ultimos(100):.2f} | '
+            f'pasos: {self.pasos.media_ultimos(100):.1f} | '
+            f'éxito: {self.exitos.media_ultimos(100) * 100:.1f}%'
+        )
+
+    def _artistas_animados(self):
+        artistas = [self.linea_recompensas, self.media_recompensas, self.linea_pasos,
+                    self.media_pasos, self.linea_tasa, self.linea_trayectoria, self.texto]
+        if self.relleno_tasa is not None:
+            artistas.append(self.relleno_tasa)
+        return artistas
+
+    def dibujar(self):
+        """
+        Actualiza la imagen con los datos actuales
+
+        Returns:
+            True si hubo que redibujar la figura completa, False si bastó el blitting
+        """
+        completo = self._ampliar_limites() or self._fondo is None
+        # El título de la trayectoria forma parte del fondo
+        if self.trayectoria is not self._trayectoria_dibujada:
+            completo = True
+            self._trayectoria_dibujada = self.trayectoria
+
+        self._actualizar_artistas()
+        if completo:
+            self.lienzo.draw()
+            self._fondo = self.lienzo.copy_from_bbox(self.figura.bbox)
+        else:
+            self.lienzo.restore_region(self._fondo)
+
+        for artista in self._artistas_animados():
+            artista.axes.draw_artist(artista)
+        return completo
+
+    def imagen(self):
+        """Retorna la imagen actual como array RGBA"""
+        return np.asarray(self.lienzo.buffer_rgba())
+
+    def guardar(self, ruta=None):
+        """Dibuja y guarda la imagen como PNG"""
+        ruta = ruta or self.ruta
+        self.dibujar()
+        imsave(ruta, self.imagen())
+        return ruta